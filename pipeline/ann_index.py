@@ -0,0 +1,267 @@
+"""
+IVF-PQ approximate nearest-neighbor index over unit-normalized embeddings.
+
+Build:
+  1. k-means the vectors into nlist = n / LIST_SIZE coarse cells (inverted lists)
+  2. split each vector into m sub-vectors and k-means each subspace into up
+     to 256 centroids, so a vector is stored as m uint8 codes (product
+     quantization: 384 float32 dims -> 48 bytes with m=48)
+  3. store rows sorted by cell, so each inverted list is one contiguous slice
+
+Search (inner product = cosine on unit vectors):
+  1. score the query against the nlist centroids and keep the best nprobe
+  2. build an m x 256 table of query . sub-centroid dot products and score
+     every code in the probed lists with m table lookups
+  3. re-score the best `rerank` candidates exactly against float16 copies
+     of their vectors and return the top k
+
+Lists hold about LIST_SIZE vectors however large the corpus is, so a query
+scans roughly nprobe * LIST_SIZE codes plus n / LIST_SIZE centroids: query
+time stays nearly flat as the corpus grows, while recall at a fixed nprobe
+slowly drops (the build reports it, so nprobe can be raised).
+
+Everything is saved as .npy files plus meta.json in one directory and
+loaded with mmap_mode="r", so opening an index costs no reads up front:
+
+    meta.json        n, dim, nlist, m, nprobe default, recall@k at build time
+    centroids.npy    nlist x dim float32
+    offsets.npy      nlist + 1 int64; list i is rows offsets[i]:offsets[i+1]
+    ids.npy          n int32, original row of each stored row
+    codebooks.npy    m x 256 x dim/m float32
+    codes.npy        n x m uint8
+    vectors.npy      n x dim float16, for reranking; left out of indexes
+                     built with keep_vectors=False, which rerank against the
+                     caller's matrix instead (IVFPQIndex.load(..., rerank_vectors=))
+
+generate_map_data.py builds one for the researcher matrix under
+<output-dir>/ann/researchers, and one for the paper matrix under
+<output-dir>/ann/papers that reranks against papers/embeddings.npy rather
+than keeping a second copy; this script builds one for any .npy matrix.
+
+Usage:
+    python ann_index.py --vectors ./output/researcher_embeddings.npy --output ./output/ann/researchers
+    python ann_index.py --vectors papers.npy --output ./ann/papers --m 48 --nprobe 16 --recall-k 10
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+LIST_SIZE = 256
+DEFAULT_M = 48
+DEFAULT_NPROBE = 8
+RERANK = 300
+TRAIN_SAMPLE = 65536
+MIN_POINTS_PER_CODE = 4
+RECALL_QUERIES = 500
+ANN_DIR = "ann"
+
+
+def _kmeans(data: np.ndarray, n_clusters: int, seed: int) -> np.ndarray:
+    import warnings
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.exceptions import ConvergenceWarning
+
+    n_clusters = max(1, min(n_clusters, len(data)))
+    if len(data) > 10_000:
+        km = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, batch_size=4096, n_init=3)
+    else:
+        km = KMeans(n_clusters=n_clusters, random_state=seed, n_init=1, max_iter=50)
+    # Duplicate rows (small corpora) leave fewer distinct clusters than asked for; the codebook copes
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        return km.fit(data).cluster_centers_.astype(np.float32)
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    """Nearest centroid (squared L2) of each row, a block of rows at a time."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), block):
+        chunk = data[start:start + block]
+        out[start:start + block] = np.argmin(c_norms[None, :] - 2 * chunk @ centroids.T, axis=1)
+    return out
+
+
+class IVFPQIndex:
+    def __init__(self, directory: Path | None = None, **arrays):
+        self.directory = directory
+        self.meta = arrays.pop("meta")
+        # Original-row-order matrix to rerank against when vectors.npy isn't kept
+        self.rerank_vectors = arrays.pop("rerank_vectors", None)
+        for name, value in arrays.items():
+            setattr(self, name, value)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, m: int = DEFAULT_M, list_size: int = LIST_SIZE,
+              nprobe: int = DEFAULT_NPROBE, seed: int = 0, keep_vectors: bool = True) -> "IVFPQIndex":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        while dim % m:
+            m -= 1
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False)]
+
+        centroids = _kmeans(sample, max(1, n // list_size), seed)
+        cells = _assign(vectors, centroids)
+        order = np.argsort(cells, kind="stable")
+        offsets = np.searchsorted(cells[order], np.arange(len(centroids) + 1)).astype(np.int64)
+
+        dsub = dim // m
+        # Small corpora get fewer codes: a code per point or two trains nothing
+        n_codes = max(1, min(256, len(sample) // MIN_POINTS_PER_CODE))
+        codebooks = np.zeros((m, 256, dsub), dtype=np.float32)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for j in range(m):
+            sub = slice(j * dsub, (j + 1) * dsub)
+            book = _kmeans(sample[:, sub], n_codes, seed + j)
+            codebooks[j, :len(book)] = book
+            codes[:, j] = _assign(vectors[order, sub], book)
+
+        meta = {"n": int(n), "dim": int(dim), "nlist": int(len(centroids)), "m": int(m),
+                "list_size": int(list_size), "nprobe": int(min(nprobe, len(centroids))),
+                "vectors": keep_vectors}
+        return cls(
+            meta=meta, centroids=centroids, offsets=offsets, ids=order.astype(np.int32),
+            codebooks=codebooks, codes=codes, vectors=vectors[order].astype(np.float16) if keep_vectors else None,
+            rerank_vectors=None if keep_vectors else vectors,
+        )
+
+    ARRAYS = ["centroids", "offsets", "ids", "codebooks", "codes", "vectors"]
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            if getattr(self, name) is not None:
+                np.save(directory / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        # meta.json last: an index without it is incomplete
+        with open(directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        self.directory = directory
+
+    @classmethod
+    def load(cls, directory: Path, rerank_vectors: np.ndarray | None = None) -> "IVFPQIndex":
+        """rerank_vectors (the n x dim matrix the index was built from) is required if it has no vectors.npy."""
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r")
+                  for name in cls.ARRAYS if name != "vectors" or meta.get("vectors", True)}
+        if "vectors" not in arrays:
+            if rerank_vectors is None:
+                raise ValueError(f"{directory} keeps no vectors.npy; pass the matrix it was built from")
+            arrays["vectors"] = None
+        return cls(directory, meta=meta, rerank_vectors=rerank_vectors, **arrays)
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int | None = None,
+               rerank: int = RERANK) -> tuple[np.ndarray, np.ndarray]:
+        """(original row ids, scores) of the k best matches for one unit query vector."""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.meta["nprobe"], self.nlist)
+        coarse = self.centroids @ query
+        probe = np.argpartition(coarse, self.nlist - nprobe)[self.nlist - nprobe:]
+
+        ranges = [(int(self.offsets[c]), int(self.offsets[c + 1])) for c in probe]
+        rows = np.concatenate([np.arange(a, b) for a, b in ranges if b > a] or [np.zeros(0, dtype=np.int64)])
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        m = self.meta["m"]
+        dsub = self.meta["dim"] // m
+        table = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(m, dsub))
+        approx = table[np.arange(m), self.codes[rows]].sum(axis=1)
+
+        n_keep = min(max(k, rerank), len(rows))
+        keep = np.argpartition(approx, len(rows) - n_keep)[len(rows) - n_keep:]
+        candidates = rows[keep]
+        if self.vectors is not None:
+            exact = self.vectors[candidates].astype(np.float32) @ query
+        else:
+            exact = np.asarray(self.rerank_vectors[np.asarray(self.ids[candidates])], dtype=np.float32) @ query
+
+        k = min(k, len(candidates))
+        top = np.argpartition(exact, len(exact) - k)[len(exact) - k:]
+        top = top[np.argsort(-exact[top], kind="stable")]
+        return np.asarray(self.ids[candidates[top]]), exact[top]
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, block: int = 64) -> np.ndarray:
+    """Brute-force top-k rows (unordered) per query, a block of queries at a time."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    k = min(k, n)
+    out = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block):
+        scores = queries[start:start + block] @ vectors.T
+        out[start:start + block] = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    return out
+
+
+def evaluate(index: IVFPQIndex, vectors: np.ndarray, k: int = 10, n_queries: int = RECALL_QUERIES,
+             nprobe: int | None = None, rerank: int = RERANK, seed: int = 0) -> dict:
+    """recall@k against exact search and mean query latency, on perturbed copies of stored vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    # Nearby but unseen queries, so recall isn't inflated by exact self-matches
+    queries = vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth = exact_top_k(vectors, queries, k)
+    hits, elapsed = 0, 0.0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found, _ = index.search(query, k, nprobe=nprobe, rerank=rerank)
+        elapsed += time.perf_counter() - start
+        hits += len(set(found.tolist()) & set(expected.tolist()))
+    return {
+        "k": k,
+        "nprobe": nprobe or index.meta["nprobe"],
+        "recall": round(hits / truth.size, 4),
+        "query_ms": round(elapsed / len(queries) * 1000, 3),
+    }
+
+
+def build_index(vectors: np.ndarray, output_dir: Path, m: int = DEFAULT_M, nprobe: int = DEFAULT_NPROBE,
+                recall_k: int = 10, keep_vectors: bool = True) -> IVFPQIndex:
+    """Build, evaluate and save an index; the recall report goes into meta.json."""
+    start = time.perf_counter()
+    index = IVFPQIndex.build(vectors, m=m, nprobe=nprobe, keep_vectors=keep_vectors)
+    index.meta["build_s"] = round(time.perf_counter() - start, 3)
+    index.meta["recall"] = evaluate(index, vectors, k=recall_k)
+    index.save(output_dir)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an IVF-PQ ANN index over a .npy embedding matrix")
+    parser.add_argument("--vectors", "-i", type=Path, required=True, help="n x dim .npy matrix (rows are normalized)")
+    parser.add_argument("--output", "-o", type=Path, required=True, help="Index directory")
+    parser.add_argument("--m", type=int, default=DEFAULT_M, help=f"PQ sub-vectors / bytes per vector (default: {DEFAULT_M})")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help=f"Lists scanned per query by default (default: {DEFAULT_NPROBE})")
+    parser.add_argument("--recall-k", type=int, default=10, help="k for the recall@k report (default: 10)")
+    args = parser.parse_args()
+
+    vectors = np.load(args.vectors, mmap_mode="r")
+    norms = np.linalg.norm(np.asarray(vectors, dtype=np.float32), axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    index = build_index(np.asarray(vectors, dtype=np.float32) / norms, args.output, m=args.m,
+                        nprobe=args.nprobe, recall_k=args.recall_k)
+
+    meta = index.meta
+    report = meta["recall"]
+    print(f"{meta['n']} vectors, {meta['nlist']} lists, {meta['m']} bytes/code, built in {meta['build_s']:.1f}s")
+    print(f"recall@{report['k']} = {report['recall']:.3f} at nprobe {report['nprobe']}, {report['query_ms']:.2f} ms/query")
+    print(f"Index: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Prefix autocomplete over researcher names, affiliations and keywords.
+
+Every suggestion is an entry: a display label, a kind (name, affiliation or
+keyword), a target id and a ranking weight. Entries are stored by kind, in
+target order, so targets are implicit: name i is researcher row i
+(researcher_index.json order), affiliation i is affiliation id i
+(researchers map to it through `affiliation_of`), keyword i is keyword id i
+in the keyword facet index (keyword_index.py). The weight is the total
+citations of the researchers an entry stands for, stored as a uint16 log
+scale (log1p(citations) * WEIGHT_SCALE, well under 0.1% relative error).
+
+<output-dir>/autocomplete.npz (compressed) holds just the labels as a UTF-8
+blob with offsets, the per-kind entry counts, the weights and
+affiliation_of, which keeps it to a few hundred KB at 50k researchers. The
+match keys are derived on load: each label normalized (accents stripped,
+case-folded, punctuation to spaces) and each of its word-initial suffixes,
+so "hutch" finds "Seth Hutchinson" and "visual se" finds "Visual Servoing",
+sorted, with entries renumbered by decreasing weight (ties by label). A
+lookup is a binary search for the range of keys starting with the
+normalized prefix, and the best distinct entries in it are its smallest
+entry numbers.
+
+Usage:
+    python autocomplete_index.py --data-dir ./output --prefix "hutch"
+"""
+
+import argparse
+import bisect
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+
+AUTOCOMPLETE_FILE = "autocomplete.npz"
+KINDS = ["name", "affiliation", "keyword"]
+DEFAULT_LIMIT = 10
+WEIGHT_SCALE = 2048
+
+
+def normalize(text: str) -> str:
+    """Match form of a label or typed prefix: no accents, case-folded, alphanumerics (and + #) only."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join("".join(c if c.isalnum() or c in "+#" else " " for c in text).split())
+
+
+def match_keys(label: str) -> list[str]:
+    """The normalized label and every suffix of it that starts at a word."""
+    words = normalize(label).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _blob(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unblob(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = data.tobytes()
+    return [raw[a:b].decode("utf-8") for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def save_autocomplete_index(output_dir: Path, names: list, affiliations: list, citations: list,
+                            keywords=None) -> Path:
+    """Write autocomplete.npz for researcher rows and, if given, a KeywordIndex's keywords."""
+    citations = np.nan_to_num(np.asarray(citations, dtype=np.float64)).clip(min=0)
+    names = [name.strip() if isinstance(name, str) else "" for name in names]
+
+    # Affiliations are grouped by normalized text, labelled by their first spelling
+    affiliation_ids: dict[str, int] = {}
+    affiliation_of = np.full(len(names), -1, dtype=np.int64)
+    affiliation_labels = []
+    for row, affiliation in enumerate(affiliations):
+        key = normalize(affiliation) if isinstance(affiliation, str) else ""
+        if not key:
+            continue
+        if key not in affiliation_ids:
+            affiliation_ids[key] = len(affiliation_labels)
+            affiliation_labels.append(affiliation.strip())
+        affiliation_of[row] = affiliation_ids[key]
+    has_affiliation = affiliation_of >= 0
+    affiliation_weights = np.bincount(affiliation_of[has_affiliation], weights=citations[has_affiliation],
+                                      minlength=len(affiliation_labels))
+
+    keyword_labels, keyword_weights = [], np.zeros(0)
+    if keywords is not None:
+        keyword_labels = list(keywords.labels)
+        counts = np.diff(keywords.indptr)
+        owner = np.repeat(np.arange(len(counts)), counts)
+        keyword_weights = np.bincount(owner, weights=citations[np.asarray(keywords.rows)], minlength=len(counts))
+
+    weights = np.concatenate([citations, affiliation_weights, keyword_weights])
+    label_data, label_offsets = _blob(names + affiliation_labels + keyword_labels)
+    # Smallest type that holds every affiliation id plus the "none" value
+    id_type = np.uint16 if len(affiliation_labels) < np.iinfo(np.uint16).max else np.uint32
+    path = output_dir / AUTOCOMPLETE_FILE
+    np.savez_compressed(
+        path,
+        label_data=label_data, label_offsets=label_offsets.astype(np.uint32),
+        kind_counts=np.asarray([len(names), len(affiliation_labels), len(keyword_labels)], dtype=np.int64),
+        weight=np.rint(np.log1p(weights) * WEIGHT_SCALE).clip(max=np.iinfo(np.uint16).max).astype(np.uint16),
+        affiliation_of=np.where(has_affiliation, affiliation_of, np.iinfo(id_type).max).astype(id_type),
+    )
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+class AutocompleteIndex:
+    def __init__(self, data_dir: Path):
+        with np.load(data_dir / AUTOCOMPLETE_FILE) as data:
+            labels = _unblob(data["label_data"], data["label_offsets"])
+            kind_counts = data["kind_counts"]
+            weights = data["weight"]
+            affiliation_of = data["affiliation_of"]
+        kinds = np.repeat(np.arange(len(KINDS), dtype=np.uint8), kind_counts)
+        targets = np.concatenate([np.arange(n, dtype=np.int64) for n in kind_counts])
+
+        # Entry number = rank: decreasing weight, then label
+        order = sorted(range(len(labels)), key=lambda e: (-int(weights[e]), labels[e]))
+        self.labels = [labels[e] for e in order]
+        self.kind = kinds[order]
+        self.target = targets[order]
+        self.weight = weights[order]
+        none = np.iinfo(affiliation_of.dtype).max
+        self.affiliation_of = np.where(affiliation_of == none, -1, affiliation_of.astype(np.int64))
+
+        pairs = sorted((key, entry) for entry, label in enumerate(self.labels) for key in set(match_keys(label)))
+        self.keys = [key for key, _ in pairs]
+        self.key_entry = np.asarray([entry for _, entry in pairs], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT, kinds: list[str] | None = None) -> list[dict]:
+        """Up to limit entries with a key starting with prefix, by decreasing weight, then label."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        entries = np.unique(self.key_entry[lo:hi])
+        if kinds:
+            entries = entries[np.isin(self.kind[entries], [KINDS.index(k) for k in kinds])]
+        # Entry numbers are the ranking
+        return [
+            {"label": self.labels[e], "kind": KINDS[self.kind[e]], "id": int(self.target[e]),
+             "weight": round(float(np.expm1(self.weight[e] / WEIGHT_SCALE)))}
+            for e in entries[:limit].tolist()
+        ]
+
+    def affiliation_researchers(self, affiliation_id: int) -> np.ndarray:
+        return np.flatnonzero(self.affiliation_of == affiliation_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Try the autocomplete index")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--prefix", "-p", required=True)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--kind", action="append", choices=KINDS, help="Only these kinds (repeatable)")
+    args = parser.parse_args()
+
+    index = AutocompleteIndex(args.data_dir)
+    for suggestion in index.suggest(args.prefix, args.limit, args.kind):
+        print(f"{suggestion['weight']:>10.0f}  {suggestion['kind']:<11}  {suggestion['label']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Fake LLM provider server for load-testing generate_summaries.py offline.
+
+Answers the request shapes used by call_gemini, call_openai and
+call_anthropic:
+
+  POST /v1beta/models/{model}:generateContent   (Gemini)
+  POST /v1/chat/completions                     (OpenAI)
+  POST /v1/messages                             (Anthropic)
+  GET  /stats                                   request / error counters
+
+Each request waits for a latency drawn from --latency, and can be rejected
+the way real providers throttle: --rpm enforces a requests-per-minute token
+bucket (429 with Retry-After = time until the next token), and --p429 /
+--p503 inject random 429 / 503 responses. --retry-after sets the header sent
+with injected errors (omit it to test plain exponential backoff).
+
+Point the pipeline at it with the *_BASE_URL variables:
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency lognormal:2,0.5 --rpm 60
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=fake \\
+        python generate_summaries.py --input combined.csv --output enriched.csv --provider gemini
+
+Latency specs: fixed:S, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA (seconds).
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):generateContent")
+
+
+def parse_latency(spec: str):
+    """Return a function drawing one latency in seconds from a latency spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Bad latency spec {spec!r} (use fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA)")
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = "fixed:0.05"
+    rpm: float | None = None
+    p429: float = 0.0
+    p503: float = 0.0
+    retry_after: float | None = None
+    seed: int = 0
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate)  # at most one second's worth of burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success or the seconds until one is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+def fake_text(prompt: str, system: str) -> str:
+    """Deterministic stand-in output: keywords for the keywords prompt, else a biography."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    words = [digest[i:i + 6] for i in range(0, 60, 6)]
+    if "keywords" in system.lower() or "classification" in system.lower():
+        return ", ".join(f"topic-{w}" for w in words)
+    return (
+        "## Overview\nA researcher working on " + ", ".join(words[:3]) + ".\n\n---\n\n"
+        "## Research Areas\n" + " ".join(words) + "\n\n---\n\n"
+        "## Notable Works\n- " + "\n- ".join(words[:3]) + "\n\n---\n\n"
+        "## Academic Background\nSynthetic."
+    )
+
+
+class FakeLLMServer:
+    """ThreadingHTTPServer running on a background thread; use start()/stop() or as a context manager."""
+
+    def __init__(self, config: FakeLLMConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self._latency = parse_latency(config.latency)
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._bucket = TokenBucket(config.rpm) if config.rpm else None
+        self.stats = {"requests": 0, "ok": 0, "throttled": 0, "injected_429": 0, "injected_503": 0}
+        self._stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _draw(self) -> tuple[float, float]:
+        with self._rng_lock:
+            return self._latency(self._rng), self._rng.random()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: dict, headers: dict | None = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    with server._stats_lock:
+                        self._send(200, dict(server.stats))
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server._count("requests")
+
+                gemini = GEMINI_PATH.match(self.path)
+                if gemini:
+                    shape = "gemini"
+                    system = request["system_instruction"]["parts"][0]["text"]
+                    prompt = request["contents"][0]["parts"][0]["text"]
+                elif self.path.startswith("/v1/chat/completions"):
+                    shape = "openai"
+                    messages = {m["role"]: m["content"] for m in request["messages"]}
+                    system, prompt = messages.get("system", ""), messages.get("user", "")
+                elif self.path.startswith("/v1/messages"):
+                    shape = "anthropic"
+                    system, prompt = request.get("system", ""), request["messages"][0]["content"]
+                else:
+                    self._send(404, {"error": f"unknown path {self.path}"})
+                    return
+
+                error_headers = {}
+                if server.config.retry_after is not None:
+                    error_headers["Retry-After"] = f"{server.config.retry_after:g}"
+
+                if server._bucket is not None:
+                    wait = server._bucket.take()
+                    if wait > 0:
+                        server._count("throttled")
+                        self._send(429, {"error": "rate limit exceeded"}, {"Retry-After": f"{wait:.2f}"})
+                        return
+
+                latency, roll = server._draw()
+                if roll < server.config.p429:
+                    server._count("injected_429")
+                    self._send(429, {"error": "injected 429"}, error_headers)
+                    return
+                if roll < server.config.p429 + server.config.p503:
+                    time.sleep(latency / 2)
+                    server._count("injected_503")
+                    self._send(503, {"error": "injected 503"}, error_headers)
+                    return
+
+                time.sleep(latency)
+                text = fake_text(prompt, system)
+                server._count("ok")
+                if shape == "gemini":
+                    self._send(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+                elif shape == "openai":
+                    self._send(200, {"choices": [{"message": {"role": "assistant", "content": text}}]})
+                else:
+                    self._send(200, {"content": [{"type": "text", "text": text}]})
+
+        return Handler
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="lognormal:1.5,0.5",
+                        help="Response latency spec (default: lognormal:1.5,0.5)")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute before 429s (default: unlimited)")
+    parser.add_argument("--p429", type=float, default=0.0, help="Probability of an injected 429")
+    parser.add_argument("--p503", type=float, default=0.0, help="Probability of an injected 503")
+    parser.add_argument("--retry-after", type=float, default=None,
+                        help="Retry-After seconds sent with injected errors (default: no header)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> FakeLLMConfig:
+    parse_latency(args.latency)
+    return FakeLLMConfig(
+        latency=args.latency, rpm=args.rpm, p429=args.p429, p503=args.p503,
+        retry_after=args.retry_after, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini/OpenAI/Anthropic server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"Fake LLM server on {server.url} (Ctrl-C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Benchmark the map-building stages on synthetic data at 1k/10k/100k researchers.
+
+Times, per scale:
+  combine    combine_profiles.combine on a generated Researcher_Profiles dir
+  load       pd.read_csv of the generated enriched CSV
+  embed      generate_map_data.embed_texts (stub encoder by default)
+  aggregate  per-researcher median embedding
+  umap       2D projection
+  data_list  wizmap_utils.generate_data_list
+  contour    wizmap_utils.generate_contour_dict
+  topics     wizmap_utils.generate_topic_dict
+  save       wizmap_utils.save_json_files
+  neighbors  similarity.top_k_neighbors (top 10 similar researchers)
+
+The stub encoder hashes words into a 384-dim bag of words, so embedding cost
+stays out of the way of the stages after it; --encoder gte-small uses the
+real model. Each stage keeps its fastest wall time over --repeat runs.
+UMAP's numba compilation happens once on a tiny input before anything is
+timed, so the umap stage measures the projection rather than the JIT.
+
+Results are compared against baseline.json (same encoder and papers per
+researcher only). A stage regresses when it is more than --threshold slower
+than its baseline and at least --min-delta seconds slower. Wall times only
+compare on the same hardware, so the script exits with status 1 on a
+regression only when the baseline was recorded on this machine (same host,
+CPU model, CPU count, platform and Python); otherwise the comparison is
+printed for information. --save-baseline records the current results
+instead. To gate a CI job, measure both sides in the same job: run the base
+commit with --save-baseline --baseline base.json, then the change with
+--baseline base.json. Generated data is kept under --data-dir and reused.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale 1k 10k
+    python benchmarks/run_benchmarks.py --scale 1k --repeat 3 --save-baseline
+    python benchmarks/run_benchmarks.py --scale 100k --encoder gte-small --threshold 0.5
+    git stash && python benchmarks/run_benchmarks.py --save-baseline --baseline /tmp/base.json \
+        && git stash pop && python benchmarks/run_benchmarks.py --baseline /tmp/base.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import warnings
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from metrics_utils import Metrics, format_table
+from synthetic import PAPERS_PER_RESEARCHER, SCALES, write_dataset
+
+
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+DEFAULT_DATA_DIR = BENCHMARK_DIR / ".cache" / "data"
+STUB_DIM = 384
+
+
+def stub_encoder(text: str) -> np.ndarray:
+    """Deterministic hashed bag-of-words vector, a stand-in for gte-small."""
+    vec = np.zeros(STUB_DIM, dtype=np.float32)
+    for word in text.lower().split():
+        h = zlib.crc32(word.encode("utf-8"))
+        vec[h % STUB_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def dataset(data_dir: Path, scale: str, papers_per_researcher: int, seed: int) -> tuple[Path, Path]:
+    out = data_dir / f"{scale}-p{papers_per_researcher}-s{seed}"
+    profiles_dir, enriched_csv = out / "Researcher_Profiles", out / "enriched.csv"
+    if not enriched_csv.exists():
+        print(f"Generating {scale} dataset in {out} ...", flush=True)
+        write_dataset(out, SCALES[scale], seed=seed, papers_per_researcher=papers_per_researcher)
+    return profiles_dir, enriched_csv
+
+
+def run_once(scale: str, profiles_dir: Path, enriched_csv: Path, encoder_name: str, work_dir: Path) -> Metrics:
+    import pandas as pd
+    from combine_profiles import combine
+    from generate_map_data import aggregate_researchers, embed_texts, run_umap, texts_to_embed
+    from similarity import top_k_neighbors
+    from wizmap_utils import generate_contour_dict, generate_data_list, generate_topic_dict, save_json_files
+
+    encoder = stub_encoder if encoder_name == "stub" else None
+    metrics = Metrics(scale)
+
+    with metrics.step("combine") as record:
+        rows = combine([profiles_dir], work_dir / "combined.csv", incremental=False)
+        record["items"] = len(rows)
+    del rows
+
+    with metrics.step("load") as record:
+        df = pd.read_csv(enriched_csv)
+        record["items"] = len(df)
+
+    texts = texts_to_embed(df).tolist()
+    with metrics.step("embed", items=len(texts)):
+        df["embedding"] = embed_texts(texts, None, encoder=encoder)
+
+    with metrics.step("aggregate", items=len(df)):
+        researcher_df = aggregate_researchers(df)
+
+    emb_matrix = np.vstack(researcher_df["embedding"].values)
+    with metrics.step("umap", items=len(emb_matrix)):
+        coords = run_umap(emb_matrix)
+    xs, ys = coords[:, 0].tolist(), coords[:, 1].tolist()
+    keywords = researcher_df["ai_generated_keywords"].tolist()
+
+    with metrics.step("data_list", items=len(xs)):
+        data_list = generate_data_list(
+            xs, ys, keywords,
+            embeddings=[str(e.tolist()) for e in researcher_df["embedding"]],
+            labels=researcher_df["researcher_name"].tolist(),
+            citations=researcher_df["researcher_total_citations"].tolist(),
+        )
+
+    with metrics.step("contour", items=len(xs)):
+        grid_dict = generate_contour_dict(xs, ys)
+
+    with metrics.step("topics", items=len(xs)):
+        grid_dict["topic"] = generate_topic_dict(xs, ys, keywords)
+
+    with metrics.step("save", items=len(xs)):
+        save_json_files(data_list, grid_dict, output_dir=str(work_dir))
+
+    with metrics.step("neighbors", items=len(emb_matrix)):
+        top_k_neighbors(emb_matrix)
+
+    return metrics
+
+
+def best_of(runs: list[Metrics]) -> dict:
+    """Per stage, the record of the run with the lowest wall time."""
+    best = {}
+    for metrics in runs:
+        for record in metrics.steps:
+            current = best.get(record["step"])
+            if current is None or record["wall_s"] < current["wall_s"]:
+                best[record["step"]] = record
+    return {
+        step: {
+            "wall_s": round(r["wall_s"], 4),
+            "cpu_s": round(r["cpu_s"], 4),
+            "peak_rss_mb": r["peak_rss_mb"],
+            "items": r["items"],
+        }
+        for step, r in best.items()
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float,
+            flag_text: str = "REGRESSION") -> list[str]:
+    """Print current vs baseline per stage and return the regressed "scale/stage" names."""
+    regressions = []
+    print(f"\n{'scale':<6} {'stage':<10} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    print("-" * 50)
+    for scale, stages in results.items():
+        base_stages = baseline.get(scale)
+        if base_stages is None:
+            print(f"{scale:<6} (no baseline)")
+            continue
+        for stage, current in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                print(f"{scale:<6} {stage:<10} {'-':>11} {current['wall_s']:>11.3f}")
+                continue
+            change = current["wall_s"] / base["wall_s"] - 1 if base["wall_s"] > 0 else 0.0
+            regressed = change > threshold and current["wall_s"] - base["wall_s"] >= min_delta
+            flag = f"  {flag_text}" if regressed else ""
+            print(f"{scale:<6} {stage:<10} {base['wall_s']:>11.3f} {current['wall_s']:>11.3f} {change:>+7.0%}{flag}")
+            if regressed:
+                regressions.append(f"{scale}/{stage}")
+    return regressions
+
+
+def cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info() -> dict:
+    return {
+        "host": platform.node(),
+        "cpu": cpu_model(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the map-building stages on synthetic data")
+    parser.add_argument("--scale", nargs="+", choices=list(SCALES), default=["1k"])
+    parser.add_argument("--encoder", choices=["stub", "gte-small"], default="stub",
+                        help="Paper encoder for the embed stage (default: stub)")
+    parser.add_argument("--papers-per-researcher", type=int, default=PAPERS_PER_RESEARCHER)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scale; the fastest run of each stage counts")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR,
+                        help="Where generated datasets are kept between runs")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="Allowed slowdown per stage as a fraction of baseline (default: 0.3)")
+    parser.add_argument("--min-delta", type=float, default=0.25,
+                        help="Ignore slowdowns smaller than this many seconds (default: 0.25)")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args()
+
+    # Compile UMAP's numba kernels up front
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from generate_map_data import run_umap
+        run_umap(np.random.default_rng(0).random((64, 8), dtype=np.float32))
+
+    config = {"encoder": args.encoder, "papers_per_researcher": args.papers_per_researcher, "seed": args.seed}
+    results = {}
+    all_runs = []
+    for scale in args.scale:
+        profiles_dir, enriched_csv = dataset(args.data_dir, scale, args.papers_per_researcher, args.seed)
+        runs = []
+        for i in range(args.repeat):
+            print(f"Running {scale} ({i + 1}/{args.repeat}) ...", flush=True)
+            with tempfile.TemporaryDirectory() as work_dir:
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with quiet, warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    runs.append(run_once(scale, profiles_dir, enriched_csv, args.encoder, Path(work_dir)))
+        results[scale] = best_of(runs)
+        all_runs.append(runs[-1].to_dict())
+
+    print()
+    print(format_table(all_runs))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "machine": machine_info(), "results": results}, f, indent=2)
+
+    baseline = None
+    if args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        if baseline is None or baseline.get("config") != config:
+            baseline = {"config": config, "results": {}}
+        baseline["machine"] = machine_info()
+        baseline["results"].update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline saved: {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    if baseline.get("config") != config:
+        print(f"\nBaseline config {baseline.get('config')} differs from {config}; not comparing")
+        return
+    same_machine = baseline.get("machine") == machine_info()
+
+    regressions = compare(results, baseline["results"], args.threshold, args.min_delta,
+                          "REGRESSION" if same_machine else "slower")
+    if not same_machine:
+        print(f"\nBaseline was recorded on another machine ({baseline.get('machine')}, this is {machine_info()}):")
+        print("wall times aren't comparable, so this is informational only. Record a baseline here with --save-baseline.")
+        return
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Load-test generate_summaries against the fake LLM server.
+
+Starts benchmarks/fake_llm_server.py in-process with the given latency and
+throttling settings, points the chosen provider at it through its *_BASE_URL
+variable, and runs generate_summaries.generate_summaries on synthetic
+researchers once per combination of --workers and --rate-delay. For each run
+it reports researchers per minute, LLM call latency percentiles (including
+time spent in retries), retries by reason and the server's counters.
+
+Usage:
+    python benchmarks/summaries_load_test.py --researchers 40 --workers 1 4 8 --rate-delay 0 1
+    python benchmarks/summaries_load_test.py --provider anthropic --rpm 120 --p503 0.05 --retry-after 2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_summaries as gs
+from combine_profiles import build_rows
+from fake_llm_server import FakeLLMServer, add_config_arguments, config_from_args
+from synthetic import generate
+
+
+def synthetic_groups(n_researchers: int, seed: int = 0):
+    rows = []
+    for profile, papers, _, _ in generate(n_researchers, seed=seed):
+        rows.extend(build_rows(profile, papers))
+    return gs.group_rows(rows)
+
+
+def run_case(groups, provider: str, workers: int, rate_delay: float) -> dict:
+    env_var, call_llm, kw_model, summary_model = gs.PROVIDERS[provider]
+    latencies = []
+    lock = threading.Lock()
+
+    def timed_call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return call_llm(*args, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    gs.PROVIDERS[provider] = (env_var, timed_call, kw_model, summary_model)
+    gs.RETRY_COUNTS.clear()
+    error = None
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        progress_path = Path(tmp) / "summaries_progress.json"
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = gs.generate_summaries(
+                    groups, provider, progress_path,
+                    rate_delay=rate_delay, workers=workers,
+                )
+        except Exception as e:
+            # Researchers finished before the failure are in the journal; count them
+            results, error = gs.load_progress(progress_path), str(e)
+        finally:
+            gs.PROVIDERS[provider] = (env_var, call_llm, kw_model, summary_model)
+        wall = time.perf_counter() - start
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "workers": workers,
+        "rate_delay": rate_delay,
+        "researchers": len(results),
+        "wall_s": round(wall, 3),
+        "researchers_per_min": round(len(results) / wall * 60, 2) if wall > 0 else None,
+        "calls": len(latencies),
+        "latency_p50_s": round(float(np.percentile(lat, 50)), 3),
+        "latency_p95_s": round(float(np.percentile(lat, 95)), 3),
+        "latency_p99_s": round(float(np.percentile(lat, 99)), 3),
+        "latency_max_s": round(float(lat.max()), 3),
+        "retries": dict(gs.RETRY_COUNTS),
+        "error": error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the summaries stage against a fake LLM server")
+    parser.add_argument("--provider", choices=["gemini", "openai", "anthropic"], default="gemini")
+    parser.add_argument("--researchers", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rate-delay", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--initial-backoff", type=float, default=1.0,
+                        help=f"Backoff before the first retry without Retry-After (pipeline default: {gs.INITIAL_BACKOFF:g})")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    groups = synthetic_groups(args.researchers, seed=args.seed)
+    gs.INITIAL_BACKOFF = args.initial_backoff
+
+    env_var = gs.PROVIDERS[args.provider][0]
+    base_url_var = gs.BASE_URLS[args.provider][0]
+    os.environ.setdefault(env_var, "fake-key")
+
+    print(f"{args.researchers} researchers, provider {args.provider}, server {config}")
+    print(f"\n{'workers':>7} {'delay s':>7} {'done':>5} {'wall s':>8} {'res/min':>8} {'calls':>6} "
+          f"{'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'429':>5} {'503':>5} {'other':>5}")
+
+    cases = []
+    for rate_delay in args.rate_delay:
+        for workers in args.workers:
+            # A fresh server per case so rate-limit buckets and counters start clean
+            with FakeLLMServer(config) as server:
+                os.environ[base_url_var] = server.url
+                case = run_case(groups, args.provider, workers, rate_delay)
+                case["server"] = dict(server.stats)
+            cases.append(case)
+            retries = case["retries"]
+            other = sum(v for k, v in retries.items() if k not in ("HTTP 429", "HTTP 503"))
+            print(f"{workers:>7} {rate_delay:>7g} {case['researchers']:>5} {case['wall_s']:>8.1f} "
+                  f"{case['researchers_per_min']:>8.1f} {case['calls']:>6} {case['latency_p50_s']:>6.2f} "
+                  f"{case['latency_p95_s']:>6.2f} {case['latency_p99_s']:>6.2f} {retries.get('HTTP 429', 0):>5} "
+                  f"{retries.get('HTTP 503', 0):>5} {other:>5}", flush=True)
+            if case["error"]:
+                print(f"        failed: {case['error'][:200]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"provider": args.provider, "researchers": args.researchers,
+                       "server": vars(config), "cases": cases}, f, indent=2)
+        print(f"\nResults: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
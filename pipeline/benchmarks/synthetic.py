@@ -0,0 +1,148 @@
+"""
+Synthetic researcher/paper data for the benchmarks.
+
+Writes a Researcher_Profiles-shaped directory ({scholar_id}/profile.json +
+papers.csv, as combine_profiles.py reads it) and the matching enriched CSV
+(as generate_summaries.py writes it, with made-up keywords and summaries).
+Researchers are spread over research fields that share a vocabulary, so the
+embeddings, UMAP layout and topic labels have some structure, and the same
+seed always gives the same files.
+
+Usage:
+    python synthetic.py --researchers 1000 --output-dir ./.cache/data/1k
+"""
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from combine_profiles import build_rows
+from generate_summaries import ENRICHED_COLUMNS
+
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+PAPERS_PER_RESEARCHER = 5
+WORDS_PER_FIELD = 12
+ABSTRACT_WORDS = 60
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "so", "de", "pa", "xo", "ze", "bri", "qua", "tor", "len"]
+COMMON_WORDS = [
+    "a", "novel", "method", "for", "learning", "analysis", "of", "the", "in", "with", "using",
+    "towards", "robust", "efficient", "scalable", "approach", "study", "framework", "data", "model",
+]
+
+
+def make_vocabulary(rng: np.random.Generator, n_words: int) -> list[str]:
+    words = set()
+    while len(words) < n_words:
+        n_syl = rng.integers(2, 5)
+        words.add("".join(rng.choice(SYLLABLES, size=n_syl)))
+    return sorted(words)
+
+
+def generate(n_researchers: int, seed: int = 0, papers_per_researcher: int = PAPERS_PER_RESEARCHER):
+    """Yield (profile, papers, keywords, summary) per researcher."""
+    rng = np.random.default_rng(seed)
+    n_fields = max(8, n_researchers // 250)
+    vocabulary = make_vocabulary(rng, n_fields * WORDS_PER_FIELD)
+    fields = [vocabulary[i * WORDS_PER_FIELD:(i + 1) * WORDS_PER_FIELD] for i in range(n_fields)]
+
+    for r in range(n_researchers):
+        field = fields[rng.integers(n_fields)]
+        # A second field gives researchers some overlap between clusters
+        other = fields[rng.integers(n_fields)]
+        topic_words = field + other[:3]
+        scholar_id = f"SYN{r:07d}"
+        profile = {
+            "author_name": f"Researcher {r}",
+            "scholar_id": scholar_id,
+            "profile_url": f"https://scholar.google.com/citations?user={scholar_id}",
+            "author_affiliation": f"University {rng.integers(500)}",
+            "author_citations": int(rng.lognormal(6, 1.5)),
+            "research_keywords": ", ".join(rng.choice(topic_words, size=4, replace=False)),
+            "homepage": "",
+        }
+
+        papers = []
+        n_papers = max(1, int(rng.poisson(papers_per_researcher)))
+        for p in range(n_papers):
+            title = " ".join(
+                list(rng.choice(COMMON_WORDS, size=3)) + list(rng.choice(topic_words, size=4))
+            )
+            abstract = " ".join(
+                rng.choice(COMMON_WORDS + topic_words * 2, size=ABSTRACT_WORDS)
+            )
+            papers.append({
+                "Title": title.capitalize(),
+                "Citations": str(int(rng.lognormal(2, 1.5))),
+                "Year": str(int(rng.integers(1995, 2026))),
+                "URL": f"https://scholar.google.com/citations?view_op=view_citation&citation_for_view={scholar_id}:{p}",
+                "Description": abstract.capitalize() + ".",
+            })
+
+        keywords = ", ".join(rng.choice(topic_words, size=10, replace=False))
+        summary = (
+            f"{profile['author_name']} works on {', '.join(topic_words[:3])}.\\n"
+            f"Their recent papers study {' and '.join(rng.choice(topic_words, size=2, replace=False))}."
+        )
+        yield profile, papers, keywords, summary
+
+
+def write_dataset(
+    output_dir: Path,
+    n_researchers: int,
+    seed: int = 0,
+    papers_per_researcher: int = PAPERS_PER_RESEARCHER,
+) -> tuple[Path, Path]:
+    """Write <output_dir>/Researcher_Profiles and <output_dir>/enriched.csv; returns both paths."""
+    profiles_dir = output_dir / "Researcher_Profiles"
+    enriched_csv = output_dir / "enriched.csv"
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+
+    tmp_csv = enriched_csv.with_name(enriched_csv.name + ".tmp")
+    with open(tmp_csv, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=ENRICHED_COLUMNS)
+        writer.writeheader()
+        for profile, papers, keywords, summary in generate(n_researchers, seed, papers_per_researcher):
+            researcher_dir = profiles_dir / profile["scholar_id"]
+            researcher_dir.mkdir(exist_ok=True)
+            with open(researcher_dir / "profile.json", "w", encoding="utf-8") as f:
+                json.dump(profile, f)
+            with open(researcher_dir / "papers.csv", "w", newline="", encoding="utf-8") as f:
+                paper_writer = csv.DictWriter(f, fieldnames=["Title", "Citations", "Year", "URL", "Description"])
+                paper_writer.writeheader()
+                paper_writer.writerows(papers)
+
+            for row in build_rows(profile, papers):
+                row["ai_generated_keywords"] = keywords
+                row["ai_generated_summary"] = summary
+                writer.writerow(row)
+    # Written last, so an interrupted generation is redone rather than reused
+    tmp_csv.replace(enriched_csv)
+    return profiles_dir, enriched_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Researcher_Profiles and an enriched CSV")
+    parser.add_argument("--researchers", "-n", type=int, default=SCALES["1k"])
+    parser.add_argument("--output-dir", "-o", type=Path, required=True)
+    parser.add_argument("--papers-per-researcher", type=int, default=PAPERS_PER_RESEARCHER,
+                        help=f"Mean papers per researcher (default: {PAPERS_PER_RESEARCHER})")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profiles_dir, enriched_csv = write_dataset(
+        args.output_dir, args.researchers, seed=args.seed, papers_per_researcher=args.papers_per_researcher,
+    )
+    print(f"Profiles: {profiles_dir}")
+    print(f"Enriched CSV: {enriched_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,43 @@ Combine per-researcher ScholarMine data into a single CSV.
 Reads each Researcher_Profiles/{scholar_id}/profile.json + papers.csv
 and outputs combined_researcher_papers.csv matching the ai-map format.
 
+Inputs may be directories, zip archives or tar archives (optionally
+compressed), and several can be given at once, e.g. one per scrape chunk
+artifact. Archive members are streamed straight into the parser without
+being extracted to disk. When the same researcher appears in more than one
+input, the later input wins, as with merging artifacts into one directory.
+
+Researchers are read concurrently on a thread pool and written in sorted
+directory order, so the output is identical to a sequential run.
+
+A manifest next to the output (combined_researcher_papers.csv.manifest.json)
+records, per researcher, the mtime/size and content hash of its input files
+and the byte range of its rows in the output. On the next run, researchers
+whose files are unchanged (same mtime and size, or failing that the same
+content hash) are copied from the previous output as raw bytes instead of
+being re-parsed, so after a partial rescrape only the touched directories
+cost anything. Use --full to ignore the manifest.
+
 Usage:
     python combine_profiles.py --input ../Researcher_Profiles --output combined_researcher_papers.csv
+    python combine_profiles.py --input chunks/researcher-profiles-*.tar.gz --output combined_researcher_papers.csv
 """
 
 import argparse
 import csv
+import hashlib
+import io
 import json
+import os
 import sys
-from pathlib import Path
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from metrics_utils import Metrics, timed
+from profiling_utils import profiled
 
 
 OUTPUT_COLUMNS = [
@@ -30,79 +58,379 @@ OUTPUT_COLUMNS = [
     "paper_abstract",
 ]
 
+MANIFEST_VERSION = 2
+INPUT_FILES = ("profile.json", "papers.csv")
+
 
-def load_profile(profile_path: Path) -> dict:
-    with open(profile_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def _text(data: bytes) -> io.TextIOWrapper:
+    # Same decoding and newline handling as open(path, "r", encoding="utf-8")
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
 
 
-def load_papers(papers_path: Path) -> list[dict]:
+def load_profile(data: bytes) -> dict:
+    return json.load(_text(data))
+
+
+def load_papers(data: bytes) -> list[dict]:
     rows = []
-    with open(papers_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
+    reader = csv.DictReader(_text(data))
+    for row in reader:
+        rows.append(row)
     return rows
 
 
-def combine(input_dir: Path, output_path: Path) -> None:
-    researcher_dirs = sorted(
-        [d for d in input_dir.iterdir() if d.is_dir()],
-        key=lambda d: d.name,
-    )
+# ---------------------------------------------------------------------------
+# Input sources
+# ---------------------------------------------------------------------------
+
+class DirectorySource:
+    """Researcher_Profiles-style directory: one subdirectory per researcher."""
+
+    def __init__(self, root: Path):
+        self.path = root
+        self.names = [d.name for d in root.iterdir() if d.is_dir()]
+
+    def stats(self, name: str) -> dict[str, list]:
+        stats = {}
+        for filename in INPUT_FILES:
+            path = self.path / name / filename
+            if path.exists():
+                st = path.stat()
+                stats[filename] = [st.st_mtime_ns, st.st_size]
+        return stats
+
+    def read(self, name: str, filename: str) -> bytes:
+        return (self.path / name / filename).read_bytes()
+
+    def close(self) -> None:
+        pass
+
+
+def _archive_member_key(member_name: str):
+    """Map ".../<researcher>/profile.json" to ("<researcher>", "profile.json")."""
+    path = PurePosixPath(member_name)
+    if path.name in INPUT_FILES and len(path.parts) >= 2:
+        return path.parent.name, path.name
+    return None
+
+
+class ZipSource:
+    """Zip archive read member by member; each thread gets its own handle, kept until close()."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._members: dict[str, dict[str, zipfile.ZipInfo]] = {}
+        self._local = threading.local()
+        self._handles: list[zipfile.ZipFile] = []
+        self._handles_lock = threading.Lock()
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                key = _archive_member_key(info.filename)
+                if key is not None and not info.is_dir():
+                    self._members.setdefault(key[0], {})[key[1]] = info
+        self.names = list(self._members)
+
+    def stats(self, name: str) -> dict[str, list]:
+        return {
+            filename: [list(info.date_time), info.file_size, info.CRC]
+            for filename, info in self._members[name].items()
+        }
+
+    def read(self, name: str, filename: str) -> bytes:
+        zf = getattr(self._local, "zf", None)
+        if zf is None:
+            zf = self._local.zf = zipfile.ZipFile(self.path)
+            with self._handles_lock:
+                self._handles.append(zf)
+        return zf.read(self._members[name][filename])
+
+    def close(self) -> None:
+        with self._handles_lock:
+            handles, self._handles = self._handles, []
+        for zf in handles:
+            zf.close()
+        # Threads that read again after close() open a fresh handle
+        self._local = threading.local()
+
+
+class TarSource:
+    """Tar archive (any compression), streamed once into memory.
+
+    Compressed tars can't be read out of order cheaply, so the archive is
+    scanned sequentially on open and only the profile members are kept.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._members: dict[str, dict[str, tuple[list, bytes]]] = {}
+        with tarfile.open(path, "r:*") as tf:
+            for info in tf:
+                key = _archive_member_key(info.name)
+                if key is None or not info.isfile():
+                    continue
+                data = tf.extractfile(info).read()
+                self._members.setdefault(key[0], {})[key[1]] = ([int(info.mtime), info.size], data)
+        self.names = list(self._members)
+
+    def stats(self, name: str) -> dict[str, list]:
+        return {filename: stat for filename, (stat, _) in self._members[name].items()}
+
+    def read(self, name: str, filename: str) -> bytes:
+        return self._members[name][filename][1]
+
+    def close(self) -> None:
+        pass
+
+
+def open_source(path: Path):
+    if path.is_dir():
+        return DirectorySource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    if tarfile.is_tarfile(path):
+        return TarSource(path)
+    raise ValueError(f"Not a directory, zip or tar archive: {path}")
+
+
+def _cell(value) -> str:
+    # What csv.writer would store, so in-memory rows match rows read back from the CSV
+    return "" if value is None else str(value)
+
+
+def build_rows(profile: dict, papers: list[dict]) -> list[dict]:
+    rows = []
+    for paper in papers:
+        description = paper.get("Description", "")
+        if description == "Description not available":
+            description = ""
+
+        rows.append({k: _cell(v) for k, v in {
+            "researcher_name": profile.get("author_name", ""),
+            "profile_url": profile.get("profile_url", ""),
+            "google_scholar_id": profile.get("scholar_id", ""),
+            "affiliation": profile.get("author_affiliation", ""),
+            "researcher_total_citations": profile.get("author_citations", ""),
+            "researcher_keywords": profile.get("research_keywords", ""),
+            "researcher_homepage": profile.get("homepage", ""),
+            "paper_title": paper.get("Title", ""),
+            "paper_citations": paper.get("Citations", ""),
+            "paper_year": paper.get("Year", ""),
+            "paper_url": paper.get("URL", ""),
+            "paper_abstract": description,
+        }.items()})
+    return rows
+
+
+def encode_rows(rows: list[dict]) -> bytes:
+    """Serialize rows exactly as csv.DictWriter writes them into the output."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=OUTPUT_COLUMNS)
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
 
-    if not researcher_dirs:
-        print(f"No researcher directories found in {input_dir}", file=sys.stderr)
-        sys.exit(1)
+# ---------------------------------------------------------------------------
+# Incremental manifest
+# ---------------------------------------------------------------------------
+
+def manifest_path_for(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".manifest.json")
+
+
+def content_hash(blobs: dict[str, bytes]) -> str:
+    h = hashlib.sha256()
+    for filename in INPUT_FILES:
+        h.update(filename.encode())
+        h.update(blobs[filename])
+    return h.hexdigest()
+
+
+def output_fingerprint(output_path: Path) -> list:
+    # Content-based so the manifest survives a git checkout, which resets mtimes
+    h = hashlib.sha256()
+    with open(output_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return [output_path.stat().st_size, h.hexdigest()]
+
+
+def load_manifest(output_path: Path) -> dict:
+    """Return the previous run's per-researcher entries, or {} if they can't be trusted."""
+    manifest_path = manifest_path_for(output_path)
+    if not manifest_path.exists() or not output_path.exists():
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("output") != output_fingerprint(output_path)
+    ):
+        # Output was edited or rewritten outside this script; byte ranges are stale
+        return {}
+    return manifest.get("entries", {})
+
+
+def save_manifest(output_path: Path, entries: dict) -> None:
+    manifest_path = manifest_path_for(output_path)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": MANIFEST_VERSION,
+            "output": output_fingerprint(output_path),
+            "entries": entries,
+        }, f)
+    os.replace(tmp_path, manifest_path)
+
+
+# ---------------------------------------------------------------------------
+# Combine
+# ---------------------------------------------------------------------------
+
+def read_researcher(source, name: str, previous: dict | None) -> dict:
+    """Parse one researcher, or mark it reusable from the previous output.
+
+    Returns a dict with "status" set to "skipped", "reused" or "parsed".
+    """
+    stats = source.stats(name)
+    for filename in INPUT_FILES:
+        if filename not in stats:
+            return {"status": "skipped", "reason": f"no {filename}"}
+
+    stats = [stats[filename] for filename in INPUT_FILES]
+    if previous is not None and previous["stats"] == stats:
+        return {"status": "reused", "stats": stats, "hash": previous["hash"]}
+
+    blobs = {filename: source.read(name, filename) for filename in INPUT_FILES}
+    digest = content_hash(blobs)
+    if previous is not None and previous["hash"] == digest:
+        # Touched but not changed (e.g. re-extracted artifact): still reusable
+        return {"status": "reused", "stats": stats, "hash": digest}
+
+    profile = load_profile(blobs["profile.json"])
+    papers = load_papers(blobs["papers.csv"])
+    rows = build_rows(profile, papers)
+    return {
+        "status": "parsed",
+        "stats": stats,
+        "hash": digest,
+        "rows": rows,
+        "papers": len(rows),
+    }
+
+
+def combine(
+    inputs: list[Path],
+    output_path: Path | None,
+    workers: int = 8,
+    incremental: bool = True,
+    metrics=None,
+) -> list[dict]:
+    """Combine researcher profiles and return the combined rows.
+
+    The rows are also written to output_path (with its manifest) unless it is
+    None, which is how the in-process pipeline skips the CSV checkpoint.
+    """
+    if isinstance(inputs, (str, Path)):
+        inputs = [inputs]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Archives are scanned concurrently; later inputs override earlier ones
+        with timed(metrics, "scan") as record:
+            sources = list(pool.map(open_source, [Path(p) for p in inputs]))
+            owner = {}
+            for source in sources:
+                for name in source.names:
+                    owner[name] = source
+            researchers = sorted(owner)
+            record["items"] = len(researchers)
+
+        if not researchers:
+            print(f"No researcher directories found in {', '.join(map(str, inputs))}", file=sys.stderr)
+            sys.exit(1)
+
+        previous_entries = load_manifest(output_path) if incremental and output_path is not None else {}
+
+        with timed(metrics, "read", items=len(researchers)):
+            try:
+                results = list(pool.map(
+                    lambda name: read_researcher(owner[name], name, previous_entries.get(name)),
+                    researchers,
+                ))
+            finally:
+                for source in sources:
+                    source.close()
 
     total_papers = 0
     skipped = 0
+    reused = 0
+    entries = {}
+    combined_rows = []
+
+    with timed(metrics, "write") as record:
+        if output_path is None:
+            for name, result in zip(researchers, results):
+                if result["status"] == "skipped":
+                    print(f"  Skipping {name}: {result['reason']}", file=sys.stderr)
+                    skipped += 1
+                    continue
+                combined_rows.extend(result["rows"])
+                total_papers += result["papers"]
+        else:
+            # Write to a temp file first: reused rows are copied out of the old output
+            tmp_path = output_path.with_name(output_path.name + ".tmp")
+            previous_output = open(output_path, "rb") if previous_entries else None
+            try:
+                with open(tmp_path, "wb") as out:
+                    header = io.StringIO()
+                    csv.DictWriter(header, fieldnames=OUTPUT_COLUMNS).writeheader()
+                    out.write(header.getvalue().encode("utf-8"))
+
+                    for name, result in zip(researchers, results):
+                        if result["status"] == "skipped":
+                            print(f"  Skipping {name}: {result['reason']}", file=sys.stderr)
+                            skipped += 1
+                            continue
 
-    with open(output_path, "w", newline="", encoding="utf-8") as out:
-        writer = csv.DictWriter(out, fieldnames=OUTPUT_COLUMNS)
-        writer.writeheader()
-
-        for rdir in researcher_dirs:
-            profile_path = rdir / "profile.json"
-            papers_path = rdir / "papers.csv"
-
-            if not profile_path.exists():
-                print(f"  Skipping {rdir.name}: no profile.json", file=sys.stderr)
-                skipped += 1
-                continue
-
-            if not papers_path.exists():
-                print(f"  Skipping {rdir.name}: no papers.csv", file=sys.stderr)
-                skipped += 1
-                continue
-
-            profile = load_profile(profile_path)
-            papers = load_papers(papers_path)
-
-            for paper in papers:
-                description = paper.get("Description", "")
-                if description == "Description not available":
-                    description = ""
-
-                writer.writerow({
-                    "researcher_name": profile.get("author_name", ""),
-                    "profile_url": profile.get("profile_url", ""),
-                    "google_scholar_id": profile.get("scholar_id", ""),
-                    "affiliation": profile.get("author_affiliation", ""),
-                    "researcher_total_citations": profile.get("author_citations", ""),
-                    "researcher_keywords": profile.get("research_keywords", ""),
-                    "researcher_homepage": profile.get("homepage", ""),
-                    "paper_title": paper.get("Title", ""),
-                    "paper_citations": paper.get("Citations", ""),
-                    "paper_year": paper.get("Year", ""),
-                    "paper_url": paper.get("URL", ""),
-                    "paper_abstract": description,
-                })
-                total_papers += 1
-
-    print(f"Combined {total_papers} papers from {len(researcher_dirs) - skipped} researchers")
+                        if result["status"] == "reused":
+                            prev = previous_entries[name]
+                            previous_output.seek(prev["start"])
+                            data = previous_output.read(prev["end"] - prev["start"])
+                            combined_rows.extend(csv.DictReader(_text(data), fieldnames=OUTPUT_COLUMNS))
+                            papers = prev["papers"]
+                            reused += 1
+                        else:
+                            data = encode_rows(result["rows"])
+                            combined_rows.extend(result["rows"])
+                            papers = result["papers"]
+
+                        start = out.tell()
+                        out.write(data)
+                        entries[name] = {
+                            "stats": result["stats"],
+                            "hash": result["hash"],
+                            "start": start,
+                            "end": out.tell(),
+                            "papers": papers,
+                        }
+                        total_papers += papers
+            finally:
+                if previous_output is not None:
+                    previous_output.close()
+
+            os.replace(tmp_path, output_path)
+            save_manifest(output_path, entries)
+
+        record["items"] = total_papers
+
+    print(f"Combined {total_papers} papers from {len(researchers) - skipped} researchers")
+    print(f"Reused {reused} unchanged researchers, parsed {len(researchers) - skipped - reused}")
     print(f"Skipped {skipped} directories")
-    print(f"Output: {output_path}")
+    if output_path is not None:
+        print(f"Output: {output_path}")
+    return combined_rows
 
 
 def main():
@@ -110,8 +438,9 @@ def main():
     parser.add_argument(
         "--input", "-i",
         type=Path,
+        nargs="+",
         required=True,
-        help="Path to Researcher_Profiles directory",
+        help="Researcher_Profiles directories and/or zip/tar archives of them",
     )
     parser.add_argument(
         "--output", "-o",
@@ -119,13 +448,41 @@ def main():
         default=Path("combined_researcher_papers.csv"),
         help="Output CSV path (default: combined_researcher_papers.csv)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Threads used to read researcher directories (default: 8)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest and re-parse every directory",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        help="Write per-step timing and memory metrics to this JSON file",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="DIR",
+        help="Write cProfile stats and collapsed stacks for this run to DIR",
+    )
     args = parser.parse_args()
 
-    if not args.input.is_dir():
-        print(f"Input directory does not exist: {args.input}", file=sys.stderr)
-        sys.exit(1)
+    for path in args.input:
+        if not path.exists():
+            print(f"Input does not exist: {path}", file=sys.stderr)
+            sys.exit(1)
 
-    combine(args.input, args.output)
+    metrics = Metrics("combine") if args.metrics else None
+    with profiled("combine", args.profile, all_threads=True):
+        combine(args.input, args.output, workers=args.workers, incremental=not args.full, metrics=metrics)
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
 
 
 if __name__ == "__main__":
@@ -4,105 +4,267 @@ Download researcher profile images from Google Scholar.
 Reads the enriched CSV (or embeddings.csv) to get scholar IDs, downloads
 each researcher's profile photo, and saves to an output directory.
 
+Photos are fetched on a thread pool (--workers) with at most --per-host
+requests in flight to any one host, and request starts to a host spaced at
+least --delay seconds apart, so adding workers never makes us less polite.
+
+The ETag and Last-Modified of every photo are kept in a sidecar
+(.image_validators.json, hidden so it isn't published with the images).
+Photos last checked more than --refresh-after days ago are re-requested
+conditionally; an unchanged photo costs a 304 and no download, a changed one
+is replaced. Newer photos are left alone. id_to_image_mapping.json and the
+sidecar are rewritten every few completions, so an interrupted run keeps
+what it fetched.
+
 Usage:
     python download_images.py --input enriched.csv --output-dir ./public/images/researchers
+    python download_images.py --input enriched.csv --output-dir ./public/images/researchers --refresh-after 0
 """
 
 import argparse
 import csv
 import json
+import os
+import threading
 import time
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from urllib.parse import urlparse
 
+from metrics_utils import Metrics, timed
+from profiling_utils import profiled
 
 PHOTO_URL_TEMPLATE = "https://scholar.googleusercontent.com/citations?view_op=view_photo&user={}&citpid=2"
 DEFAULT_AVATAR = "https://scholar.google.com/citations/images/avatar_scholar_256.png"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+MAPPING_FILE = "id_to_image_mapping.json"
+VALIDATORS_FILE = ".image_validators.json"
+REFRESH_AFTER_DAYS = 7.0
+FLUSH_EVERY = 50
+
+
+class HostLimiter:
+    """Per-host cap on concurrent requests plus a minimum gap between request starts."""
+
+    def __init__(self, per_host: int, delay: float):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+
+    def acquire(self, host: str) -> None:
+        with self._lock:
+            slots = self._slots.setdefault(host, threading.Semaphore(self.per_host))
+        slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        time.sleep(start - now)
+
+    def release(self, host: str) -> None:
+        self._slots[host].release()
+
 
+def fetch_image(url: str, filepath: Path, validators: dict | None = None, timeout: int = 10) -> tuple[str, dict]:
+    """Fetch url into filepath, conditionally if validators (etag / last_modified) are given.
 
-def download_image(url: str, filepath: Path, timeout: int = 10) -> bool:
-    req = urllib.request.Request(url, headers={
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    })
+    Returns (status, validators) with status "downloaded", "not_modified" or
+    "failed". The file is only replaced by a complete image.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    req = urllib.request.Request(url, headers=headers)
     try:
         with urllib.request.urlopen(req, timeout=timeout) as resp:
             content_type = resp.headers.get("Content-Type", "")
             if not content_type.startswith("image/"):
-                return False
+                return "failed", validators or {}
             data = resp.read()
             if len(data) == 0:
-                return False
-            with open(filepath, "wb") as f:
+                return "failed", validators or {}
+            tmp_path = filepath.with_name(filepath.name + ".tmp")
+            with open(tmp_path, "wb") as f:
                 f.write(data)
-            return True
+            os.replace(tmp_path, filepath)
+            return "downloaded", {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return "not_modified", validators or {}
+        print(f"    Error: {e}")
+        return "failed", validators or {}
     except Exception as e:
         print(f"    Error: {e}")
-        return False
+        return "failed", validators or {}
 
 
-def get_unique_researchers(input_path: Path) -> list[dict]:
+def _load_json(path: Path) -> dict:
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            pass
+    return {}
+
+
+def _save_json(path: Path, data: dict, indent: int | None = None) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+
+def unique_researchers(rows) -> list[dict]:
     seen = set()
     researchers = []
-    with open(input_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sid = row.get("google_scholar_id", "")
-            if sid and sid not in seen:
-                seen.add(sid)
-                researchers.append({
-                    "name": row.get("researcher_name", ""),
-                    "google_scholar_id": sid,
-                })
+    for row in rows:
+        sid = row.get("google_scholar_id", "")
+        if sid and sid not in seen:
+            seen.add(sid)
+            researchers.append({
+                "name": row.get("researcher_name", ""),
+                "google_scholar_id": sid,
+            })
     return researchers
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Download researcher profile images")
-    parser.add_argument("--input", "-i", type=Path, required=True, help="CSV with google_scholar_id column")
-    parser.add_argument("--output-dir", "-o", type=Path, default=Path("public/images/researchers"))
-    parser.add_argument("--delay", type=float, default=0.5, help="Seconds between downloads (default: 0.5)")
-    args = parser.parse_args()
+def get_unique_researchers(input_path: Path) -> list[dict]:
+    with open(input_path, "r", encoding="utf-8") as f:
+        return unique_researchers(csv.DictReader(f))
 
-    args.output_dir.mkdir(parents=True, exist_ok=True)
 
-    researchers = get_unique_researchers(args.input)
-    print(f"Found {len(researchers)} unique researchers")
+def download_images(
+    researchers: list[dict],
+    output_dir: Path,
+    delay: float = 0.5,
+    workers: int = 8,
+    per_host: int = 2,
+    refresh_after_days: float = REFRESH_AFTER_DAYS,
+    url_template: str = PHOTO_URL_TEMPLATE,
+    metrics=None,
+) -> dict[str, str]:
+    """Download photos for researchers ({"name", "google_scholar_id"} dicts).
 
-    downloaded = 0
-    skipped = 0
-    failed = 0
+    Returns and saves the scholar id -> image path mapping.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    mapping_path = output_dir / MAPPING_FILE
+    validators_path = output_dir / VALIDATORS_FILE
+    validators = _load_json(validators_path)
+
+    counts = {"downloaded": 0, "not_modified": 0, "cached": 0, "failed": 0}
     mapping = {}
+    refresh_before = time.time() - refresh_after_days * 86400
 
-    for i, r in enumerate(researchers):
+    todo = []
+    for r in researchers:
         sid = r["google_scholar_id"]
-        name = r["name"]
-        filename = f"{sid}.jpg"
-        filepath = args.output_dir / filename
-
-        if filepath.exists() and filepath.stat().st_size > 0:
-            print(f"  [{i+1}/{len(researchers)}] {name} — cached")
-            mapping[sid] = f"images/researchers/{filename}"
-            skipped += 1
-            continue
+        filepath = output_dir / f"{sid}.jpg"
+        have_file = filepath.exists() and filepath.stat().st_size > 0
+        if have_file:
+            mapping[sid] = f"images/researchers/{filepath.name}"
+            # Files from before the sidecar existed count as checked when first seen
+            checked = validators.setdefault(sid, {"checked": time.time()}).get("checked", 0)
+            if checked >= refresh_before:
+                counts["cached"] += 1
+                continue
+        todo.append((r, filepath, have_file))
 
-        url = PHOTO_URL_TEMPLATE.format(sid)
-        print(f"  [{i+1}/{len(researchers)}] {name} — downloading")
+    print(f"{counts['cached']} cached, {len(todo)} to fetch or revalidate")
+    _save_json(mapping_path, mapping, indent=2)
 
-        if download_image(url, filepath):
-            mapping[sid] = f"images/researchers/{filename}"
-            downloaded += 1
-        else:
-            failed += 1
+    limiter = HostLimiter(per_host, delay)
+    lock = threading.Lock()
 
-        time.sleep(args.delay)
+    def fetch(r: dict, filepath: Path, have_file: bool) -> str:
+        sid = r["google_scholar_id"]
+        url = url_template.format(sid)
+        host = urlparse(url).netloc
+        limiter.acquire(host)
+        try:
+            status, new_validators = fetch_image(url, filepath, validators.get(sid) if have_file else None)
+        finally:
+            limiter.release(host)
+        with lock:
+            if status != "failed":
+                validators[sid] = {**new_validators, "checked": time.time()}
+                mapping[sid] = f"images/researchers/{filepath.name}"
+        return status
 
-    # Save mapping
-    mapping_path = args.output_dir / "id_to_image_mapping.json"
-    with open(mapping_path, "w") as f:
-        json.dump(mapping, f, indent=2)
+    with timed(metrics, "download", items=len(todo)):
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            futures = {pool.submit(fetch, *item): item for item in todo}
+            for i, future in enumerate(as_completed(futures)):
+                r, _, have_file = futures[future]
+                status = future.result()
+                if status == "failed" and have_file:
+                    status = "cached"  # keep the old photo
+                counts[status] += 1
+                print(f"  [{i+1}/{len(todo)}] {r['name']} — {status.replace('_', ' ')}", flush=True)
+                if (i + 1) % FLUSH_EVERY == 0:
+                    with lock:
+                        _save_json(mapping_path, mapping, indent=2)
+                        _save_json(validators_path, validators)
+        finally:
+            pool.shutdown(cancel_futures=True)
+            with lock:
+                _save_json(mapping_path, mapping, indent=2)
+                _save_json(validators_path, validators)
 
-    print(f"\nDone: {downloaded} downloaded, {skipped} cached, {failed} failed")
+    print(f"\nDone: {counts['downloaded']} downloaded, {counts['not_modified']} unchanged (304), "
+          f"{counts['cached']} cached, {counts['failed']} failed")
     print(f"Mapping: {mapping_path}")
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download researcher profile images")
+    parser.add_argument("--input", "-i", type=Path, required=True, help="CSV with google_scholar_id column")
+    parser.add_argument("--output-dir", "-o", type=Path, default=Path("public/images/researchers"))
+    parser.add_argument("--delay", type=float, default=0.5,
+                        help="Minimum seconds between request starts to the same host (default: 0.5)")
+    parser.add_argument("--workers", type=int, default=8, help="Download threads (default: 8)")
+    parser.add_argument("--per-host", type=int, default=2, help="Concurrent requests per host (default: 2)")
+    parser.add_argument("--refresh-after", type=float, default=REFRESH_AFTER_DAYS, metavar="DAYS",
+                        help=f"Revalidate photos last checked more than DAYS ago (default: {REFRESH_AFTER_DAYS:g})")
+    parser.add_argument("--url-template", default=PHOTO_URL_TEMPLATE, help="Photo URL with {} for the scholar id")
+    parser.add_argument("--metrics", type=Path, help="Write per-step timing and memory metrics to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Write cProfile stats and collapsed stacks for this run to DIR")
+    args = parser.parse_args()
+
+    metrics = Metrics("images") if args.metrics else None
+    with profiled("images", args.profile, all_threads=True):
+        with timed(metrics, "load") as record:
+            researchers = get_unique_researchers(args.input)
+            record["items"] = len(researchers)
+        print(f"Found {len(researchers)} unique researchers")
+
+        download_images(
+            researchers, args.output_dir,
+            delay=args.delay,
+            workers=args.workers,
+            per_host=args.per_host,
+            refresh_after_days=args.refresh_after,
+            url_template=args.url_template,
+            metrics=metrics,
+        )
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
 
 
 if __name__ == "__main__":
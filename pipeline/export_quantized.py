@@ -0,0 +1,319 @@
+"""
+Compact researcher and paper embeddings for client-side search.
+
+data.ndjson carries every researcher's full 384-dim float vector as JSON
+text. This writes a binary export instead, for each corpus (researchers in
+researcher_index.json order, papers in papers/ order):
+
+  1. PCA: fit on (a sample of) the unit vectors; keep the top
+     max(--dim, --rerank-dim) components. An item is (x - mean) @ C.T; a
+     query is just C @ q, since the mean's contribution q . mean is the same
+     for every item and doesn't change the ranking.
+  2. Quantize the first --dim reduced dimensions with one scale per
+     dimension: int8 (--bits 8, round(x / scale), scale = max|x| / 127) or
+     sign bits packed 8 per byte (--bits 1, value +-scale, scale = mean |x|).
+  3. Keep the first --rerank-dim (at least --dim) reduced dimensions as
+     float16: a client scores every code, then re-scores only the best
+     --rerank candidates against these rows (fixed-width, so fetchable by
+     HTTP range request). This rerank is approximate too: it drops the
+     components past --rerank-dim and rounds to float16, so it recovers
+     what quantization loses but not what the PCA truncation does. Exact
+     scores need the full-dimension vectors (researcher_embeddings.npy,
+     papers/embeddings.npy); recall_reranked in the manifest measures the
+     gap against them.
+
+Files in <output-dir> (default <data-dir>/quantized), all little-endian:
+
+    manifest.json          per corpus: sizes, byte offset / dtype / shape of
+                           every section, and the recall report
+    <corpus>.bin           components (float32 rerank_dim x input_dim),
+                           scales (float32 dim), codes (int8 n x dim, or
+                           uint8 n x dim/8 sign bits)
+    <corpus>.reduced.bin   float16 n x rerank_dim PCA projections
+
+Before the export is fitted on everything, the same settings are fitted on
+all but RECALL_QUERIES held-out rows, which are then used as queries against
+the rest: recall@k of the codes alone and after reranking, against exact
+full-precision search, goes into the manifest. --sweep reports that for a
+grid of dims and bit widths so the smallest payload that keeps ranking
+quality can be picked.
+
+Usage:
+    python export_quantized.py --data-dir ./output --dim 64 --bits 8
+    python export_quantized.py --data-dir ./output --sweep
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ann_index import exact_top_k
+from metrics_utils import Metrics, timed
+from paper_index import PAPERS_DIR
+from profiling_utils import profiled
+from similarity import MATRIX_FILE
+
+
+EXPORT_DIR = "quantized"
+DEFAULT_DIM = 64
+DEFAULT_BITS = 8
+DEFAULT_RERANK_DIM = 128
+RERANK = 50
+RECALL_QUERIES = 500
+TRAIN_SAMPLE = 65536
+BLOCK_ROWS = 65536
+SWEEP_DIMS = [32, 64, 128, 256]
+SWEEP_BITS = [1, 8]
+
+
+# ---------------------------------------------------------------------------
+# PCA + quantization
+# ---------------------------------------------------------------------------
+
+def fit_pca(vectors: np.ndarray, n_components: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """(mean, components n_components x dim) from a sample of up to TRAIN_SAMPLE rows."""
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[rng.choice(len(vectors), size=min(len(vectors), TRAIN_SAMPLE), replace=False)],
+                        dtype=np.float32)
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    components = np.zeros((n_components, vectors.shape[1]), dtype=np.float32)
+    # Fewer samples than components: the rest stay zero
+    components[:min(n_components, len(vt))] = vt[:n_components]
+    return mean, components
+
+
+def project(vectors: np.ndarray, mean: np.ndarray, components: np.ndarray) -> np.ndarray:
+    out = np.empty((len(vectors), len(components)), dtype=np.float32)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        out[start:start + BLOCK_ROWS] = (np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32) - mean) @ components.T
+    return out
+
+
+def quantize(reduced: np.ndarray, bits: int) -> tuple[np.ndarray, np.ndarray]:
+    """(codes, per-dimension scales) of reduced vectors."""
+    if bits == 8:
+        scales = np.abs(reduced).max(axis=0) / 127
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(reduced / scales), -127, 127).astype(np.int8)
+    elif bits == 1:
+        scales = np.abs(reduced).mean(axis=0)
+        codes = np.packbits(reduced > 0, axis=1)
+    else:
+        raise ValueError(f"bits must be 1 or 8, got {bits}")
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedExport:
+    def __init__(self, components: np.ndarray, scales: np.ndarray, codes: np.ndarray, reduced: np.ndarray, bits: int):
+        self.components = components
+        self.scales = scales
+        self.codes = codes
+        # float16 rerank_dim-dim projections, not the input vectors
+        self.reduced = reduced
+        self.bits = bits
+
+    @property
+    def dim(self) -> int:
+        return len(self.scales)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, dim: int = DEFAULT_DIM, bits: int = DEFAULT_BITS,
+              rerank_dim: int = DEFAULT_RERANK_DIM, seed: int = 0) -> "QuantizedExport":
+        if bits == 1 and dim % 8:
+            raise ValueError(f"--bits 1 needs --dim divisible by 8, got {dim}")
+        # Reranking with fewer dimensions than the codes would undo them
+        rerank_dim = max(dim, rerank_dim)
+        mean, components = fit_pca(vectors, rerank_dim, seed)
+        reduced = project(vectors, mean, components)
+        codes, scales = quantize(reduced[:, :dim], bits)
+        return cls(components, scales, codes, reduced.astype(np.float16), bits)
+
+    def bytes_per_row(self) -> dict:
+        return {"codes": int(self.codes.shape[1]), "reduced": int(self.reduced.shape[1] * 2)}
+
+    def coarse_scores(self, query_reduced: np.ndarray) -> np.ndarray:
+        weights = query_reduced[:self.dim] * self.scales
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            block = self.codes[start:start + BLOCK_ROWS]
+            if self.bits == 1:
+                block = np.unpackbits(block, axis=1, count=self.dim).astype(np.float32) * 2 - 1
+            out[start:start + len(block)] = block.astype(np.float32) @ weights
+        return out
+
+    def search(self, query: np.ndarray, k: int = 10, rerank: int = RERANK) -> np.ndarray:
+        """Rows of the k best items for one unit query: codes, then the best `rerank` re-scored on the reduced rows."""
+        query_reduced = self.components @ np.asarray(query, dtype=np.float32)
+        scores = self.coarse_scores(query_reduced)
+        n_keep = min(max(k, rerank), len(scores))
+        candidates = np.argpartition(scores, len(scores) - n_keep)[len(scores) - n_keep:]
+        if rerank > 0:
+            scores = np.zeros(len(self.codes), dtype=np.float32)
+            scores[candidates] = self.reduced[candidates].astype(np.float32) @ query_reduced[:self.reduced.shape[1]]
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(scores[candidates], len(candidates) - k)[len(candidates) - k:]]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+
+# ---------------------------------------------------------------------------
+# Recall report
+# ---------------------------------------------------------------------------
+
+def evaluate(vectors: np.ndarray, dim: int = DEFAULT_DIM, bits: int = DEFAULT_BITS,
+             rerank_dim: int = DEFAULT_RERANK_DIM, k: int = 10, rerank: int = RERANK,
+             n_queries: int = RECALL_QUERIES, seed: int = 0) -> dict:
+    """recall@k of an export fitted without RECALL_QUERIES held-out rows, queried with those rows."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    n_held = min(n_queries, len(vectors) // 10)
+    if n_held == 0 or len(vectors) - n_held < k:
+        return {"k": k, "queries": 0}
+    held = np.zeros(len(vectors), dtype=bool)
+    held[rng.choice(len(vectors), size=n_held, replace=False)] = True
+    base, queries = vectors[~held], vectors[held]
+
+    export = QuantizedExport.build(base, dim, bits, rerank_dim, seed)
+    truth = exact_top_k(base, queries, k)
+    hits = {"codes": 0, "reranked": 0}
+    elapsed = 0.0
+    for query, expected in zip(queries, truth):
+        expected = set(expected.tolist())
+        hits["codes"] += len(expected & set(export.search(query, k, rerank=0).tolist()))
+        start = time.perf_counter()
+        hits["reranked"] += len(expected & set(export.search(query, k, rerank=rerank).tolist()))
+        elapsed += time.perf_counter() - start
+    return {
+        "k": k,
+        "queries": int(n_held),
+        "recall_codes": round(hits["codes"] / truth.size, 4),
+        "recall_reranked": round(hits["reranked"] / truth.size, 4),
+        "rerank": rerank,
+        "query_ms": round(elapsed / n_held * 1000, 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def save_export(export: QuantizedExport, output_dir: Path, name: str) -> dict:
+    """Write <name>.bin and <name>.reduced.bin; returns the manifest entry."""
+    sections = {}
+    with open(output_dir / f"{name}.bin", "wb") as f:
+        for section, array, dtype in [
+            ("components", export.components, "<f4"),
+            ("scales", export.scales, "<f4"),
+            ("codes", export.codes, "i1" if export.bits == 8 else "u1"),
+        ]:
+            data = np.ascontiguousarray(array, dtype=dtype)
+            sections[section] = {"offset": f.tell(), "dtype": data.dtype.name, "shape": list(data.shape)}
+            f.write(data.tobytes())
+    reduced = np.ascontiguousarray(export.reduced, dtype="<f2")
+    with open(output_dir / f"{name}.reduced.bin", "wb") as f:
+        f.write(reduced.tobytes())
+    return {
+        "n": int(len(export.codes)),
+        "input_dim": int(export.components.shape[1]),
+        "dim": export.dim,
+        "bits": export.bits,
+        "rerank_dim": int(reduced.shape[1]),
+        "blob": f"{name}.bin",
+        "sections": sections,
+        "reduced_blob": f"{name}.reduced.bin",
+        "reduced_dtype": "float16",
+        # Reranking on the reduced rows still isn't exact search
+        "rerank_exact": False,
+        "bytes_per_row": export.bytes_per_row(),
+    }
+
+
+def corpora(data_dir: Path) -> dict[str, np.ndarray]:
+    """The unit embedding matrices to export, memory-mapped: researchers, and papers if indexed."""
+    found = {"researchers": np.load(data_dir / MATRIX_FILE, mmap_mode="r")}
+    if (data_dir / PAPERS_DIR / "embeddings.npy").exists():
+        found["papers"] = np.load(data_dir / PAPERS_DIR / "embeddings.npy", mmap_mode="r")
+    return found
+
+
+def export_quantized(data_dir: Path, output_dir: Path, dim: int = DEFAULT_DIM, bits: int = DEFAULT_BITS,
+                     rerank_dim: int = DEFAULT_RERANK_DIM, rerank: int = RERANK, k: int = 10,
+                     metrics=None) -> dict:
+    """Evaluate, build and write the export for every corpus; returns the manifest."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"format": 1, "corpora": {}}
+    for name, vectors in corpora(data_dir).items():
+        with timed(metrics, f"evaluate_{name}", items=len(vectors)):
+            report = evaluate(vectors, dim, bits, rerank_dim, k=k, rerank=rerank)
+        with timed(metrics, f"export_{name}", items=len(vectors)):
+            export = QuantizedExport.build(np.asarray(vectors, dtype=np.float32), dim, bits, rerank_dim)
+            entry = save_export(export, output_dir, name)
+        entry["recall"] = report
+        manifest["corpora"][name] = entry
+    with open(output_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def print_report(name: str, entry: dict) -> None:
+    sizes = entry["bytes_per_row"]
+    report = entry["recall"]
+    line = (f"{name:<12} {entry['n']:>8} rows  dim {entry['dim']:>3} x {entry['bits']}-bit = {sizes['codes']:>4} B/row"
+            f"  (+{sizes['reduced']} B reduced)")
+    if report.get("queries"):
+        line += (f"  recall@{report['k']}: codes {report['recall_codes']:.3f},"
+                 f" reranked top {report['rerank']} {report['recall_reranked']:.3f}")
+    print(line)
+
+
+def sweep(data_dir: Path, rerank_dim: int, rerank: int, k: int) -> None:
+    for name, vectors in corpora(data_dir).items():
+        print(f"\n{name} ({len(vectors)} rows, float32 {vectors.shape[1] * 4} B/row)")
+        print(f"  {'dim':>4} {'bits':>4} {'B/row':>6} {'codes':>7} {'reranked':>9}")
+        for dim in SWEEP_DIMS:
+            for bits in SWEEP_BITS:
+                report = evaluate(vectors, dim, bits, rerank_dim, k=k, rerank=rerank)
+                if not report.get("queries"):
+                    continue
+                size = dim if bits == 8 else dim // 8
+                print(f"  {dim:>4} {bits:>4} {size:>6} {report['recall_codes']:>7.3f} {report['recall_reranked']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PCA-reduced, quantized embeddings for client-side search")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--output-dir", type=Path, default=None, help=f"Default: <data-dir>/{EXPORT_DIR}")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help=f"Quantized PCA dimensions (default: {DEFAULT_DIM})")
+    parser.add_argument("--bits", type=int, choices=[1, 8], default=DEFAULT_BITS, help="Bits per dimension (default: 8)")
+    parser.add_argument("--rerank-dim", type=int, default=DEFAULT_RERANK_DIM,
+                        help=f"float16 PCA dimensions kept for (approximate) reranking (default: {DEFAULT_RERANK_DIM})")
+    parser.add_argument("--rerank", type=int, default=RERANK, help=f"Candidates reranked per query (default: {RERANK})")
+    parser.add_argument("-k", type=int, default=10, help="k for the recall@k report (default: 10)")
+    parser.add_argument("--sweep", action="store_true", help="Only report recall for a grid of --dim / --bits")
+    parser.add_argument("--metrics", type=Path, help="Write per-step timing and memory metrics to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Write a cProfile .pstats and a collapsed-stack file for this stage to DIR")
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args.data_dir, args.rerank_dim, args.rerank, args.k)
+        return
+
+    output_dir = args.output_dir or args.data_dir / EXPORT_DIR
+    metrics = Metrics("quantize") if args.metrics else None
+    with profiled("quantize", args.profile):
+        manifest = export_quantized(args.data_dir, output_dir, args.dim, args.bits, args.rerank_dim,
+                                    args.rerank, args.k, metrics=metrics)
+    for name, entry in manifest["corpora"].items():
+        print_report(name, entry)
+    print(f"Export: {output_dir}/")
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
+
+
+if __name__ == "__main__":
+    main()
@@ -10,22 +10,79 @@ Steps:
   3. Group by researcher, take median embedding
   4. UMAP to 2D
   5. Use WizMap functions to output data.ndjson + grid.json
+  6. Top-k most similar researchers per researcher -> neighbors.json, and the
+     normalized researcher matrix plus its ANN index (ann/researchers) for
+     query_server.py
+  7. The per-paper embeddings as a memory-mappable index (papers/, see
+     paper_index.py) plus its ANN index (ann/papers), and a BM25 keyword
+     index over the same texts (lexical/, see lexical_index.py)
+  8. A normalized keyword -> researcher index for facet filtering
+     (keywords/, see keyword_index.py), and a prefix autocomplete index over
+     names, affiliations and keywords (autocomplete.npz, see autocomplete_index.py)
+
+Paper embeddings, UMAP coordinates and the grid dict are checkpointed in
+--cache-dir (default: <output-dir>/.cache). Embeddings are keyed by the hash
+of model + text, so only new or edited papers are embedded on a re-run, and
+they are flushed every few hundred papers so an interrupted run keeps its
+work. UMAP and grid results are keyed by the hash of their inputs and
+parameters, so a failure in the grid step doesn't redo embedding or UMAP,
+and of the code that computes them (wizmap_utils.py, library versions), so
+a code change isn't masked by an old checkpoint.
+
+--warm-cache runs alongside generate_summaries.py instead: it follows the
+summaries progress journal and embeds each researcher's papers into the
+cache as soon as their keywords exist, until --stop-file appears. The final
+run then only embeds what finished last.
+
+--shard I/N embeds only the papers whose text hash falls in shard I of N and
+writes them to <output-dir>/map-shard-III-of-NNN.npz, so the embedding work
+can be spread over several runners or processes. --merge then loads a
+complete set of shard files in place of embedding and runs the rest of the
+stage (aggregation, UMAP, data list, grid) exactly as a single run would; the
+outputs are identical. Each shard keeps its own embedding cache under
+<cache-dir>/shard-III-of-NNN so shards can run side by side on one machine.
 
 Usage:
     python generate_map_data.py --input enriched.csv --output-dir ./output
+    python generate_map_data.py --warm-cache --input combined.csv \
+        --progress ./output/summaries_progress.json --stop-file ./output/.summaries_done \
+        --output-dir ./output
+    python generate_map_data.py --input enriched.csv --output-dir ./shards --shard 0/4   # ... 3/4
+    python generate_map_data.py --input enriched.csv --output-dir ./output --merge ./shards/map-shard-*.npz
 """
 
 import argparse
 import csv
+import hashlib
 import json
+import os
 import sys
+import time
 from collections import OrderedDict
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
-from wizmap_utils import generate_grid_dict, generate_data_list, save_json_files
+from metrics_utils import Metrics, timed
+from profiling_utils import profiled
+from shard_utils import parse_shard, shard_name, shard_of
+from ann_index import ANN_DIR, build_index
+from autocomplete_index import AUTOCOMPLETE_FILE, save_autocomplete_index
+from keyword_index import KEYWORDS_DIR, KeywordIndex, save_keyword_index
+from lexical_index import LEXICAL_DIR, save_lexical_index
+from paper_index import PAPERS_DIR, papers_in_order, save_paper_index
+from similarity import (
+    DEFAULT_K, INDEX_FILE, MATRIX_FILE, NEIGHBORS_FILE, researcher_records, save_neighbors, save_researcher_matrix,
+)
+from wizmap_utils import (
+    generate_contour_dict, generate_data_list, generate_grid_dict, get_tile_topics,
+    merge_leaves_before_level, save_json_files,
+)
+
+
+EMBEDDING_MODEL = "thenlper/gte-small"
+EMBEDDING_FLUSH_EVERY = 500
 
 
 # ---------------------------------------------------------------------------
@@ -35,8 +92,8 @@ from wizmap_utils import generate_grid_dict, generate_data_list, save_json_files
 def load_model():
     from transformers import AutoTokenizer, AutoModel
     print("Loading gte-small model...")
-    tokenizer = AutoTokenizer.from_pretrained("thenlper/gte-small")
-    model = AutoModel.from_pretrained("thenlper/gte-small")
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL)
     return tokenizer, model
 
 
@@ -49,80 +106,373 @@ def get_embedding(text: str, tokenizer, model):
     return embedding
 
 
+def text_key(text: str) -> str:
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+
 # ---------------------------------------------------------------------------
-# Main
+# Checkpoints
 # ---------------------------------------------------------------------------
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate map data (embeddings + UMAP + ndjson + grid)")
-    parser.add_argument("--input", "-i", type=Path, required=True, help="Enriched combined CSV (with ai_generated columns)")
-    parser.add_argument("--output-dir", "-o", type=Path, default=Path("."), help="Directory for data.ndjson and grid.json")
-    parser.add_argument("--umap-neighbors", type=int, default=5)
-    parser.add_argument("--umap-min-dist", type=float, default=0.15)
-    parser.add_argument("--seed", type=int, default=42)
-    args = parser.parse_args()
+def load_embedding_cache(cache_dir: Path) -> dict[str, np.ndarray]:
+    cache = {}
+    for part in sorted(cache_dir.glob("embeddings-*.npz")):
+        with np.load(part) as data:
+            for key, emb in zip(data["keys"], data["embeddings"]):
+                cache[str(key)] = emb
+    return cache
 
-    args.output_dir.mkdir(parents=True, exist_ok=True)
 
-    # 1. Load CSV into DataFrame (same as notebook)
-    print("Loading data...")
-    df = pd.read_csv(args.input)
-    print(f"  {len(df)} rows")
+def save_embedding_part(cache_dir: Path, keys: list[str], embeddings: list[np.ndarray]) -> None:
+    index = len(list(cache_dir.glob("embeddings-*.npz")))
+    tmp_path = cache_dir / f"part-{index:05d}.tmp.npz"
+    np.savez(tmp_path, keys=np.array(keys), embeddings=np.vstack(embeddings))
+    os.replace(tmp_path, cache_dir / f"embeddings-{index:05d}.npz")
 
-    # 2. Create text to embed (same as notebook: title + abstract + ai_keywords + researcher_keywords)
-    df["text_to_embed"] = (
+
+def compact_embedding_cache(cache_dir: Path, keys: list[str], embeddings: list[np.ndarray]) -> None:
+    """Replace all cache parts with one file holding only the current papers."""
+    tmp_path = cache_dir / "embeddings-compact.tmp.npz"
+    np.savez(tmp_path, keys=np.array(keys), embeddings=np.vstack(embeddings))
+    for part in cache_dir.glob("embeddings-*.npz"):
+        if part != tmp_path:
+            part.unlink()
+    tmp_path.rename(cache_dir / "embeddings-00000.npz")
+
+
+def texts_to_embed(df: pd.DataFrame) -> pd.Series:
+    # Same as notebook: title + abstract + ai_keywords + researcher_keywords
+    return (
         df["paper_title"].fillna("")
         + " " + df["paper_abstract"].fillna("")
         + " " + df["ai_generated_keywords"].fillna("")
         + " " + df["researcher_keywords"].fillna("")
     ).astype(str)
 
-    # 3. Generate embeddings per paper
-    tokenizer, model = load_model()
 
-    print("Generating embeddings...")
-    embeddings = []
-    for i, text in enumerate(df["text_to_embed"].tolist()):
-        emb = get_embedding(text, tokenizer, model)
-        embeddings.append(emb)
-        if (i + 1) % 100 == 0 or i == len(df) - 1:
-            print(f"  [{i+1}/{len(df)}] embedded")
+def embed_texts(texts: list[str], cache_dir: Path | None, encoder=None) -> list[np.ndarray]:
+    """Embed texts, reusing and extending the on-disk embedding checkpoint.
+
+    encoder maps one text to its vector; the default loads gte-small.
+    """
+    cache = load_embedding_cache(cache_dir) if cache_dir is not None else {}
+    keys = [text_key(t) for t in texts]
+    missing = [i for i, k in enumerate(keys) if k not in cache]
+    if cache_dir is not None:
+        print(f"  {len(texts) - len(missing)} cached, {len(missing)} to embed")
+
+    if missing:
+        if encoder is None:
+            tokenizer, model = load_model()
+            encoder = lambda text: get_embedding(text, tokenizer, model)
+        pending_keys, pending_embs = [], []
+        for n, i in enumerate(missing):
+            emb = encoder(texts[i])
+            cache[keys[i]] = emb
+            pending_keys.append(keys[i])
+            pending_embs.append(emb)
+            if cache_dir is not None and len(pending_keys) >= EMBEDDING_FLUSH_EVERY:
+                save_embedding_part(cache_dir, pending_keys, pending_embs)
+                pending_keys, pending_embs = [], []
+            if (n + 1) % 100 == 0 or n == len(missing) - 1:
+                print(f"  [{n+1}/{len(missing)}] embedded")
+
+    embeddings = [cache[k] for k in keys]
+    if cache_dir is not None and (missing or len(cache) != len(set(keys))):
+        unique = dict(zip(keys, embeddings))
+        compact_embedding_cache(cache_dir, list(unique), list(unique.values()))
+    return embeddings
+
+
+def read_progress_keywords(progress_path: Path) -> dict[str, str] | None:
+    """{scholar_id: keywords} from the summaries journal, or None if unreadable right now."""
+    if not progress_path.exists():
+        return {}
+    try:
+        with open(progress_path, "r", encoding="utf-8") as f:
+            return {sid: entry["keywords"] for sid, entry in json.load(f).items()}
+    except (OSError, ValueError):
+        return None
+
+
+def warm_embedding_cache(
+    combined_df: pd.DataFrame,
+    progress_path: Path,
+    cache_dir: Path,
+    should_stop,
+    include_existing: bool = False,
+    poll_interval: float = 10.0,
+) -> int:
+    """Embed papers of researchers as their summaries land in the progress journal.
+
+    Journal entries that already exist when this starts are stale leftovers
+    unless the summaries step is resuming (include_existing). Keeps polling
+    until should_stop() returns True, then makes one final pass. Returns the
+    number of texts embedded.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    rows_by_researcher = combined_df.groupby("google_scholar_id").indices
+    known = set(load_embedding_cache(cache_dir))
+    seen = {} if include_existing else (read_progress_keywords(progress_path) or {})
+    model = None
+    embedded = 0
+
+    while True:
+        stopping = should_stop()
+        progress = read_progress_keywords(progress_path)
+        if progress is not None:
+            fresh = [sid for sid, kw in progress.items()
+                     if seen.get(sid) != kw and sid in rows_by_researcher]
+            keys, embs = [], []
+            for sid in fresh:
+                papers = combined_df.iloc[rows_by_researcher[sid]].copy()
+                papers["ai_generated_keywords"] = progress[sid]
+                for text in texts_to_embed(papers):
+                    key = text_key(text)
+                    if key in known:
+                        continue
+                    if model is None:
+                        model = load_model()
+                    embs.append(get_embedding(text, *model))
+                    keys.append(key)
+                    known.add(key)
+                seen[sid] = progress[sid]
+            if keys:
+                save_embedding_part(cache_dir, keys, embs)
+                embedded += len(keys)
+                print(f"  warmed {len(keys)} paper embeddings for {len(fresh)} researchers", flush=True)
+        if stopping:
+            break
+        time.sleep(poll_interval)
+
+    print(f"Embedding cache warm-up done: {embedded} papers embedded ahead of the map step")
+    return embedded
+
+
+def checkpoint_key(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def code_version(files: list[Path], packages: list[str]) -> dict:
+    """Hashes of the source files and versions of the packages a checkpoint's result depends on."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    def package_version(name: str) -> str | None:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return None
+
+    return {
+        "files": {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in files},
+        "packages": {name: package_version(name) for name in packages},
+    }
+
+
+def replace_checkpoint(cache_dir: Path, prefix: str, path: Path) -> None:
+    """Drop older checkpoints of the same kind once a new one is written."""
+    for old in cache_dir.glob(f"{prefix}-*"):
+        if old != path:
+            old.unlink()
 
-    df["embedding"] = embeddings
 
-    # 4. Group by researcher, take median embedding (same as notebook)
+# ---------------------------------------------------------------------------
+# Shards
+# ---------------------------------------------------------------------------
+
+SHARD_GLOB = "map-shard-*.npz"
+
+
+def shard_path(output_dir: Path, index: int, n_shards: int) -> Path:
+    return output_dir / f"map-{shard_name(index, n_shards)}.npz"
+
+
+def embed_shard(
+    df: pd.DataFrame,
+    index: int,
+    n_shards: int,
+    output_dir: Path,
+    cache_dir: Path | None = None,
+    metrics=None,
+) -> Path:
+    """Embed this shard's unique paper texts and write them as a shard file; returns its path."""
+    all_texts = texts_to_embed(df).tolist()
+    keys = [text_key(t) for t in all_texts]
+    texts = dict(zip(keys, all_texts))
+    mine = [k for k in texts if shard_of(k, n_shards) == index]
+    print(f"Shard {index}/{n_shards}: {len(mine)} of {len(texts)} unique paper texts")
+
+    if cache_dir is not None:
+        cache_dir = cache_dir / shard_name(index, n_shards)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    with timed(metrics, "embed", items=len(mine)):
+        embeddings = embed_texts([texts[k] for k in mine], cache_dir) if mine else []
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = shard_path(output_dir, index, n_shards)
+    # Hidden until complete, so SHARD_GLOB never picks up a partial file
+    tmp_path = path.with_name("." + path.name)
+    np.savez(
+        tmp_path,
+        keys=np.array(mine, dtype=str),
+        embeddings=np.vstack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32),
+        index=index,
+        n_shards=n_shards,
+        # Lets --merge check that every shard saw the same input
+        input_key=checkpoint_key(keys),
+    )
+    os.replace(tmp_path, path)
+    print(f"  wrote {path}")
+    return path
+
+
+def load_shards(paths: list[Path], input_key: str) -> dict[str, np.ndarray]:
+    """Embeddings by text key from a complete set of shard files made from the same input."""
+    embeddings, seen, counts = {}, set(), set()
+    for path in paths:
+        with np.load(path) as data:
+            if str(data["input_key"]) != input_key:
+                raise ValueError(f"{path} was made from a different input CSV")
+            seen.add(int(data["index"]))
+            counts.add(int(data["n_shards"]))
+            for key, emb in zip(data["keys"], data["embeddings"]):
+                embeddings[str(key)] = emb
+    if len(counts) != 1:
+        raise ValueError(f"shard files come from different shard counts: {sorted(counts)}")
+    n_shards = counts.pop()
+    missing = sorted(set(range(n_shards)) - seen)
+    if missing:
+        raise ValueError(f"missing shard(s) {missing} of {n_shards}")
+    return embeddings
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def dataframe_from_rows(rows: list[dict]) -> pd.DataFrame:
+    """Build the DataFrame pd.read_csv would give for these rows written as CSV.
+
+    Empty strings become NaN and columns whose values all parse as numbers
+    become numeric, so the in-process pipeline produces the same output as
+    reading the enriched CSV checkpoint.
+    """
+    df = pd.DataFrame(rows).replace("", np.nan)
+    for col in df.columns:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+MAP_COLUMNS = [
+    "researcher_name", "profile_url", "google_scholar_id", "affiliation",
+    "researcher_total_citations", "researcher_keywords", "researcher_homepage",
+    "paper_abstract", "ai_generated_keywords", "ai_generated_summary",
+]
+
+
+def aggregate_researchers(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per researcher: median paper embedding plus the first value of MAP_COLUMNS."""
+    # Same as notebook
     def median_embedding(x):
         return np.median(np.vstack(x), axis=0)
 
     def first_value(x):
         return x.iloc[0]
 
-    output_columns = [
-        "researcher_name", "profile_url", "google_scholar_id", "affiliation",
-        "researcher_total_citations", "researcher_keywords", "researcher_homepage",
-        "paper_abstract", "ai_generated_keywords", "ai_generated_summary",
-    ]
-
     agg_dict = {"embedding": median_embedding}
-    for col in output_columns:
+    for col in MAP_COLUMNS:
         if col != "google_scholar_id":
             agg_dict[col] = first_value
 
-    researcher_df = df.groupby("google_scholar_id").agg(agg_dict).reset_index()
+    return df.groupby("google_scholar_id").agg(agg_dict).reset_index()
+
+
+def run_umap(emb_matrix: np.ndarray, n_neighbors: int = 5, min_dist: float = 0.15, seed: int = 42) -> np.ndarray:
+    import umap
+    reducer = umap.UMAP(
+        n_neighbors=n_neighbors,
+        min_dist=min_dist,
+        n_components=2,
+        random_state=seed,
+    )
+    return reducer.fit_transform(emb_matrix)
+
+
+def generate_map_data(
+    df: pd.DataFrame,
+    output_dir: Path,
+    umap_neighbors: int = 5,
+    umap_min_dist: float = 0.15,
+    seed: int = 42,
+    cache_dir: Path | None = None,
+    metrics=None,
+    embeddings: dict[str, np.ndarray] | None = None,
+    neighbors_k: int = DEFAULT_K,
+    paper_dtype: str = "float16",
+) -> pd.DataFrame:
+    """Embed, aggregate, project and write the map files for an enriched DataFrame.
+
+    embeddings, if given, holds every paper's embedding by text_key (from
+    merged shards) and replaces the embedding step. neighbors_k similar
+    researchers per researcher go to neighbors.json (0 to skip), and the
+    paper index stores its vectors as paper_dtype.
+    Returns the per-researcher DataFrame (embedding, x, y, ...).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # 2. Create text to embed (same as notebook: title + abstract + ai_keywords + researcher_keywords)
+    df["text_to_embed"] = texts_to_embed(df)
+
+    # 3. Generate embeddings per paper
+    if embeddings is not None:
+        print("Using merged shard embeddings...")
+        keys = [text_key(t) for t in df["text_to_embed"]]
+        missing = sum(1 for k in keys if k not in embeddings)
+        if missing:
+            raise ValueError(f"{missing} papers have no embedding in the merged shards")
+        with timed(metrics, "embed", items=len(df)):
+            df["embedding"] = [embeddings[k] for k in keys]
+    else:
+        print("Generating embeddings...")
+        with timed(metrics, "embed", items=len(df)):
+            df["embedding"] = embed_texts(df["text_to_embed"].tolist(), cache_dir)
+
+    # 4. Group by researcher, take median embedding (same as notebook)
+    with timed(metrics, "aggregate", items=len(df)):
+        researcher_df = aggregate_researchers(df)
     print(f"  {len(researcher_df)} unique researchers")
 
     # 5. UMAP (same as notebook)
-    import umap
     print("Running UMAP...")
     emb_matrix = np.vstack(researcher_df["embedding"].values)
 
-    reducer = umap.UMAP(
-        n_neighbors=args.umap_neighbors,
-        min_dist=args.umap_min_dist,
-        n_components=2,
-        random_state=args.seed,
-    )
-    coords_2d = reducer.fit_transform(emb_matrix)
+    umap_params = {"n_neighbors": umap_neighbors, "min_dist": umap_min_dist, "seed": seed}
+    umap_path = None
+    if cache_dir is not None:
+        umap_version = code_version([], ["umap-learn", "scikit-learn", "numpy"])
+        umap_path = cache_dir / f"umap-{checkpoint_key(emb_matrix, umap_params, umap_version)}.npy"
+
+    if umap_path is not None and umap_path.exists():
+        print(f"  Using checkpoint {umap_path.name}")
+        coords_2d = np.load(umap_path)
+    else:
+        with timed(metrics, "umap", items=len(emb_matrix)):
+            coords_2d = run_umap(emb_matrix, umap_neighbors, umap_min_dist, seed)
+        if umap_path is not None:
+            np.save(umap_path, coords_2d)
+            replace_checkpoint(cache_dir, "umap", umap_path)
 
     researcher_df["x"] = coords_2d[:, 0]
     researcher_df["y"] = coords_2d[:, 1]
@@ -148,41 +498,200 @@ def main():
     ys = researcher_df["y"].tolist()
 
     print("Generating data list (WizMap)...")
-    data_list = generate_data_list(
-        xs, ys,
-        researcher_df["ai_generated_keywords"].tolist(),
-        embeddings=researcher_df["embedding_array"].tolist(),
-        labels=researcher_df["researcher_name"].tolist(),
-        citations=researcher_df["researcher_total_citations"].tolist(),
-        scholarURLs=researcher_df["picture_url"].tolist(),
-        resSummaries=researcher_df["ai_generated_summary"].tolist(),
-        googleScholarURLs=researcher_df["profile_url"].tolist(),
-        googleScholarKeywords=researcher_df["researcher_keywords"].tolist(),
-        affiliations=researcher_df["affiliation"].tolist(),
-        homePageURLs=researcher_df["researcher_homepage"].tolist(),
-    )
+    with timed(metrics, "data_list", items=len(xs)):
+        data_list = generate_data_list(
+            xs, ys,
+            researcher_df["ai_generated_keywords"].tolist(),
+            embeddings=researcher_df["embedding_array"].tolist(),
+            labels=researcher_df["researcher_name"].tolist(),
+            citations=researcher_df["researcher_total_citations"].tolist(),
+            scholarURLs=researcher_df["picture_url"].tolist(),
+            resSummaries=researcher_df["ai_generated_summary"].tolist(),
+            googleScholarURLs=researcher_df["profile_url"].tolist(),
+            googleScholarKeywords=researcher_df["researcher_keywords"].tolist(),
+            affiliations=researcher_df["affiliation"].tolist(),
+            homePageURLs=researcher_df["researcher_homepage"].tolist(),
+        )
 
     # 10. Generate grid dict using WizMap function (same as notebook)
     print("Generating grid dict (WizMap)...")
-    grid_dict = generate_grid_dict(
-        xs, ys,
-        researcher_df["ai_generated_keywords"].tolist(),
-    )
+    grid_texts = researcher_df["ai_generated_keywords"].tolist()
+    grid_path = None
+    if cache_dir is not None:
+        # Keyed by the grid code too, so a change to wizmap_utils.py isn't masked by an old checkpoint
+        grid_version = code_version([Path(__file__).parent / "wizmap_utils.py"],
+                                    ["scikit-learn", "scipy", "numpy", "quadtreed3"])
+        grid_path = cache_dir / f"grid-{checkpoint_key(xs, ys, grid_texts, grid_version)}.json"
+
+    if grid_path is not None and grid_path.exists():
+        print(f"  Using checkpoint {grid_path.name}")
+        with open(grid_path, "r", encoding="utf8") as f:
+            grid_dict = json.load(f)
+    else:
+        grid_dict = generate_grid_dict(xs, ys, grid_texts, metrics=metrics)
+        if grid_path is not None:
+            with open(grid_path, "w", encoding="utf8") as f:
+                json.dump(grid_dict, f)
+            replace_checkpoint(cache_dir, "grid", grid_path)
 
     # 11. Save output files
     print("Saving output files...")
-    save_json_files(data_list, grid_dict, output_dir=str(args.output_dir))
-
-    # 12. Also save embeddings.csv for reference (same as notebook)
-    emb_csv_columns = output_columns + ["x", "y", "embedding_array"]
-    researcher_df[emb_csv_columns].to_csv(
-        args.output_dir / "embeddings.csv", index=False,
-    )
-
-    print(f"\nDone! Output files in {args.output_dir}/")
+    with timed(metrics, "save", items=len(researcher_df)):
+        save_json_files(data_list, grid_dict, output_dir=str(output_dir))
+
+        # 12. Also save embeddings.csv for reference (same as notebook)
+        emb_csv_columns = MAP_COLUMNS + ["x", "y", "embedding_array"]
+        researcher_df[emb_csv_columns].to_csv(
+            output_dir / "embeddings.csv", index=False,
+        )
+
+    # 13. Collaborator suggestions
+    if neighbors_k > 0:
+        print(f"Finding top {neighbors_k} similar researchers...")
+        with timed(metrics, "neighbors", items=len(researcher_df)):
+            save_neighbors(
+                output_dir / NEIGHBORS_FILE,
+                researcher_df["google_scholar_id"].astype(str).tolist(), emb_matrix, neighbors_k,
+            )
+    with timed(metrics, "search_matrix", items=len(researcher_df)):
+        save_researcher_matrix(output_dir, researcher_records(researcher_df), emb_matrix, EMBEDDING_MODEL)
+    with timed(metrics, "ann_index", items=len(researcher_df)):
+        ann = build_index(np.load(output_dir / MATRIX_FILE), output_dir / ANN_DIR / "researchers")
+
+    with timed(metrics, "paper_index", items=len(df)):
+        papers_dir = save_paper_index(
+            output_dir, df, researcher_df["google_scholar_id"].astype(str).tolist(), dtype=paper_dtype,
+        )
+        # Reranks against papers/embeddings.npy at query time instead of keeping its own copy
+        build_index(np.load(papers_dir / "embeddings.npy").astype(np.float32), output_dir / ANN_DIR / "papers",
+                    keep_vectors=False)
+
+    with timed(metrics, "lexical_index", items=len(df)):
+        paper_rows, offsets = papers_in_order(df, researcher_df["google_scholar_id"].astype(str).tolist())
+        save_lexical_index(output_dir, paper_rows["text_to_embed"].tolist(), offsets)
+
+    with timed(metrics, "keyword_index", items=len(researcher_df)):
+        save_keyword_index(
+            output_dir, researcher_df["ai_generated_keywords"].tolist(), researcher_df["researcher_keywords"].tolist(),
+        )
+    with timed(metrics, "autocomplete_index", items=len(researcher_df)):
+        save_autocomplete_index(
+            output_dir, researcher_df["researcher_name"].tolist(), researcher_df["affiliation"].tolist(),
+            pd.to_numeric(researcher_df["researcher_total_citations"], errors="coerce").fillna(0).tolist(),
+            keywords=KeywordIndex(output_dir),
+        )
+
+    print(f"\nDone! Output files in {output_dir}/")
     print(f"  data.ndjson  ({len(researcher_df)} researchers)")
     print(f"  grid.json    (200x200 KDE grid + topics)")
     print(f"  embeddings.csv")
+    if neighbors_k > 0:
+        print(f"  {NEIGHBORS_FILE} (top {neighbors_k} similar researchers)")
+    print(f"  {MATRIX_FILE} + {INDEX_FILE} (search matrix)")
+    print(f"  {ANN_DIR}/researchers/ (ANN index, recall@{ann.meta['recall']['k']} {ann.meta['recall']['recall']:.3f})")
+    print(f"  {PAPERS_DIR}/ + {ANN_DIR}/papers/ ({len(df)} paper embeddings, {paper_dtype})")
+    print(f"  {LEXICAL_DIR}/ (BM25 keyword index, papers + researchers)")
+    print(f"  {KEYWORDS_DIR}/ (keyword facet index)")
+    print(f"  {AUTOCOMPLETE_FILE} (prefix autocomplete)")
+
+    return researcher_df
+
+
+# Timed line by line with --profile-lines
+HOT_FUNCTIONS = [
+    get_embedding, generate_contour_dict, merge_leaves_before_level, get_tile_topics, generate_data_list,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate map data (embeddings + UMAP + ndjson + grid)")
+    parser.add_argument("--input", "-i", type=Path, required=True,
+                        help="Enriched combined CSV (with ai_generated columns); the combined CSV with --warm-cache")
+    parser.add_argument("--output-dir", "-o", type=Path, default=Path("."), help="Directory for data.ndjson and grid.json")
+    parser.add_argument("--umap-neighbors", type=int, default=5)
+    parser.add_argument("--umap-min-dist", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_K, metavar="K",
+                        help=f"Similar researchers per researcher in {NEIGHBORS_FILE} (default: {DEFAULT_K}, 0 to skip)")
+    parser.add_argument("--paper-dtype", choices=["float16", "float32"], default="float16",
+                        help=f"Storage type of the paper vectors in {PAPERS_DIR}/ (default: float16)")
+    parser.add_argument("--cache-dir", type=Path, default=None,
+                        help="Checkpoint directory for embeddings/UMAP/grid (default: <output-dir>/.cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write checkpoints")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Only embed papers of researchers found in --progress, until --stop-file exists")
+    parser.add_argument("--progress", type=Path, help="summaries_progress.json to follow (--warm-cache)")
+    parser.add_argument("--stop-file", type=Path, help="Stop warming once this file exists (--warm-cache)")
+    parser.add_argument("--include-existing", action="store_true",
+                        help="Also embed journal entries present at start (summaries step is resuming)")
+    shard = parser.add_mutually_exclusive_group()
+    shard.add_argument("--shard", type=parse_shard, metavar="I/N",
+                       help="Only embed shard I of N and write <output-dir>/map-shard-III-of-NNN.npz")
+    shard.add_argument("--merge", type=Path, nargs="*", metavar="SHARD",
+                       help=f"Build the map from these shard files (default: <output-dir>/{SHARD_GLOB})")
+    parser.add_argument("--metrics", type=Path, help="Write per-step timing and memory metrics to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Write cProfile stats and collapsed stacks for this run to DIR")
+    parser.add_argument("--profile-lines", action="store_true",
+                        help="With --profile, also time each line of the known hot functions (slower)")
+    args = parser.parse_args()
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or args.output_dir / ".cache"
+
+    if args.warm_cache:
+        if cache_dir is None or args.progress is None or args.stop_file is None:
+            parser.error("--warm-cache needs --progress, --stop-file and a cache directory")
+        warm_embedding_cache(
+            pd.read_csv(args.input), args.progress, cache_dir,
+            should_stop=args.stop_file.exists,
+            include_existing=args.include_existing,
+        )
+        return
+
+    # 1. Load CSV into DataFrame (same as notebook)
+    stage = "map" if args.shard is None else f"map-shard-{args.shard[0]}"
+    metrics = Metrics(stage) if args.metrics else None
+    hot_functions = HOT_FUNCTIONS if args.profile_lines else None
+    with profiled(stage, args.profile, hot_functions=hot_functions, all_threads=True):
+        print("Loading data...")
+        with timed(metrics, "load") as record:
+            df = pd.read_csv(args.input)
+            record["items"] = len(df)
+        print(f"  {len(df)} rows")
+
+        if args.shard is not None:
+            embed_shard(df, *args.shard, args.output_dir, cache_dir=cache_dir, metrics=metrics)
+        else:
+            embeddings = None
+            if args.merge is not None:
+                paths = args.merge or sorted(args.output_dir.glob(SHARD_GLOB))
+                if not paths:
+                    print(f"No shard files given or found in {args.output_dir}", file=sys.stderr)
+                    sys.exit(1)
+                with timed(metrics, "merge", items=len(paths)):
+                    try:
+                        embeddings = load_shards(paths, checkpoint_key([text_key(t) for t in texts_to_embed(df)]))
+                    except ValueError as e:
+                        print(f"Cannot merge shards: {e}", file=sys.stderr)
+                        sys.exit(1)
+                print(f"Merged {len(paths)} shard files ({len(embeddings)} paper embeddings)")
+
+            generate_map_data(
+                df, args.output_dir,
+                umap_neighbors=args.umap_neighbors,
+                umap_min_dist=args.umap_min_dist,
+                seed=args.seed,
+                cache_dir=cache_dir,
+                metrics=metrics,
+                embeddings=embeddings,
+                neighbors_k=args.neighbors,
+                paper_dtype=args.paper_dtype,
+            )
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
 
 
 if __name__ == "__main__":
@@ -1,30 +1,55 @@
 """
-Generate AI keywords and summaries for each researcher using a cloud LLM.
+Generate AI keywords and summaries for each researcher using an LLM.
 
 Reads combined_researcher_papers.csv (without ai_generated_* columns),
 calls the LLM once per researcher, and writes the enriched CSV.
 
-Supports: gemini, openai, anthropic
+Supports: gemini, openai, anthropic, local
+
+The "local" provider runs a small instruction-tuned model on CPU through
+transformers. It needs no API key or network access once the model is in the
+Hugging Face cache, uses greedy decoding (deterministic output), and batches
+the prompts of concurrent researchers into shared forward passes.
 
 Progress is saved incrementally to a JSON sidecar file so that the script
-can be re-run with --resume to pick up exactly where it left off.
+can be re-run with --resume to pick up exactly where it left off. Each entry
+records when it was generated.
+
+--shard I/N processes only the researchers whose scholar id hashes to shard
+I of N, into its own journal (summaries_progress.shard-III-of-NNN.json next
+to --output) and without writing the CSV, so several runners (or several API
+keys, via --api-key-env) can share the work. --merge then combines the
+journals, keeping the newest entry when a researcher appears in more than
+one, into summaries_progress.json and writes the enriched CSV.
 
 Usage:
     python generate_summaries.py --input combined.csv --output enriched.csv --provider gemini
     python generate_summaries.py --input combined.csv --output enriched.csv --provider gemini --resume
+    python generate_summaries.py --input combined.csv --output enriched.csv --provider local --workers 8
+    python generate_summaries.py --input combined.csv --output enriched.csv --shard 0/4 --api-key-env GEMINI_API_KEY_0
+    python generate_summaries.py --input combined.csv --output enriched.csv --merge
 
 Environment variables:
     GEMINI_API_KEY, OPENAI_API_KEY, or ANTHROPIC_API_KEY (depending on --provider)
+    GEMINI_BASE_URL, OPENAI_BASE_URL, ANTHROPIC_BASE_URL (optional; point a
+    provider at another endpoint, e.g. benchmarks/fake_llm_server.py)
 """
 
 import argparse
 import csv
 import json
 import os
+import queue
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from collections import OrderedDict
+from collections import Counter, OrderedDict
+
+from metrics_utils import Metrics, timed
+from profiling_utils import profiled
+from shard_utils import parse_shard, shard_name, shard_of
 
 # ---------------------------------------------------------------------------
 # Prompt templates
@@ -84,9 +109,43 @@ Write the biography now. Do not include any preamble or explanation, just the ma
 MAX_RETRIES = 6
 INITIAL_BACKOFF = 5.0
 
+BASE_URLS = {
+    "gemini": ("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com"),
+    "openai": ("OPENAI_BASE_URL", "https://api.openai.com"),
+    "anthropic": ("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+}
+
+# Retries made so far, by reason ("HTTP 429", "error", ...); read by load tests
+RETRY_COUNTS: Counter = Counter()
+_retry_counts_lock = threading.Lock()
+
+
+def base_url(provider: str) -> str:
+    env_var, default = BASE_URLS[provider]
+    return os.environ.get(env_var, default).rstrip("/")
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header: delay in seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
 
 def _call_with_retry(make_request, parse_response, label: str) -> str:
-    """Call an LLM API with exponential backoff on rate-limit / server errors."""
+    """Call an LLM API with exponential backoff on rate-limit / server errors.
+
+    A Retry-After header on a 429/503 replaces the backoff delay for that retry.
+    """
     import urllib.request
     import urllib.error
 
@@ -100,13 +159,20 @@ def _call_with_retry(make_request, parse_response, label: str) -> str:
         except urllib.error.HTTPError as e:
             body = e.read().decode(errors="replace")
             if e.code in (429, 500, 503) and attempt < MAX_RETRIES:
-                print(f"    {label} HTTP {e.code}, retry {attempt}/{MAX_RETRIES} in {backoff:.0f}s", flush=True)
-                time.sleep(backoff)
-                backoff *= 2
+                delay = retry_after_seconds(e.headers.get("Retry-After")) if e.code != 500 else None
+                if delay is None:
+                    delay = backoff
+                    backoff *= 2
+                with _retry_counts_lock:
+                    RETRY_COUNTS[f"HTTP {e.code}"] += 1
+                print(f"    {label} HTTP {e.code}, retry {attempt}/{MAX_RETRIES} in {delay:.1f}s", flush=True)
+                time.sleep(delay)
             else:
                 raise RuntimeError(f"HTTP {e.code}: {body[:300]}") from e
         except Exception as e:
             if attempt < MAX_RETRIES:
+                with _retry_counts_lock:
+                    RETRY_COUNTS["error"] += 1
                 print(f"    {label} error ({e}), retry {attempt}/{MAX_RETRIES} in {backoff:.0f}s", flush=True)
                 time.sleep(backoff)
                 backoff *= 2
@@ -117,7 +183,7 @@ def _call_with_retry(make_request, parse_response, label: str) -> str:
 def call_gemini(prompt: str, system: str, api_key: str, model: str = "gemini-2.5-flash") -> str:
     import urllib.request
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+    url = f"{base_url('gemini')}/v1beta/models/{model}:generateContent?key={api_key}"
     body = json.dumps({
         "system_instruction": {"parts": [{"text": system}]},
         "contents": [{"parts": [{"text": prompt}]}],
@@ -136,7 +202,7 @@ def call_gemini(prompt: str, system: str, api_key: str, model: str = "gemini-2.5
 def call_openai(prompt: str, system: str, api_key: str, model: str = "gpt-5.2") -> str:
     import urllib.request
 
-    url = "https://api.openai.com/v1/chat/completions"
+    url = f"{base_url('openai')}/v1/chat/completions"
     body = json.dumps({
         "model": model,
         "messages": [
@@ -162,7 +228,7 @@ def call_openai(prompt: str, system: str, api_key: str, model: str = "gpt-5.2")
 def call_anthropic(prompt: str, system: str, api_key: str, model: str = "claude-sonnet-4-6-20250514") -> str:
     import urllib.request
 
-    url = "https://api.anthropic.com/v1/messages"
+    url = f"{base_url('anthropic')}/v1/messages"
     body = json.dumps({
         "model": model,
         "max_tokens": 2048,
@@ -183,11 +249,110 @@ def call_anthropic(prompt: str, system: str, api_key: str, model: str = "claude-
     return _call_with_retry(make_req, parse, f"Anthropic({model})")
 
 
+LOCAL_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"
+LOCAL_MAX_BATCH = 8
+LOCAL_MAX_WAIT = 0.05
+LOCAL_MAX_NEW_TOKENS = 1024
+
+
+class _LocalBatcher:
+    """Serve generate requests for one local model from a single worker thread.
+
+    Callers block in submit() while the worker drains the request queue into
+    batches of up to LOCAL_MAX_BATCH prompts and runs one generate() call per
+    batch. Requests that arrive while a batch is decoding join the next batch,
+    so the model stays busy as long as enough researchers are in flight.
+    """
+
+    def __init__(self, model_name: str):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        print(f"Loading local model {model_name}...", flush=True)
+        torch.manual_seed(0)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+        self.model.eval()
+
+        self._requests: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=f"local-llm-{model_name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str, system: str) -> str:
+        future: Future = Future()
+        self._requests.put((prompt, system, future))
+        return future.result()
+
+    def _next_batch(self) -> list[tuple]:
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + LOCAL_MAX_WAIT
+        while len(batch) < LOCAL_MAX_BATCH:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                outputs = self._generate([(prompt, system) for prompt, system, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), text in zip(batch, outputs):
+                future.set_result(text)
+
+    def _generate(self, requests: list[tuple[str, str]]) -> list[str]:
+        import torch
+
+        texts = [
+            self.tokenizer.apply_chat_template(
+                [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+            for prompt, system in requests
+        ]
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+        with torch.no_grad():
+            generated = self.model.generate(
+                **inputs,
+                max_new_tokens=LOCAL_MAX_NEW_TOKENS,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        new_tokens = generated[:, inputs["input_ids"].shape[1]:]
+        return [t.strip() for t in self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+
+_local_batchers: dict[str, _LocalBatcher] = {}
+_local_batchers_lock = threading.Lock()
+
+
+def call_local(prompt: str, system: str, api_key: str = None, model: str = LOCAL_MODEL) -> str:
+    """Generate with a local model; api_key is accepted for interface parity and ignored."""
+    with _local_batchers_lock:
+        batcher = _local_batchers.get(model)
+        if batcher is None:
+            batcher = _LocalBatcher(model)
+            _local_batchers[model] = batcher
+    return batcher.submit(prompt, system)
+
+
 # (env_var, call_fn, keywords_model, summary_model)
 PROVIDERS = {
     "gemini": ("GEMINI_API_KEY", call_gemini, "gemini-2.5-pro", "gemini-2.5-pro"),
     "openai": ("OPENAI_API_KEY", call_openai, "gpt-5.2", "gpt-5.2"),
     "anthropic": ("ANTHROPIC_API_KEY", call_anthropic, "claude-sonnet-4-6-20250514", "claude-sonnet-4-6-20250514"),
+    "local": (None, call_local, LOCAL_MODEL, LOCAL_MODEL),
 }
 
 # ---------------------------------------------------------------------------
@@ -213,29 +378,32 @@ def format_papers(papers: list[dict]) -> str:
     return "\n".join(lines)
 
 
-def group_by_researcher(input_path: Path) -> OrderedDict:
+def group_rows(rows) -> OrderedDict:
     groups: OrderedDict[str, dict] = OrderedDict()
-    with open(input_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            scholar_id = row["google_scholar_id"]
-            if scholar_id not in groups:
-                groups[scholar_id] = {
-                    "profile": {
-                        "name": row["researcher_name"],
-                        "profile_url": row["profile_url"],
-                        "google_scholar_id": scholar_id,
-                        "affiliation": row["affiliation"],
-                        "citations": row["researcher_total_citations"],
-                        "keywords": row["researcher_keywords"],
-                        "homepage": row.get("researcher_homepage", ""),
-                    },
-                    "papers": [],
-                }
-            groups[scholar_id]["papers"].append(row)
+    for row in rows:
+        scholar_id = row["google_scholar_id"]
+        if scholar_id not in groups:
+            groups[scholar_id] = {
+                "profile": {
+                    "name": row["researcher_name"],
+                    "profile_url": row["profile_url"],
+                    "google_scholar_id": scholar_id,
+                    "affiliation": row["affiliation"],
+                    "citations": row["researcher_total_citations"],
+                    "keywords": row["researcher_keywords"],
+                    "homepage": row.get("researcher_homepage", ""),
+                },
+                "papers": [],
+            }
+        groups[scholar_id]["papers"].append(row)
     return groups
 
 
+def group_by_researcher(input_path: Path) -> OrderedDict:
+    with open(input_path, "r", encoding="utf-8") as f:
+        return group_rows(csv.DictReader(f))
+
+
 def generate_for_researcher(
     profile: dict,
     papers: list[dict],
@@ -273,6 +441,13 @@ def generate_for_researcher(
     return keywords, summary
 
 
+PROGRESS_FILE = "summaries_progress.json"
+
+
+def shard_progress_path(output_dir: Path, index: int, n_shards: int) -> Path:
+    return output_dir / f"summaries_progress.{shard_name(index, n_shards)}.json"
+
+
 def load_progress(progress_path: Path) -> dict[str, dict]:
     """Load the incremental progress sidecar file."""
     if progress_path.exists():
@@ -281,73 +456,117 @@ def load_progress(progress_path: Path) -> dict[str, dict]:
     return {}
 
 
-def save_progress_entry(progress_path: Path, scholar_id: str, keywords: str, summary: str):
-    """Append a single completed researcher to the progress file."""
-    progress = load_progress(progress_path)
-    progress[scholar_id] = {"keywords": keywords, "summary": summary}
-    with open(progress_path, "w", encoding="utf-8") as f:
+def save_progress(progress_path: Path, progress: dict[str, dict]):
+    # Replace atomically: the map step's cache warm-up reads this file while we write it
+    tmp_path = progress_path.with_name(progress_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(progress, f, ensure_ascii=False)
+    os.replace(tmp_path, progress_path)
 
 
-def write_enriched_csv(output_path: Path, groups: OrderedDict, results: dict[str, dict]):
-    """Write the final enriched CSV from combined data + completed results."""
-    output_columns = [
-        "researcher_name", "profile_url", "google_scholar_id", "affiliation",
-        "researcher_total_citations", "researcher_keywords", "researcher_homepage",
-        "paper_title", "paper_citations", "paper_year", "paper_url", "paper_abstract",
-        "ai_generated_keywords", "ai_generated_summary",
-    ]
+_progress_lock = threading.Lock()
 
-    with open(output_path, "w", newline="", encoding="utf-8") as out:
-        writer = csv.DictWriter(out, fieldnames=output_columns)
-        writer.writeheader()
 
-        for scholar_id, data in groups.items():
-            papers = data["papers"]
-            r = results.get(scholar_id, {})
-            keywords = r.get("keywords", "")
-            summary = r.get("summary", "")
-
-            for paper in papers:
-                writer.writerow({
-                    "researcher_name": paper["researcher_name"],
-                    "profile_url": paper["profile_url"],
-                    "google_scholar_id": paper["google_scholar_id"],
-                    "affiliation": paper["affiliation"],
-                    "researcher_total_citations": paper["researcher_total_citations"],
-                    "researcher_keywords": paper["researcher_keywords"],
-                    "researcher_homepage": paper.get("researcher_homepage", ""),
-                    "paper_title": paper["paper_title"],
-                    "paper_citations": paper["paper_citations"],
-                    "paper_year": paper["paper_year"],
-                    "paper_url": paper["paper_url"],
-                    "paper_abstract": paper["paper_abstract"],
-                    "ai_generated_keywords": keywords,
-                    "ai_generated_summary": summary,
-                })
+def save_progress_entry(progress_path: Path, scholar_id: str, keywords: str, summary: str) -> dict:
+    """Append a single completed researcher to the progress file; returns its entry."""
+    entry = {"keywords": keywords, "summary": summary, "timestamp": time.time()}
+    with _progress_lock:
+        progress = load_progress(progress_path)
+        progress[scholar_id] = entry
+        save_progress(progress_path, progress)
+    return entry
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate LLM summaries for researchers")
-    parser.add_argument("--input", "-i", type=Path, required=True, help="Input combined CSV")
-    parser.add_argument("--output", "-o", type=Path, required=True, help="Output enriched CSV")
-    parser.add_argument("--provider", "-p", choices=["gemini", "openai", "anthropic"], default="gemini")
-    parser.add_argument("--rate-delay", type=float, default=4.0, help="Seconds between API calls (default: 4)")
-    parser.add_argument("--resume", action="store_true", help="Continue from where a previous run stopped")
-    args = parser.parse_args()
+ENRICHED_COLUMNS = [
+    "researcher_name", "profile_url", "google_scholar_id", "affiliation",
+    "researcher_total_citations", "researcher_keywords", "researcher_homepage",
+    "paper_title", "paper_citations", "paper_year", "paper_url", "paper_abstract",
+    "ai_generated_keywords", "ai_generated_summary",
+]
 
-    env_var, call_llm, kw_model, summary_model = PROVIDERS[args.provider]
-    api_key = os.environ.get(env_var)
-    if not api_key:
+
+def enriched_rows(groups: OrderedDict, results: dict[str, dict]) -> list[dict]:
+    """Combined rows with each researcher's keywords and summary attached."""
+    rows = []
+    for scholar_id, data in groups.items():
+        papers = data["papers"]
+        r = results.get(scholar_id, {})
+        keywords = r.get("keywords", "")
+        summary = r.get("summary", "")
+
+        for paper in papers:
+            rows.append({
+                "researcher_name": paper["researcher_name"],
+                "profile_url": paper["profile_url"],
+                "google_scholar_id": paper["google_scholar_id"],
+                "affiliation": paper["affiliation"],
+                "researcher_total_citations": paper["researcher_total_citations"],
+                "researcher_keywords": paper["researcher_keywords"],
+                "researcher_homepage": paper.get("researcher_homepage", ""),
+                "paper_title": paper["paper_title"],
+                "paper_citations": paper["paper_citations"],
+                "paper_year": paper["paper_year"],
+                "paper_url": paper["paper_url"],
+                "paper_abstract": paper["paper_abstract"],
+                "ai_generated_keywords": keywords,
+                "ai_generated_summary": summary,
+            })
+    return rows
+
+
+def merge_progress(paths: list[Path]) -> dict[str, dict]:
+    """Combine progress journals; a researcher in several keeps the newest entry.
+
+    Entries from before timestamps were recorded count as oldest.
+    """
+    merged = {}
+    for path in paths:
+        for scholar_id, entry in load_progress(path).items():
+            current = merged.get(scholar_id)
+            if current is None or entry.get("timestamp", 0) > current.get("timestamp", 0):
+                merged[scholar_id] = entry
+    return merged
+
+
+def write_enriched_csv(output_path: Path, groups: OrderedDict, results: dict[str, dict]):
+    """Write the final enriched CSV from combined data + completed results."""
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=ENRICHED_COLUMNS)
+        writer.writeheader()
+        writer.writerows(enriched_rows(groups, results))
+
+
+def generate_summaries(
+    groups: OrderedDict,
+    provider: str,
+    progress_path: Path,
+    resume: bool = False,
+    rate_delay: float | None = None,
+    workers: int | None = None,
+    metrics=None,
+    api_key_env: str | None = None,
+) -> dict[str, dict]:
+    """Generate keywords + summaries for every researcher in groups.
+
+    api_key_env overrides the provider's API key variable. Returns
+    {scholar_id: {"keywords", "summary", "timestamp"}}, including entries
+    carried over from progress_path when resuming.
+    """
+    env_var, call_llm, kw_model, summary_model = PROVIDERS[provider]
+    if env_var and api_key_env:
+        env_var = api_key_env
+    api_key = os.environ.get(env_var) if env_var else None
+    if env_var and not api_key:
         print(f"Set {env_var} environment variable", file=sys.stderr)
         sys.exit(1)
 
-    groups = group_by_researcher(args.input)
-    print(f"Loaded {len(groups)} researchers")
+    is_local = provider == "local"
+    if rate_delay is None:
+        rate_delay = 0.0 if is_local else 4.0
+    if workers is None:
+        workers = LOCAL_MAX_BATCH if is_local else 1
 
-    # Progress sidecar lives next to the output file
-    progress_path = args.output.parent / "summaries_progress.json"
-    progress = load_progress(progress_path) if args.resume else {}
+    progress = load_progress(progress_path) if resume else {}
 
     if progress:
         print(f"Resuming: {len(progress)}/{len(groups)} researchers already completed")
@@ -355,28 +574,105 @@ def main():
     remaining = [(sid, data) for sid, data in groups.items() if sid not in progress]
     print(f"Researchers to process: {remaining.__len__()}")
     print(f"Models: keywords={kw_model}, summaries={summary_model}")
+    if workers > 1:
+        print(f"Workers: {workers}")
 
-    for i, (scholar_id, data) in enumerate(remaining):
-        profile = data["profile"]
-        papers = data["papers"]
-        name = profile["name"]
-        overall_idx = list(groups.keys()).index(scholar_id) + 1
+    overall_index = {sid: i + 1 for i, sid in enumerate(groups)}
 
+    def process(scholar_id: str, data: dict) -> dict:
         keywords, summary = generate_for_researcher(
-            profile, papers, call_llm, api_key, args.rate_delay,
+            data["profile"], data["papers"], call_llm, api_key, rate_delay,
             kw_model, summary_model,
         )
-
         # Save immediately so we never lose progress
-        save_progress_entry(progress_path, scholar_id, keywords, summary)
-        progress[scholar_id] = {"keywords": keywords, "summary": summary}
-        print(f"  [{overall_idx}/{len(groups)}] {name} — done ({i+1}/{len(remaining)} this run)", flush=True)
-
-    # Write final CSV from progress
-    print(f"\nWriting enriched CSV...")
-    write_enriched_csv(args.output, groups, progress)
-    print(f"Output: {args.output}")
-    print(f"Progress: {progress_path} ({len(progress)} researchers)")
+        return save_progress_entry(progress_path, scholar_id, keywords, summary)
+
+    with timed(metrics, "llm", items=len(remaining)):
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {pool.submit(process, sid, data): (sid, data) for sid, data in remaining}
+            for i, future in enumerate(as_completed(futures)):
+                scholar_id, data = futures[future]
+                progress[scholar_id] = future.result()
+                name = data["profile"]["name"]
+                print(f"  [{overall_index[scholar_id]}/{len(groups)}] {name} — done ({i+1}/{len(remaining)} this run)", flush=True)
+        finally:
+            # Don't start queued researchers after a failure; finished ones are already saved
+            pool.shutdown(cancel_futures=True)
+
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate LLM summaries for researchers")
+    parser.add_argument("--input", "-i", type=Path, required=True, help="Input combined CSV")
+    parser.add_argument("--output", "-o", type=Path, required=True, help="Output enriched CSV")
+    parser.add_argument("--provider", "-p", choices=list(PROVIDERS), default="gemini")
+    parser.add_argument("--rate-delay", type=float, default=None,
+                        help="Seconds between API calls (default: 4, or 0 for --provider local)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Researchers processed concurrently (default: 1, or {LOCAL_MAX_BATCH} for --provider local)")
+    parser.add_argument("--resume", action="store_true", help="Continue from where a previous run stopped")
+    parser.add_argument("--api-key-env", metavar="VAR",
+                        help="Read the API key from VAR instead of the provider's default variable")
+    shard = parser.add_mutually_exclusive_group()
+    shard.add_argument("--shard", type=parse_shard, metavar="I/N",
+                       help="Only process shard I of N into its own progress journal; no CSV is written")
+    shard.add_argument("--merge", type=Path, nargs="*", metavar="JOURNAL",
+                       help="Merge these progress journals (default: all next to --output) and write the CSV")
+    parser.add_argument("--metrics", type=Path, help="Write per-step timing and memory metrics to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Write cProfile stats and collapsed stacks for this run to DIR")
+    args = parser.parse_args()
+
+    stage = "summaries" if args.shard is None else f"summaries-shard-{args.shard[0]}"
+    metrics = Metrics(stage) if args.metrics else None
+    with profiled(stage, args.profile, all_threads=True):
+        with timed(metrics, "load") as record:
+            groups = group_by_researcher(args.input)
+            record["items"] = len(groups)
+        print(f"Loaded {len(groups)} researchers")
+
+        # Progress sidecar lives next to the output file
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        progress_path = args.output.parent / PROGRESS_FILE
+
+        if args.merge is not None:
+            journals = args.merge or sorted(args.output.parent.glob("summaries_progress*.json"))
+            with timed(metrics, "merge", items=len(journals)):
+                progress = merge_progress(journals)
+                progress = {sid: entry for sid, entry in progress.items() if sid in groups}
+                save_progress(progress_path, progress)
+            missing = len(groups) - len(progress)
+            print(f"Merged {len(journals)} journals: {len(progress)}/{len(groups)} researchers")
+            if missing:
+                print(f"WARNING: {missing} researchers have no summary yet; their rows get empty ai_generated_* columns")
+        else:
+            if args.shard is not None:
+                index, n_shards = args.shard
+                groups_to_run = OrderedDict(
+                    (sid, data) for sid, data in groups.items() if shard_of(sid, n_shards) == index
+                )
+                progress_path = shard_progress_path(args.output.parent, index, n_shards)
+                print(f"Shard {index}/{n_shards}: {len(groups_to_run)} researchers -> {progress_path}")
+            else:
+                groups_to_run = groups
+            progress = generate_summaries(
+                groups_to_run, args.provider, progress_path,
+                resume=args.resume, rate_delay=args.rate_delay, workers=args.workers,
+                metrics=metrics, api_key_env=args.api_key_env,
+            )
+
+        if args.shard is None:
+            # Write final CSV from progress
+            print(f"\nWriting enriched CSV...")
+            with timed(metrics, "write", items=len(groups)):
+                write_enriched_csv(args.output, groups, progress)
+            print(f"Output: {args.output}")
+        print(f"Progress: {progress_path} ({len(progress)} researchers)")
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+"""
+Inverted keyword index over researchers, for facet filtering.
+
+ai_generated_keywords and researcher_keywords are free-text, comma-separated
+lists. This splits them (commas and semicolons outside parentheses),
+normalizes each keyword and folds near-identical forms onto one key:
+
+    NFKC + casefold, parenthetical expansions dropped ("SLAM (simultaneous
+    localization and mapping)" -> "slam"), "-", "_", "/" as spaces, other
+    punctuation dropped except "+" and "#", whitespace collapsed, and each
+    word singularized ("systems" -> "system", "ontologies" -> "ontology";
+    "-ics" fields and words like "news", "bias" and "series" are left alone)
+
+A key is displayed as its most frequent original spelling. Files in
+<output-dir>/keywords/, rows in researcher_index.json order:
+
+    keywords.json     {"keys": [...sorted], "labels": [...], "counts": [...]}
+    indptr.npy        n_keywords + 1 int64; keyword i's researchers are
+                      researchers[indptr[i]:indptr[i+1]], in increasing row order
+    researchers.npy   int32 researcher rows
+    sources.npy       uint8 per posting: 1 = AI keywords, 2 = Scholar keywords
+    by_researcher.npz indptr + keywords: the same postings per researcher,
+                      for facet counts over a filtered set
+
+so "researchers tagged X" is one slice, an AND filter intersects sorted
+slices, and facet counts over a set of researchers are a bincount of their
+keyword lists: all O(postings), not a scan of data.ndjson.
+
+Usage:
+    python keyword_index.py --data-dir ./output --keyword "visual servoing"
+    python keyword_index.py --data-dir ./output --keyword robotics --keyword slam --facets 20
+"""
+
+import argparse
+import json
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+
+KEYWORDS_DIR = "keywords"
+SOURCE_AI = 1
+SOURCE_SCHOLAR = 2
+DEFAULT_FACETS = 20
+
+_SPLIT = re.compile(r"[,;](?![^()]*\))")
+_PARENS = re.compile(r"\([^()]*\)")
+_SEPARATORS = re.compile(r"[-_/]+")
+_PUNCTUATION = re.compile(r"[^\w\s+#]+")
+# Words the suffix rules would turn into a different word ("news" -> "new")
+_INVARIANT = frozenset({
+    "atlas", "bias", "chaos", "cosmos", "diabetes", "ethos", "gas", "lens", "means", "news",
+    "series", "species",
+})
+_IRREGULAR = {"atlases": "atlas", "biases": "bias", "gases": "gas", "lenses": "lens"}
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+
+def split_keywords(text) -> list[str]:
+    """Keywords of a comma/semicolon-separated string, stripped; [] for NaN or empty."""
+    if not isinstance(text, str):
+        return []
+    return [part.strip() for part in _SPLIT.split(text) if part.strip()]
+
+
+def _singular(word: str) -> str:
+    # Fields ("robotics", "physics") aren't plurals of their adjectives
+    if word in _INVARIANT or word.endswith("ics"):
+        return word
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def keyword_key(keyword: str) -> str:
+    """Canonical form that near-identical spellings of a keyword share ("" if nothing is left)."""
+    text = unicodedata.normalize("NFKC", keyword).casefold()
+    without_parens = _PARENS.sub(" ", text)
+    # A keyword that is only a parenthetical keeps its contents
+    text = without_parens if without_parens.strip() else text.replace("(", " ").replace(")", " ")
+    text = _PUNCTUATION.sub(" ", _SEPARATORS.sub(" ", text))
+    return " ".join(_singular(word) for word in text.split())
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def save_keyword_index(output_dir: Path, ai_keywords: list, scholar_keywords: list) -> Path:
+    """Index each researcher row's AI and Scholar keyword strings; returns the index directory."""
+    directory = output_dir / KEYWORDS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+
+    spellings: dict[str, Counter] = defaultdict(Counter)
+    postings: dict[str, dict[int, int]] = defaultdict(dict)
+    for row, (ai, scholar) in enumerate(zip(ai_keywords, scholar_keywords)):
+        for source, text in ((SOURCE_AI, ai), (SOURCE_SCHOLAR, scholar)):
+            for keyword in split_keywords(text):
+                key = keyword_key(keyword)
+                if not key:
+                    continue
+                spellings[key][keyword] += 1
+                postings[key][row] = postings[key].get(row, 0) | source
+
+    keys = sorted(postings)
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    rows, sources = [], []
+    for i, key in enumerate(keys):
+        entries = sorted(postings[key].items())
+        rows.extend(row for row, _ in entries)
+        sources.extend(source for _, source in entries)
+        indptr[i + 1] = len(rows)
+    rows = np.asarray(rows, dtype=np.int32)
+    keyword_ids = np.repeat(np.arange(len(keys), dtype=np.int32), np.diff(indptr))
+    order = np.lexsort((keyword_ids, rows))
+    by_researcher = np.searchsorted(rows[order], np.arange(len(ai_keywords) + 1)).astype(np.int64)
+
+    np.save(directory / "indptr.npy", indptr)
+    np.save(directory / "researchers.npy", rows)
+    np.save(directory / "sources.npy", np.asarray(sources, dtype=np.uint8))
+    np.savez(directory / "by_researcher.npz", indptr=by_researcher, keywords=keyword_ids[order])
+    # keywords.json last: an index without it is incomplete
+    with open(directory / "keywords.json", "w", encoding="utf-8") as f:
+        json.dump({
+            # Most frequent spelling, ties by first seen
+            "keys": keys,
+            "labels": [spellings[key].most_common(1)[0][0] for key in keys],
+            "counts": np.diff(indptr).tolist(),
+        }, f, ensure_ascii=False, separators=(",", ":"))
+    return directory
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+class KeywordIndex:
+    def __init__(self, data_dir: Path):
+        directory = data_dir / KEYWORDS_DIR
+        with open(directory / "keywords.json", "r", encoding="utf-8") as f:
+            dictionary = json.load(f)
+        self.keys = dictionary["keys"]
+        self.labels = dictionary["labels"]
+        self.counts = np.asarray(dictionary["counts"], dtype=np.int64)
+        self._ids = {key: i for i, key in enumerate(self.keys)}
+        self.indptr = np.load(directory / "indptr.npy", mmap_mode="r")
+        self.rows = np.load(directory / "researchers.npy", mmap_mode="r")
+        self.sources = np.load(directory / "sources.npy", mmap_mode="r")
+        with np.load(directory / "by_researcher.npz") as forward:
+            self.forward_indptr = forward["indptr"]
+            self.forward_keywords = forward["keywords"]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, keyword: str) -> int | None:
+        """Keyword id of any spelling of keyword, or None."""
+        return self._ids.get(keyword_key(keyword))
+
+    def researchers(self, keyword: str, source: int | None = None) -> np.ndarray:
+        """Sorted researcher rows tagged with keyword (only from `source` keywords if given)."""
+        i = self.lookup(keyword)
+        if i is None:
+            return np.zeros(0, dtype=np.int32)
+        start, stop = int(self.indptr[i]), int(self.indptr[i + 1])
+        rows = np.asarray(self.rows[start:stop])
+        if source is not None:
+            rows = rows[(np.asarray(self.sources[start:stop]) & source) > 0]
+        return rows
+
+    def filter(self, all_of: list[str] = (), any_of: list[str] = ()) -> np.ndarray | None:
+        """Sorted rows tagged with every keyword in all_of and at least one in any_of; None if both are empty."""
+        result = None
+        if any_of:
+            result = np.unique(np.concatenate([self.researchers(k) for k in any_of]))
+        # Smallest posting lists first, so intersections shrink fast
+        for rows in sorted((self.researchers(k) for k in all_of), key=len):
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def facets(self, rows: np.ndarray | None = None, top: int = DEFAULT_FACETS) -> list[tuple[str, int]]:
+        """The `top` most common keywords (label, researchers) among rows, or among everyone."""
+        if rows is None:
+            counts = self.counts
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            starts, stops = self.forward_indptr[rows], self.forward_indptr[rows + 1]
+            lengths = stops - starts
+            positions = np.repeat(stops - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+            counts = np.bincount(self.forward_keywords[positions], minlength=len(self.keys))
+        top = min(top, int((counts > 0).sum()))
+        if top <= 0:
+            return []
+        best = np.argpartition(counts, len(counts) - top)[len(counts) - top:]
+        best = best[np.lexsort((best, -counts[best]))]
+        return [(self.labels[i], int(counts[i])) for i in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up researchers by keyword and count keyword facets")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--keyword", "-k", action="append", default=[], help="Required keyword (repeatable, ANDed)")
+    parser.add_argument("--any", action="append", default=[], help="Alternative keyword (repeatable, ORed)")
+    parser.add_argument("--facets", type=int, default=0, metavar="N", help="Also print the N most common keywords")
+    args = parser.parse_args()
+
+    from similarity import INDEX_FILE
+    with open(args.data_dir / INDEX_FILE, "r", encoding="utf-8") as f:
+        researchers = json.load(f)["researchers"]
+    index = KeywordIndex(args.data_dir)
+    rows = index.filter(args.keyword, args.any)
+    if rows is not None:
+        print(f"{len(rows)} researchers")
+        for row in rows:
+            print(f"  {researchers[row]['name']} ({researchers[row]['affiliation']})")
+    if args.facets:
+        print(f"\nTop keywords{' among them' if rows is not None else ''}:")
+        for label, count in index.facets(rows, args.facets):
+            print(f"  {count:>5}  {label}")
+
+
+if __name__ == "__main__":
+    main()
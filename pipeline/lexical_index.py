@@ -0,0 +1,223 @@
+"""
+BM25 keyword index over the paper texts, fused with dense scores.
+
+gte-small vectors blur exact acronyms and method names ("IBVS", "SLAM")
+that the keywords spell out. This indexes the same text that gets embedded
+(title + abstract + AI keywords + researcher keywords), tokenized exactly
+like the topic stage (wizmap_utils.topic_vectorizer), at two granularities:
+papers, in paper_index.py's row order, and researchers, whose document is
+the sum of their papers' term counts.
+
+Everything lives in <output-dir>/lexical/ as .npy files that load with
+mmap_mode="r", so opening the index reads nothing up front:
+
+    terms.npy                 sorted UTF-8 vocabulary (looked up with searchsorted)
+    <level>/meta.json         n_docs, avgdl, k1, b
+    <level>/idf.npy           n_terms float32
+    <level>/indptr.npy        n_terms + 1 int64; term t's postings are
+                              indptr[t]:indptr[t+1]
+    <level>/docs.npy          int32 document row of each posting
+    <level>/weights.npy       float16 BM25 term weight of each posting,
+                              tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+
+with <level> papers or researchers. Weights are precomputed at build time,
+so a query's BM25 score is one scatter-add of idf * weights per query term.
+
+Hybrid ranking fuses the BM25 ranking with the cosine ranking by
+reciprocal-rank fusion: sum over both lists of 1 / (RRF_K + rank), each
+list cut at RRF_DEPTH, which needs no score calibration between the two.
+
+Usage:
+    python lexical_index.py --data-dir ./output --query "IBVS quadrotor"
+    python lexical_index.py --data-dir ./output --query "SLAM" --researchers --hybrid
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+LEXICAL_DIR = "lexical"
+LEVELS = ["papers", "researchers"]
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+RRF_DEPTH = 100
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def _save_level(directory: Path, counts, k1: float = K1, b: float = B) -> dict:
+    """Write the BM25 postings of a docs x terms count matrix."""
+    directory.mkdir(parents=True, exist_ok=True)
+    n_docs = counts.shape[0]
+    doc_len = np.asarray(counts.sum(axis=1)).ravel().astype(np.float32)
+    avgdl = float(doc_len.mean()) if n_docs and doc_len.mean() > 0 else 1.0
+
+    postings = counts.tocsc()
+    postings.sort_indices()
+    docs = postings.indices.astype(np.int32)
+    tf = postings.data.astype(np.float32)
+    norm = k1 * (1 - b + b * doc_len[docs] / avgdl)
+    weights = (tf * (k1 + 1) / (tf + norm)).astype(np.float16)
+    df = np.diff(postings.indptr)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    np.save(directory / "idf.npy", idf)
+    np.save(directory / "indptr.npy", postings.indptr.astype(np.int64))
+    np.save(directory / "docs.npy", docs)
+    np.save(directory / "weights.npy", weights)
+    meta = {"n_docs": int(n_docs), "n_postings": int(len(docs)), "avgdl": round(avgdl, 4), "k1": k1, "b": b}
+    # meta.json last: a level without it is incomplete
+    with open(directory / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def save_lexical_index(output_dir: Path, texts: list[str], offsets: np.ndarray) -> Path:
+    """Index paper texts (in paper index order) and their per-researcher sums; offsets as in papers/offsets.npy."""
+    from scipy.sparse import csr_matrix
+    from wizmap_utils import topic_vectorizer
+
+    directory = output_dir / LEXICAL_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    vectorizer = topic_vectorizer()
+    counts = vectorizer.fit_transform(texts).tocsr()
+    # UTF-8 bytes sort in the same (code point) order as the str vocabulary, at a quarter of "<U" width
+    terms = [term.encode("utf-8") for term in vectorizer.get_feature_names_out()]
+    np.save(directory / "terms.npy", np.asarray(terms, dtype=bytes))
+
+    n_researchers = len(offsets) - 1
+    owner = np.repeat(np.arange(n_researchers), np.diff(offsets))
+    membership = csr_matrix(
+        (np.ones(len(owner), dtype=np.int64), (owner, np.arange(len(owner)))),
+        shape=(n_researchers, counts.shape[0]),
+    )
+    _save_level(directory / "papers", counts)
+    _save_level(directory / "researchers", (membership @ counts).tocsr())
+    return directory
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+class BM25Level:
+    def __init__(self, directory: Path):
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.idf = np.load(directory / "idf.npy", mmap_mode="r")
+        self.indptr = np.load(directory / "indptr.npy", mmap_mode="r")
+        self.docs = np.load(directory / "docs.npy", mmap_mode="r")
+        self.weights = np.load(directory / "weights.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.meta["n_docs"]
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """(document rows in increasing order, BM25 term weights) of one term."""
+        start, stop = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+        return self.docs[start:stop], self.weights[start:stop]
+
+    def scores(self, term_ids: np.ndarray) -> np.ndarray:
+        out = np.zeros(len(self), dtype=np.float32)
+        for t in term_ids:
+            start, stop = int(self.indptr[t]), int(self.indptr[t + 1])
+            # A term's postings name each document once, so plain fancy-index += is safe
+            out[self.docs[start:stop]] += self.idf[t] * self.weights[start:stop].astype(np.float32)
+        return out
+
+
+class LexicalIndex:
+    def __init__(self, data_dir: Path):
+        from wizmap_utils import topic_vectorizer
+
+        directory = data_dir / LEXICAL_DIR
+        self.terms = np.load(directory / "terms.npy", mmap_mode="r")
+        self.levels = {level: BM25Level(directory / level) for level in LEVELS}
+        self.analyzer = topic_vectorizer().build_analyzer()
+
+    def term_counts(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """(vocabulary ids, occurrence counts) of the text's distinct known tokens."""
+        tokens, counts = np.unique(np.asarray([t.encode("utf-8") for t in self.analyzer(text)], dtype=bytes),
+                                   return_counts=True)
+        if len(tokens) == 0 or len(self.terms) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.terms, tokens), len(self.terms) - 1)
+        known = self.terms[pos] == tokens
+        return pos[known], counts[known]
+
+    def term_ids(self, query: str) -> np.ndarray:
+        """Vocabulary ids of the query's distinct known tokens."""
+        return self.term_counts(query)[0]
+
+    def term(self, term_id: int) -> str:
+        return self.terms[term_id].decode("utf-8")
+
+    def scores(self, query: str, level: str = "papers") -> np.ndarray:
+        """BM25 score of every document at level ("papers" or "researchers")."""
+        return self.levels[level].scores(self.term_ids(query))
+
+
+def ranking(scores: np.ndarray, depth: int = RRF_DEPTH, positive: bool = False) -> np.ndarray:
+    """Rows of the `depth` best finite scores (only scores > 0 with positive), best first, ties by row."""
+    valid = np.isfinite(scores) & (scores > 0 if positive else True)
+    rows = np.flatnonzero(valid)
+    if len(rows) > depth:
+        rows = rows[np.argpartition(scores[rows], len(rows) - depth)[len(rows) - depth:]]
+    return rows[np.lexsort((rows, -scores[rows]))]
+
+
+def rrf(rankings: list[np.ndarray], n: int, rrf_k: int = RRF_K) -> np.ndarray:
+    """Reciprocal-rank fusion: per row, sum of 1 / (rrf_k + rank) over the rankings it appears in."""
+    fused = np.zeros(n, dtype=np.float64)
+    for rows in rankings:
+        fused[rows] += 1.0 / (rrf_k + np.arange(1, len(rows) + 1))
+    return fused
+
+
+def hybrid_scores(lexical: np.ndarray, dense: np.ndarray, depth: int = RRF_DEPTH, rrf_k: int = RRF_K) -> np.ndarray:
+    """RRF of the BM25 and cosine rankings; rows in neither top `depth` score 0."""
+    return rrf([ranking(lexical, depth, positive=True), ranking(dense, depth)], len(dense), rrf_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the BM25 keyword index, optionally fused with dense scores")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--query", "-q", required=True)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--researchers", action="store_true", help="Rank researchers instead of papers")
+    parser.add_argument("--hybrid", action="store_true",
+                        help="Fuse with cosine similarity by reciprocal-rank fusion (loads the encoder)")
+    args = parser.parse_args()
+
+    from paper_index import PaperIndex
+    from similarity import load_researcher_matrix
+
+    index_meta, matrix = load_researcher_matrix(args.data_dir)
+    researchers = index_meta["researchers"]
+    papers = PaperIndex(args.data_dir)
+    lexical = LexicalIndex(args.data_dir)
+    level = "researchers" if args.researchers else "papers"
+    scores = lexical.scores(args.query, level)
+    if args.hybrid:
+        from query_server import load_encoder
+        vec = load_encoder(index_meta["model"])([args.query])[0]
+        vec /= np.linalg.norm(vec) or 1.0
+        dense = matrix @ vec if args.researchers else papers.scores(vec)
+        scores = hybrid_scores(scores, dense)
+
+    for row in ranking(scores, args.k, positive=True):
+        if args.researchers:
+            print(f"{scores[row]:.4f}  {researchers[row]['name']} ({researchers[row]['affiliation']})")
+        else:
+            paper = papers.paper(row)
+            print(f"{scores[row]:.4f}  {paper['title']} ({paper['year']}) — {researchers[papers.researcher_of[row]]['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Match many proposal / funding-call texts to small teams of researchers.
+
+For a batch of proposals:
+  1. embed all texts in encoder batches of up to ENCODE_BATCH and score them
+     against the researcher matrix with one (proposals x researchers) matrix
+     product; each proposal keeps its CANDIDATES most similar researchers
+  2. take the proposal's topics from the BM25 keyword index (lexical/, see
+     lexical_index.py): its known terms, weighted by count x idf, the
+     MAX_TOPICS heaviest, normalized to sum 1
+  3. a researcher covers a topic by their BM25 term weight scaled to 0..1
+     (saturating in term frequency, normalized for profile length), and a
+     team covers it by its best member
+  4. greedily add the candidate with the best mix of coverage gain and
+     similarity, (1 - RELEVANCE_WEIGHT) * gain + RELEVANCE_WEIGHT * similarity
+     / best similarity, until the team has --team-size members or nobody adds
+     MIN_GAIN coverage
+
+Proposals are read from a CSV (--id-column, --text-column) or a JSON list of
+{"id", "text"} objects or strings. Output is JSON (one object per proposal
+with its topics, coverage and team) or, for a .csv --output, one row per
+team member.
+
+Usage:
+    python match_proposals.py --data-dir ./output --proposals calls.csv --output teams.json
+    python match_proposals.py --data-dir ./output --proposals calls.json --output teams.csv --team-size 4
+"""
+
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from lexical_index import LEXICAL_DIR, LexicalIndex
+from similarity import load_researcher_matrix, normalize_rows
+
+
+TEAM_SIZE = 3
+CANDIDATES = 50
+MAX_TOPICS = 30
+RELEVANCE_WEIGHT = 0.3
+MIN_GAIN = 0.02
+ENCODE_BATCH = 128
+
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+
+def read_proposals(path: Path, id_column: str = "id", text_column: str = "text") -> list[dict]:
+    """[{"id", "text"}, ...] from a CSV or JSON file; ids default to the row number."""
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        proposals = [item if isinstance(item, dict) else {"text": item} for item in items]
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            proposals = [{"id": row.get(id_column), "text": row.get(text_column)} for row in csv.DictReader(f)]
+    return [
+        {"id": str(p.get("id") or i), "text": p.get("text") or ""}
+        for i, p in enumerate(proposals)
+    ]
+
+
+def embed(texts: list[str], encode_batch, batch_size: int = ENCODE_BATCH) -> np.ndarray:
+    """Unit embeddings of texts, batch_size texts per encoder call, shortest texts batched together."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    out = None
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        vectors = np.asarray(encode_batch([texts[i] for i in rows]), dtype=np.float32)
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        out[rows] = vectors
+    return normalize_rows(out) if out is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Teams
+# ---------------------------------------------------------------------------
+
+def proposal_topics(lexical: LexicalIndex, text: str, max_topics: int = MAX_TOPICS) -> tuple[np.ndarray, np.ndarray]:
+    """(term ids, weights summing to 1) of the text's max_topics heaviest terms by count x researcher idf."""
+    term_ids, counts = lexical.term_counts(text)
+    weights = counts * np.asarray(lexical.levels["researchers"].idf)[term_ids]
+    keep = np.argsort(-weights, kind="stable")[:max_topics]
+    term_ids, weights = term_ids[keep], weights[keep]
+    total = weights.sum()
+    return term_ids, (weights / total if total > 0 else weights).astype(np.float32)
+
+
+def coverage_matrix(lexical: LexicalIndex, term_ids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """len(rows) x len(term_ids): how well each researcher row covers each term, 0..1."""
+    level = lexical.levels["researchers"]
+    ceiling = level.meta["k1"] + 1
+    out = np.zeros((len(rows), len(term_ids)), dtype=np.float32)
+    for j, term_id in enumerate(term_ids):
+        docs, weights = level.postings(term_id)
+        if len(docs) == 0:
+            continue
+        pos = np.minimum(np.searchsorted(docs, rows), len(docs) - 1)
+        hit = docs[pos] == rows
+        out[hit, j] = weights[pos[hit]].astype(np.float32) / ceiling
+    return out
+
+
+def greedy_team(coverage: np.ndarray, weights: np.ndarray, similarity: np.ndarray, team_size: int = TEAM_SIZE,
+                relevance_weight: float = RELEVANCE_WEIGHT, min_gain: float = MIN_GAIN) -> tuple[list, np.ndarray]:
+    """([(candidate, coverage gain), ...], per-topic coverage of the team)."""
+    covered = np.zeros(coverage.shape[1], dtype=np.float32)
+    relevance = np.clip(similarity / max(float(similarity.max(initial=0)), 1e-9), 0, 1)
+    available = np.ones(len(coverage), dtype=bool)
+    team = []
+    while len(team) < min(team_size, len(coverage)):
+        gain = np.maximum(coverage - covered, 0) @ weights
+        score = (1 - relevance_weight) * gain + relevance_weight * relevance
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        # The first member is always picked: a proposal gets a team even without known topics
+        if team and gain[best] < min_gain:
+            break
+        team.append((best, float(gain[best])))
+        covered = np.maximum(covered, coverage[best])
+        available[best] = False
+    return team, covered
+
+
+def match_teams(
+    proposals: list[dict],
+    vectors: np.ndarray,
+    matrix: np.ndarray,
+    researchers: list[dict],
+    lexical: LexicalIndex,
+    team_size: int = TEAM_SIZE,
+    candidates: int = CANDIDATES,
+) -> list[dict]:
+    """Teams for proposals with unit embeddings `vectors`, against the researcher matrix and keyword index."""
+    sims = vectors @ np.asarray(matrix).T
+    n_candidates = min(candidates, sims.shape[1])
+    top = np.argpartition(sims, sims.shape[1] - n_candidates, axis=1)[:, sims.shape[1] - n_candidates:]
+
+    results = []
+    for proposal, rows, row_sims in zip(proposals, top, sims):
+        rows = np.sort(rows)
+        term_ids, weights = proposal_topics(lexical, proposal["text"])
+        coverage = coverage_matrix(lexical, term_ids, rows)
+        team, covered = greedy_team(coverage, weights, row_sims[rows], team_size)
+        terms = [lexical.term(t) for t in term_ids]
+        results.append({
+            "id": proposal["id"],
+            "coverage": round(float(covered @ weights), 4),
+            "topics": terms,
+            "uncovered": [term for term, c in zip(terms, covered) if c == 0],
+            "team": [
+                {
+                    **researchers[rows[c]],
+                    "similarity": round(float(row_sims[rows[c]]), 4),
+                    "gain": round(gain, 4),
+                    "topics": [term for term, v in zip(terms, coverage[c]) if v > 0],
+                }
+                for c, gain in team
+            ],
+        })
+    return results
+
+
+def match_proposals(
+    proposals: list[dict],
+    data_dir: Path,
+    encode_batch,
+    team_size: int = TEAM_SIZE,
+    candidates: int = CANDIDATES,
+    batch_size: int = ENCODE_BATCH,
+    vectors: np.ndarray | None = None,
+) -> list[dict]:
+    """match_teams on the map output in data_dir; vectors, if given, skip encoding."""
+    index, matrix = load_researcher_matrix(data_dir)
+    if vectors is None:
+        vectors = embed([p["text"] for p in proposals], encode_batch, batch_size)
+    return match_teams(proposals, vectors, matrix, index["researchers"], LexicalIndex(data_dir), team_size, candidates)
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+CSV_COLUMNS = ["proposal_id", "team_coverage", "rank", "researcher_id", "name", "affiliation",
+               "similarity", "gain", "topics"]
+
+
+def write_results(results: list[dict], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() != ".csv":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for result in results:
+            for rank, member in enumerate(result["team"], 1):
+                writer.writerow([
+                    result["id"], result["coverage"], rank, member["id"], member["name"], member["affiliation"],
+                    member["similarity"], member["gain"], ";".join(member["topics"]),
+                ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match proposal texts to small researcher teams")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--proposals", "-i", type=Path, required=True, help="CSV or JSON file of proposals")
+    parser.add_argument("--output", "-o", type=Path, default=Path("teams.json"), help=".json or .csv (default: teams.json)")
+    parser.add_argument("--id-column", default="id", help="CSV column with the proposal id (default: id)")
+    parser.add_argument("--text-column", default="text", help="CSV column with the proposal text (default: text)")
+    parser.add_argument("--team-size", type=int, default=TEAM_SIZE, help=f"Maximum team size (default: {TEAM_SIZE})")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES,
+                        help=f"Most similar researchers considered per proposal (default: {CANDIDATES})")
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH,
+                        help=f"Proposals per encoder call (default: {ENCODE_BATCH})")
+    args = parser.parse_args()
+
+    if not (args.data_dir / LEXICAL_DIR).exists():
+        parser.error(f"{args.data_dir / LEXICAL_DIR} not found; run generate_map_data.py first")
+    proposals = read_proposals(args.proposals, args.id_column, args.text_column)
+    print(f"Loaded {len(proposals)} proposals")
+
+    from query_server import load_encoder
+    index, _ = load_researcher_matrix(args.data_dir)
+    encode_batch = load_encoder(index["model"])
+
+    start = time.perf_counter()
+    results = match_proposals(proposals, args.data_dir, encode_batch, args.team_size, args.candidates, args.batch_size)
+    write_results(results, args.output)
+    print(f"Matched {len(results)} proposals in {time.perf_counter() - start:.1f}s: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Per-stage timing, throughput and memory metrics for the pipeline scripts.
+
+Each stage records its sub-steps (load, embed, UMAP, ...) with wall time, CPU
+time, peak resident memory and, where it makes sense, items processed and
+items per second:
+
+    metrics = Metrics("map")
+    with metrics.step("embed", items=len(texts)):
+        ...
+    metrics.save("metrics/map.json")
+    print(metrics.table())
+
+Peak RSS is sampled from /proc/self/statm on a background thread while a step
+runs, so it is the peak during that step; elsewhere it falls back to the
+process-lifetime maximum from getrusage. CPU time is process-wide, so steps
+running concurrently in one process (run_pipeline.py --in-process) share it.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def current_rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class _PeakRssSampler:
+    def __init__(self):
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss_bytes()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self) -> int | None:
+        if self._thread is None:
+            return max_rss_bytes()
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss_bytes()
+        return max(self.peak, rss or 0)
+
+
+class Metrics:
+    """Collects sub-step records for one stage (combine, summaries, map, images, process-images)."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.steps: list[dict] = []
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def step(self, name: str, items: int | None = None):
+        """Time a sub-step. The yielded record's "items" may be set inside the block."""
+        record = {"step": name, "items": items}
+        sampler = _PeakRssSampler()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = time.perf_counter() - wall0
+            record["cpu_s"] = time.process_time() - cpu0
+            record["peak_rss_mb"] = _mb(sampler.stop())
+            if record["items"] is not None and record["wall_s"] > 0:
+                record["items_per_s"] = record["items"] / record["wall_s"]
+            else:
+                record["items_per_s"] = None
+            self.steps.append(record)
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "wall_s": time.perf_counter() - self._wall0,
+            "cpu_s": time.process_time() - self._cpu0,
+            "peak_rss_mb": _mb(max_rss_bytes()),
+            "steps": self.steps,
+        }
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def table(self) -> str:
+        return format_table([self.to_dict()])
+
+
+def timed(metrics: "Metrics | None", name: str, items: int | None = None):
+    """metrics.step(name, items), or a no-op yielding a scratch record when metrics is None."""
+    if metrics is None:
+        return nullcontext({"step": name, "items": items})
+    return metrics.step(name, items=items)
+
+
+def _mb(n_bytes: int | None) -> float | None:
+    return None if n_bytes is None else round(n_bytes / (1024 * 1024), 1)
+
+
+def _fmt(value, spec: str) -> str:
+    if value is None:
+        return "-".rjust(int(re.match(r"\d+", spec).group()))
+    return format(value, spec)
+
+
+def format_table(stages: list[dict]) -> str:
+    """Human-readable table of stage dicts as produced by Metrics.to_dict()."""
+    header = f"{'stage':<14} {'step':<16} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'items':>8} {'items/s':>9}"
+    lines = [header, "-" * len(header)]
+    for stage in stages:
+        for s in stage.get("steps", []):
+            lines.append(
+                f"{stage['stage']:<14} {s['step']:<16} {_fmt(s['wall_s'], '9.2f')} {_fmt(s['cpu_s'], '9.2f')} "
+                f"{_fmt(s['peak_rss_mb'], '9.1f')} {_fmt(s['items'], '8d')} {_fmt(s['items_per_s'], '9.1f')}"
+            )
+        lines.append(
+            f"{stage['stage']:<14} {'(total)':<16} {_fmt(stage.get('wall_s'), '9.2f')} {_fmt(stage.get('cpu_s'), '9.2f')} "
+            f"{_fmt(stage.get('peak_rss_mb'), '9.1f')} {'':>8} {'':>9}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,175 @@
+"""
+Paper-level embedding index: "who wrote the paper closest to my abstract".
+
+generate_map_data.py embeds every paper and then keeps only each
+researcher's median. This keeps the per-paper vectors too, in
+<output-dir>/papers/:
+
+    embeddings.npy   n_papers x dim, L2-normalized, float16 by default
+                     (float32 with --paper-dtype float32); loads with mmap_mode="r"
+    offsets.npy      n_researchers + 1 int64: researcher r's papers are rows
+                     offsets[r]:offsets[r+1], in researcher_index.json order
+    papers.json      per-row metadata as columns: title, year, url, citations
+
+A query is one pass over the matrix (in float32 blocks of BLOCK_ROWS rows),
+after which papers are ranked directly, or the scores are rolled up per
+researcher with np.maximum.reduceat ("max") or as the mean of each
+researcher's best `top` papers ("mean"), without recomputing anything.
+
+Usage:
+    python paper_index.py --data-dir ./output --query "visual servoing with event cameras"
+    python paper_index.py --data-dir ./output --query "..." --researchers --rollup mean --top 3
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+PAPERS_DIR = "papers"
+BLOCK_ROWS = 65536
+DEFAULT_TOP = 3
+METADATA_COLUMNS = {"paper_title": "title", "paper_year": "year", "paper_url": "url", "paper_citations": "citations"}
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    return value
+
+
+def papers_in_order(df, researcher_ids: list[str]):
+    """(df rows grouped in researcher_ids order, offsets): the paper row order every paper-level index uses."""
+    position = {sid: i for i, sid in enumerate(researcher_ids)}
+    owner = df["google_scholar_id"].astype(str).map(position)
+    rows = df[owner.notna()]
+    owner = owner[owner.notna()].astype(np.int64).to_numpy()
+    # Stable sort keeps each researcher's papers in input order
+    order = np.argsort(owner, kind="stable")
+    counts = np.bincount(owner, minlength=len(researcher_ids))
+    return rows.iloc[order], np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def save_paper_index(output_dir: Path, df, researcher_ids: list[str], dtype: str = "float16") -> Path:
+    """Write the paper index for df (one row per paper, with "embedding") grouped in researcher_ids order."""
+    directory = output_dir / PAPERS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rows, offsets = papers_in_order(df, researcher_ids)
+    matrix = np.vstack(rows["embedding"].to_numpy()).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    tmp_path = directory / ".embeddings.npy"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray((matrix / norms).astype(dtype)))
+    tmp_path.replace(directory / "embeddings.npy")
+    np.save(directory / "offsets.npy", offsets)
+    metadata = {
+        name: [_clean(v) for v in rows[column]] if column in rows else [None] * len(rows)
+        for column, name in METADATA_COLUMNS.items()
+    }
+    with open(directory / "papers.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, separators=(",", ":"))
+    return directory
+
+
+class PaperIndex:
+    def __init__(self, data_dir: Path):
+        directory = data_dir / PAPERS_DIR
+        self.matrix = np.load(directory / "embeddings.npy", mmap_mode="r")
+        self.offsets = np.load(directory / "offsets.npy")
+        with open(directory / "papers.json", "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        counts = np.diff(self.offsets)
+        self.researcher_of = np.repeat(np.arange(len(counts)), counts)
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine score of every paper for one unit query vector."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), BLOCK_ROWS):
+            block = np.asarray(self.matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+            out[start:start + len(block)] = block @ query
+        return out
+
+    def paper(self, row: int) -> dict:
+        return {name: values[row] for name, values in self.metadata.items()}
+
+    def top_papers(self, query: np.ndarray, k: int = 10) -> list[tuple[int, int, float]]:
+        """(paper row, researcher row, score) of the k best papers."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(i), int(self.researcher_of[i]), float(scores[i])) for i in top]
+
+    def researcher_scores(self, query: np.ndarray, rollup: str = "max", top: int = DEFAULT_TOP) -> np.ndarray:
+        """Per-researcher score: best paper ("max") or mean of the best `top` papers ("mean").
+
+        Researchers without papers score -inf.
+        """
+        scores = self.scores(query)
+        n_researchers = len(self.offsets) - 1
+        result = np.full(n_researchers, -np.inf, dtype=np.float32)
+        has_papers = np.diff(self.offsets) > 0
+        if not has_papers.any():
+            return result
+        if rollup == "max":
+            starts = self.offsets[:-1][has_papers]
+            result[has_papers] = np.maximum.reduceat(scores, starts)
+            return result
+        if rollup != "mean":
+            raise ValueError(f"unknown rollup {rollup!r} (use max or mean)")
+        # Sort by researcher, then by decreasing score; keep each researcher's first `top`
+        order = np.lexsort((-scores, self.researcher_of))
+        owner = self.researcher_of[order]
+        rank = np.arange(len(order)) - self.offsets[owner]
+        keep = rank < top
+        sums = np.bincount(owner[keep], weights=scores[order][keep], minlength=n_researchers)
+        counts = np.minimum(np.diff(self.offsets), top)
+        result[has_papers] = (sums[has_papers] / counts[has_papers]).astype(np.float32)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the paper-level embedding index")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"), help="generate_map_data.py output directory")
+    parser.add_argument("--query", "-q", required=True, help="Free text, e.g. an abstract")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--researchers", action="store_true", help="Rank researchers instead of papers")
+    parser.add_argument("--rollup", choices=["max", "mean"], default="max",
+                        help="Researcher score: best paper or mean of the best --top papers (default: max)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help=f"Papers averaged by --rollup mean (default: {DEFAULT_TOP})")
+    args = parser.parse_args()
+
+    from query_server import load_encoder
+    from similarity import load_researcher_matrix
+
+    index_meta, _ = load_researcher_matrix(args.data_dir)
+    researchers = index_meta["researchers"]
+    index = PaperIndex(args.data_dir)
+    vec = load_encoder(index_meta["model"])([args.query])[0]
+    vec /= np.linalg.norm(vec) or 1.0
+
+    if args.researchers:
+        scores = index.researcher_scores(vec, args.rollup, args.top)
+        for r in np.argsort(-scores, kind="stable")[:args.k]:
+            print(f"{scores[r]:.4f}  {researchers[r]['name']} ({researchers[r]['affiliation']})")
+    else:
+        for row, r, score in index.top_papers(vec, args.k):
+            paper = index.paper(row)
+            print(f"{score:.4f}  {paper['title']} ({paper['year']}) — {researchers[r]['name']}")
+
+
+if __name__ == "__main__":
+    main()
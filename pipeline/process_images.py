@@ -0,0 +1,267 @@
+"""
+Post-process downloaded researcher photos for the frontend.
+
+Reads id_to_image_mapping.json from the download_images.py output directory
+and, for every photo:
+  1. hashes its bytes, so byte-identical photos (e.g. the default Scholar
+     avatar) are processed and stored once
+  2. center-crops it to a square and resizes it to each display size
+     (48px map thumbnail, 240px info panel: 2x the CSS size)
+  3. encodes WebP, AVIF (when this Pillow build supports it) and a JPEG
+     fallback, as content-addressed files <size>/<hash>.<ext>
+
+The map thumbnails are then packed into sprite atlases (WebP + JPEG) of up to
+SPRITE_COLUMNS x SPRITE_COLUMNS tiles, so the map needs a few requests
+instead of one per researcher. image_index.json, written next to
+data.ndjson, maps each scholar id to its image hash and each hash to its
+atlas tile:
+
+    {
+      "base": "images/processed",
+      "sizes": {"thumb": 48, "panel": 240},
+      "formats": ["avif", "webp", "jpg"],
+      "images": {"<scholar_id>": "<hash>", ...},
+      "sprites": {
+        "tile": 48,
+        "atlases": [{"webp": "sprites/atlas-000.webp", "jpg": "...", "width": .., "height": ..}],
+        "tiles": {"<hash>": [atlas, x, y], ...}
+      }
+    }
+
+Encoded files are content-addressed, so re-runs only encode new photos, and
+atlases are only rebuilt when the set of thumbnails changes.
+
+Usage:
+    python process_images.py --images-dir ./output/public/images/researchers \
+        --output-dir ./output/public/images/processed --index ./output/image_index.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from metrics_utils import Metrics, timed
+from profiling_utils import profiled
+
+
+SIZES = {"thumb": 48, "panel": 240}
+SPRITE_SIZE = "thumb"
+SPRITE_COLUMNS = 64
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+JPEG_QUALITY = 85
+MAPPING_FILE = "id_to_image_mapping.json"
+
+
+def available_formats() -> list[str]:
+    from PIL import features
+    formats = ["webp", "jpg"]
+    if features.check("avif"):
+        formats.insert(0, "avif")
+    return formats
+
+
+def encode(image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    elif fmt == "avif":
+        image.save(buf, "AVIF", quality=AVIF_QUALITY)
+    else:
+        image.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def square_crop(image):
+    width, height = image.size
+    side = min(width, height)
+    left = (width - side) // 2
+    # Portraits keep the top of the frame, where the face usually is
+    top = 0 if height > width else (height - side) // 2
+    return image.crop((left, top, left + side, top + side))
+
+
+def process_photo(data: bytes, digest: str, output_dir: Path, formats: list[str]) -> bool:
+    """Write every size and format of one photo unless already present. Returns True if anything was encoded."""
+    targets = [output_dir / str(px) / f"{digest}.{fmt}" for px in SIZES.values() for fmt in formats]
+    if all(path.exists() for path in targets):
+        return False
+
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        square = square_crop(image.convert("RGB"))
+        for px in SIZES.values():
+            resized = square.resize((px, px), Image.LANCZOS)
+            for fmt in formats:
+                path = output_dir / str(px) / f"{digest}.{fmt}"
+                if not path.exists():
+                    _write_atomic(path, encode(resized, fmt))
+    return True
+
+
+def build_atlases(digests: list[str], output_dir: Path) -> tuple[list[dict], dict[str, list[int]]]:
+    """Pack the thumbnails of digests (in order) into atlases; returns (atlases, tiles)."""
+    from PIL import Image
+
+    tile = SIZES[SPRITE_SIZE]
+    per_atlas = SPRITE_COLUMNS * SPRITE_COLUMNS
+    sprite_dir = output_dir / "sprites"
+    sprite_dir.mkdir(parents=True, exist_ok=True)
+
+    atlases, tiles = [], {}
+    for index, start in enumerate(range(0, len(digests), per_atlas)):
+        chunk = digests[start:start + per_atlas]
+        columns = min(SPRITE_COLUMNS, len(chunk))
+        rows = (len(chunk) + columns - 1) // columns
+        sheet = Image.new("RGB", (columns * tile, rows * tile), (255, 255, 255))
+        for i, digest in enumerate(chunk):
+            x, y = (i % columns) * tile, (i // columns) * tile
+            # JPEG is the one format every build writes
+            with Image.open(output_dir / str(tile) / f"{digest}.jpg") as thumb:
+                sheet.paste(thumb.convert("RGB"), (x, y))
+            tiles[digest] = [index, x, y]
+
+        atlas = {"width": sheet.width, "height": sheet.height}
+        for fmt in ("webp", "jpg"):
+            name = f"atlas-{index:03d}.{fmt}"
+            _write_atomic(sprite_dir / name, encode(sheet, fmt))
+            atlas[fmt] = f"sprites/{name}"
+        atlases.append(atlas)
+
+    # Atlases left over from a larger previous set
+    for old in sprite_dir.glob("atlas-*"):
+        if int(old.name.split("-")[1].split(".")[0]) >= len(atlases):
+            old.unlink()
+    return atlases, tiles
+
+
+def process_images(
+    images_dir: Path,
+    output_dir: Path,
+    index_path: Path,
+    workers: int = 8,
+    base_url: str = "images/processed",
+    metrics=None,
+) -> dict:
+    """Process the photos listed in images_dir's mapping; writes and returns the index."""
+    mapping_path = images_dir / MAPPING_FILE
+    if not mapping_path.exists():
+        print(f"No {MAPPING_FILE} in {images_dir}; run download_images.py first", file=sys.stderr)
+        sys.exit(1)
+    with open(mapping_path, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    formats = available_formats()
+    for px in SIZES.values():
+        (output_dir / str(px)).mkdir(parents=True, exist_ok=True)
+
+    with timed(metrics, "hash") as record:
+        def read_and_hash(sid: str):
+            path = images_dir / Path(mapping[sid]).name
+            if not path.exists():
+                return sid, None, None
+            data = path.read_bytes()
+            return sid, hashlib.sha256(data).hexdigest()[:20], data
+
+        images, unique = {}, {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for sid, digest, data in pool.map(read_and_hash, sorted(mapping)):
+                if digest is None:
+                    continue
+                images[sid] = digest
+                unique.setdefault(digest, data)
+        record["items"] = len(images)
+    print(f"{len(images)} photos, {len(unique)} unique")
+
+    failed = set()
+    with timed(metrics, "encode", items=len(unique)):
+        def encode_one(item):
+            digest, data = item
+            try:
+                return digest, process_photo(data, digest, output_dir, formats)
+            except Exception as e:
+                print(f"  Skipping {digest}: {e}", file=sys.stderr)
+                return digest, None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(encode_one, unique.items()))
+        encoded = sum(1 for _, r in results if r)
+        failed = {digest for digest, r in results if r is None}
+    print(f"Encoded {encoded} new photos ({', '.join(formats)}), {len(failed)} unreadable")
+
+    images = {sid: digest for sid, digest in images.items() if digest not in failed}
+    digests = sorted(set(images.values()))
+
+    previous = {}
+    if index_path.exists():
+        with open(index_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    previous_sprites = previous.get("sprites", {})
+    sprites_current = (
+        sorted(previous_sprites.get("tiles", {})) == digests
+        and previous_sprites.get("tile") == SIZES[SPRITE_SIZE]
+        and all((output_dir / a["webp"]).exists() and (output_dir / a["jpg"]).exists()
+                for a in previous_sprites.get("atlases", []))
+    )
+
+    with timed(metrics, "sprites", items=len(digests)):
+        if sprites_current:
+            atlases, tiles = previous_sprites["atlases"], previous_sprites["tiles"]
+            print("Sprite atlases up to date")
+        else:
+            atlases, tiles = build_atlases(digests, output_dir)
+            print(f"Packed {len(digests)} thumbnails into {len(atlases)} sprite atlas(es)")
+
+    index = {
+        "base": base_url,
+        "sizes": SIZES,
+        "formats": formats,
+        "images": images,
+        "sprites": {"tile": SIZES[SPRITE_SIZE], "atlases": atlases, "tiles": tiles},
+    }
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(index_path, json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    print(f"Index: {index_path}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resize, re-encode, dedupe and sprite researcher photos")
+    parser.add_argument("--images-dir", type=Path, default=Path("public/images/researchers"),
+                        help="download_images.py output directory")
+    parser.add_argument("--output-dir", "-o", type=Path, default=Path("public/images/processed"))
+    parser.add_argument("--index", type=Path, default=Path("image_index.json"),
+                        help="Index path, normally next to data.ndjson (default: image_index.json)")
+    parser.add_argument("--base-url", default="images/processed",
+                        help="URL prefix of --output-dir on the site (default: images/processed)")
+    parser.add_argument("--workers", type=int, default=8, help="Encoding threads (default: 8)")
+    parser.add_argument("--metrics", type=Path, help="Write per-step timing and memory metrics to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Write cProfile stats and collapsed stacks for this run to DIR")
+    args = parser.parse_args()
+
+    metrics = Metrics("process-images") if args.metrics else None
+    with profiled("process-images", args.profile, all_threads=True):
+        process_images(
+            args.images_dir, args.output_dir, args.index,
+            workers=args.workers, base_url=args.base_url, metrics=metrics,
+        )
+    if metrics is not None:
+        metrics.save(args.metrics)
+        print(metrics.table())
+
+
+if __name__ == "__main__":
+    main()
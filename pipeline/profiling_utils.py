@@ -0,0 +1,198 @@
+"""
+Profiling hooks for the pipeline scripts (--profile / --profile-lines).
+
+    with profiled("map", Path("profile"), hot_functions=[get_embedding, ...]):
+        ...
+
+writes, for the code run inside the block:
+
+  profile/map.pstats     cProfile data (python -m pstats, snakeviz, ...)
+  profile/map.collapsed  sampled stacks, one "frame;frame;frame count" line
+                         per unique stack, ready for flamegraph.pl or
+                         speedscope
+  profile/map.lines.txt  per-line hits and time for hot_functions (only when
+                         hot_functions is given, i.e. --profile-lines)
+
+cProfile and the line timer only see the thread that entered the block. Only
+one cProfile profiler can be enabled per process (on Python 3.12+ a second
+enable() raises ValueError), so profiled blocks must not overlap:
+run_pipeline.py --in-process --profile runs its steps one at a time. The
+stack sampler follows the same thread, or every thread in the process with
+all_threads=True (the standalone scripts, where worker pools belong to the
+stage).
+"""
+
+import cProfile
+import linecache
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+SAMPLE_INTERVAL = 0.005
+
+
+# ---------------------------------------------------------------------------
+# Stack sampling (collapsed stacks)
+# ---------------------------------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples Python stacks on a background thread into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int | None, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id  # None samples every thread but the sampler
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if self.thread_id is None:
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(f"thread {names.get(thread_id, thread_id)}")
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+# ---------------------------------------------------------------------------
+# Line timer for known hot functions
+# ---------------------------------------------------------------------------
+
+class LineTimer:
+    """Per-line hit counts and inclusive time for a few functions, via sys.settrace.
+
+    Time spent in calls made from a line is charged to that line. Only frames
+    of the given functions get a line tracer, but every call in the thread
+    still goes through the trace hook, so expect the stage to run slower.
+    """
+
+    def __init__(self, functions: list):
+        self.functions = {}
+        for func in functions:
+            func = getattr(func, "__wrapped__", func)
+            self.functions[func.__code__] = func
+        self.hits: dict = defaultdict(Counter)
+        self.times: dict = defaultdict(lambda: defaultdict(float))
+        self.calls: Counter = Counter()
+
+    def _trace_call(self, frame, event, arg):
+        if event != "call" or frame.f_code not in self.functions:
+            return None
+        code = frame.f_code
+        self.calls[code] += 1
+        hits = self.hits[code]
+        times = self.times[code]
+        state = {"line": None, "t": time.perf_counter()}
+
+        def trace_line(frame, event, arg):
+            now = time.perf_counter()
+            if state["line"] is not None:
+                times[state["line"]] += now - state["t"]
+            if event == "line":
+                state["line"] = frame.f_lineno
+                hits[frame.f_lineno] += 1
+            elif event == "return":
+                state["line"] = None
+            # Exclude this hook's own overhead from the next line
+            state["t"] = time.perf_counter()
+            return trace_line
+
+        return trace_line
+
+    def start(self) -> None:
+        sys.settrace(self._trace_call)
+
+    def stop(self) -> None:
+        sys.settrace(None)
+
+    def report(self) -> str:
+        lines = []
+        for code, func in self.functions.items():
+            times = self.times.get(code, {})
+            total = sum(times.values())
+            lines.append(
+                f"{func.__qualname__} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                f"  calls {self.calls[code]}  total {total:.3f}s"
+            )
+            if not times:
+                lines.append("  (not called)\n")
+                continue
+            lines.append(f"  {'line':>6} {'hits':>9} {'time s':>10} {'%':>6}  source")
+            for lineno in sorted(set(times) | set(self.hits[code])):
+                t = times.get(lineno, 0.0)
+                pct = 100 * t / total if total else 0.0
+                source = linecache.getline(code.co_filename, lineno).rstrip()
+                lines.append(f"  {lineno:>6} {self.hits[code][lineno]:>9} {t:>10.4f} {pct:>6.1f}  {source}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Entry point used by the scripts
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def profiled(stage: str, directory: Path | None, hot_functions: list | None = None, all_threads: bool = False):
+    """Profile the block into <directory>/<stage>.*; a no-op when directory is None."""
+    if directory is None:
+        yield
+        return
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    sampler = StackSampler(None if all_threads else threading.get_ident())
+    line_timer = LineTimer(hot_functions) if hot_functions else None
+    profiler = cProfile.Profile()
+
+    sampler.start()
+    if line_timer is not None:
+        line_timer.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if line_timer is not None:
+            line_timer.stop()
+        sampler.stop()
+
+        outputs = [directory / f"{stage}.pstats", directory / f"{stage}.collapsed"]
+        profiler.dump_stats(outputs[0])
+        sampler.write(outputs[1])
+        if line_timer is not None:
+            outputs.append(directory / f"{stage}.lines.txt")
+            with open(outputs[2], "w", encoding="utf-8") as f:
+                f.write(line_timer.report())
+        print(f"Profile: {', '.join(map(str, outputs))}")
@@ -0,0 +1,534 @@
+"""
+Match free-text research interests to researchers over HTTP.
+
+Loads the map output's researcher_embeddings.npy (memory-mapped; rows are
+already L2-normalized) and researcher_index.json, and the encoder named in
+the index once, then answers:
+
+  GET  /match?q=<text>&k=10
+  POST /match    {"query": "<text>", "k": 10}  or  {"queries": ["...", ...], "k": 10}
+  GET  /papers?q=<text>&k=10
+  POST /teams    {"proposals": [{"id", "text"} or "<text>", ...], "team_size": 3}
+  GET  /facets?tag=<keyword>&top=20
+  GET  /suggest?q=<prefix>&limit=10&kind=name
+  GET  /health   researcher count, encoder batches, cache hits / misses
+
+with {"query": ..., "results": [{"id", "name", "affiliation", "score"}, ...],
+"took_ms": ...} per query (a list of those for "queries"). /match ranks the
+researchers' median embeddings; with by=papers (rollup=max or mean, top=3)
+it ranks them by their own best papers instead, from the paper index
+(paper_index.py). /papers returns the closest papers, each with its
+researcher. hybrid=1 on either fuses the cosine ranking with the BM25
+keyword ranking (lexical_index.py) by reciprocal-rank fusion, so exact
+acronyms and method names count; scores are then RRF scores. /teams answers
+a batch of proposals with small researcher teams chosen for topic coverage
+(match_proposals.py). tag=<keyword> (repeatable, ANDed; "tags", a list of
+strings, in POST bodies) restricts /match and /papers to researchers tagged
+with every keyword, from the keyword facet index (keyword_index.py); /facets
+returns the researchers tagged that way and their most common keywords. /suggest
+completes a typed prefix to researcher names, affiliations and keywords
+(autocomplete_index.py), best-cited first; name suggestions carry the
+researcher record.
+
+Queries are embedded the way generate_map_data.py embeds papers (mean of
+gte-small's last hidden state), so scores are cosine similarities in the
+same space as the researchers' median embeddings. Concurrent requests are
+micro-batched: one worker thread drains the request queue into a single
+padded encoder call of up to MAX_BATCH texts, waiting at most MAX_WAIT for
+company, and averages each text over its real tokens only so batching
+doesn't change the vectors. Query embeddings go into an LRU cache of
+CACHE_SIZE entries keyed by whitespace-normalized text, so repeated queries
+skip the encoder, and ranking is one matrix-vector product over the mapped
+matrix plus an argpartition, or with --ann a search of the IVF-PQ index in
+<data-dir>/ann/researchers (ann_index.py), which keeps query time flat for
+large deployments; /papers likewise searches <data-dir>/ann/papers (when
+not filtered by tag or fused with BM25, which score every paper anyway).
+
+Usage:
+    python query_server.py --data-dir ./output --port 8000
+    curl 'http://127.0.0.1:8000/match?q=visual+servoing+for+drones&k=5'
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from ann_index import ANN_DIR, IVFPQIndex
+from autocomplete_index import AUTOCOMPLETE_FILE, DEFAULT_LIMIT, KINDS, AutocompleteIndex
+from keyword_index import DEFAULT_FACETS, KEYWORDS_DIR, KeywordIndex
+from lexical_index import LEXICAL_DIR, LexicalIndex, hybrid_scores, ranking
+from match_proposals import CANDIDATES, TEAM_SIZE, match_teams
+from paper_index import DEFAULT_TOP, PAPERS_DIR, PaperIndex
+from similarity import load_researcher_matrix
+
+
+MAX_BATCH = 32
+MAX_WAIT = 0.005
+CACHE_SIZE = 4096
+DEFAULT_K = 10
+MAX_K = 100
+MAX_PROPOSALS = 500
+
+
+# ---------------------------------------------------------------------------
+# Encoder
+# ---------------------------------------------------------------------------
+
+def load_encoder(model_name: str):
+    """encode_batch(texts) -> (n, dim) array for a Hugging Face encoder, mean-pooled over real tokens."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    print(f"Loading encoder {model_name}...", flush=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    def encode_batch(texts: list[str]) -> np.ndarray:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.no_grad():
+            hidden = model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        return ((hidden * mask).sum(dim=1) / mask.sum(dim=1)).numpy()
+
+    return encode_batch
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.split())
+
+
+class QueryEncoder:
+    """Thread-safe query embedding with an LRU cache in front of a micro-batching worker.
+
+    encode_batch maps a list of texts to an (n, dim) array; vectors come back
+    L2-normalized.
+    """
+
+    def __init__(self, encode_batch, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT,
+                 cache_size: int = CACHE_SIZE):
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._cache_lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "batches": 0, "batched_texts": 0}
+        self._requests: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._worker.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        return self._submit(text).result()
+
+    def encode_many(self, texts: list[str]) -> np.ndarray:
+        """Queue all texts before waiting, so the worker batches them together."""
+        futures = [self._submit(text) for text in texts]
+        return np.vstack([future.result() for future in futures])
+
+    def _submit(self, text: str) -> Future:
+        key = normalize_query(text)
+        with self._cache_lock:
+            vec = self._cache.get(key)
+            if vec is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(vec)
+                return future
+            # A query already waiting for the encoder is shared, not queued twice
+            future = self._pending.get(key)
+            if future is None:
+                self.stats["cache_misses"] += 1
+                future = self._pending[key] = Future()
+                self._requests.put((key, future))
+            else:
+                self.stats["cache_hits"] += 1
+        return future
+
+    def _next_batch(self) -> list[tuple]:
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            texts = [key for key, _ in batch]
+            try:
+                vectors = np.asarray(self.encode_batch(texts), dtype=np.float32)
+            except Exception as e:
+                with self._cache_lock:
+                    for key, _ in batch:
+                        del self._pending[key]
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+            with self._cache_lock:
+                self.stats["batches"] += 1
+                self.stats["batched_texts"] += len(texts)
+                for key, vec in zip(texts, vectors):
+                    self._cache[key] = vec
+                    del self._pending[key]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for (_, future), vec in zip(batch, vectors):
+                future.set_result(vec)
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+class ResearcherSearch:
+    """Top-k cosine search over the memory-mapped researcher matrix, exact or through the ANN index."""
+
+    def __init__(self, data_dir: Path, ann: bool = False, nprobe: int | None = None):
+        self.index, self.matrix = load_researcher_matrix(data_dir)
+        self.researchers = self.index["researchers"]
+        self.model = self.index["model"]
+        self.ann = IVFPQIndex.load(data_dir / ANN_DIR / "researchers") if ann else None
+        self.nprobe = nprobe
+        self.papers = PaperIndex(data_dir) if (data_dir / PAPERS_DIR).exists() else None
+        self.papers_ann = None
+        if ann and self.papers is not None and (data_dir / ANN_DIR / "papers").exists():
+            self.papers_ann = IVFPQIndex.load(data_dir / ANN_DIR / "papers", rerank_vectors=self.papers.matrix)
+        self.lexical = LexicalIndex(data_dir) if (data_dir / LEXICAL_DIR).exists() else None
+        self.keywords = KeywordIndex(data_dir) if (data_dir / KEYWORDS_DIR).exists() else None
+        self.autocomplete = AutocompleteIndex(data_dir) if (data_dir / AUTOCOMPLETE_FILE).exists() else None
+
+    def top_k(self, query_vec: np.ndarray, k: int = DEFAULT_K, rows: np.ndarray | None = None) -> list[dict]:
+        """Best k researchers, or best k among rows (scoring only those)."""
+        if rows is not None:
+            scores = np.full(len(self.researchers), -np.inf, dtype=np.float32)
+            scores[rows] = self.matrix[rows] @ query_vec
+            return self._ranked(scores, k)
+        if self.ann is not None:
+            ids, scores = self.ann.search(query_vec, k, nprobe=self.nprobe)
+            return [{**self.researchers[i], "score": round(float(s), 4)} for i, s in zip(ids, scores)]
+        return self._ranked(self.matrix @ query_vec, k)
+
+    def _ranked(self, scores: np.ndarray, k: int) -> list[dict]:
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        top = top[np.lexsort((top, -scores[top]))]
+        # Researchers without papers score -inf under by=papers
+        return [{**self.researchers[i], "score": round(float(scores[i]), 4)} for i in top if np.isfinite(scores[i])]
+
+    def _only(self, scores: np.ndarray, rows: np.ndarray | None, fill: float = -np.inf,
+              papers: bool = False) -> np.ndarray:
+        """scores with every entry outside researcher rows (or their papers) set to fill."""
+        if rows is None:
+            return scores
+        keep = np.zeros(len(self.researchers), dtype=bool)
+        keep[rows] = True
+        if papers:
+            keep = keep[self.papers.researcher_of]
+        return np.where(keep, scores, fill).astype(scores.dtype)
+
+    def top_k_by_papers(self, query_vec: np.ndarray, k: int = DEFAULT_K, rollup: str = "max",
+                        top: int = DEFAULT_TOP, rows: np.ndarray | None = None) -> list[dict]:
+        return self._ranked(self._only(self.papers.researcher_scores(query_vec, rollup, top), rows), k)
+
+    def top_papers(self, query_vec: np.ndarray, k: int = DEFAULT_K, rows: np.ndarray | None = None) -> list[dict]:
+        if rows is None and self.papers_ann is not None:
+            ids, scores = self.papers_ann.search(query_vec, k, nprobe=self.nprobe)
+            return [self._paper(int(row), round(float(score), 4)) for row, score in zip(ids, scores)]
+        if rows is None:
+            return [self._paper(row, round(score, 4)) for row, _, score in self.papers.top_papers(query_vec, k)]
+        scores = self._only(self.papers.scores(query_vec), rows, papers=True)
+        return [self._paper(row, round(float(scores[row]), 4)) for row in ranking(scores, k)]
+
+    def _paper(self, row: int, score: float) -> dict:
+        return {**self.papers.paper(row), "researcher": self.researchers[self.papers.researcher_of[row]], "score": score}
+
+    def top_k_hybrid(self, query: str, query_vec: np.ndarray, k: int = DEFAULT_K, by: str | None = None,
+                     rollup: str = "max", top: int = DEFAULT_TOP, rows: np.ndarray | None = None) -> list[dict]:
+        if by == "papers":
+            dense = self.papers.researcher_scores(query_vec, rollup, top)
+        else:
+            dense = self.matrix @ query_vec
+        # Filter before fusing, so ranks are ranks within the filtered set
+        fused = hybrid_scores(self._only(self.lexical.scores(query, "researchers"), rows, 0.0),
+                              self._only(dense, rows))
+        return [{**self.researchers[i], "score": round(float(fused[i]), 6)} for i in ranking(fused, k, positive=True)]
+
+    def top_papers_hybrid(self, query: str, query_vec: np.ndarray, k: int = DEFAULT_K,
+                          rows: np.ndarray | None = None) -> list[dict]:
+        fused = hybrid_scores(self._only(self.lexical.scores(query, "papers"), rows, 0.0, papers=True),
+                              self._only(self.papers.scores(query_vec), rows, papers=True))
+        return [self._paper(row, round(float(fused[row]), 6)) for row in ranking(fused, k, positive=True)]
+
+
+def match(search: ResearcherSearch, encoder: QueryEncoder, query: str, k: int, mode: dict | None = None,
+          vec: np.ndarray | None = None, start: float | None = None) -> dict:
+    """Answer one query; mode is {"kind": "researchers" | "papers", "by", "rollup", "top", "hybrid", "tags"}.
+
+    vec, if given, is the query's embedding, already encoded (with the other
+    queries of a batch) since start.
+    """
+    mode = mode or {}
+    start = time.perf_counter() if start is None else start
+    if vec is None:
+        vec = encoder.encode(query)
+    rows = search.keywords.filter(mode["tags"]) if mode.get("tags") else None
+    if mode.get("hybrid") and mode.get("kind") == "papers":
+        results = search.top_papers_hybrid(query, vec, k, rows)
+    elif mode.get("hybrid"):
+        results = search.top_k_hybrid(query, vec, k, mode.get("by"), mode.get("rollup", "max"),
+                                      int(mode.get("top", DEFAULT_TOP)), rows)
+    elif mode.get("kind") == "papers":
+        results = search.top_papers(vec, k, rows)
+    elif mode.get("by") == "papers":
+        results = search.top_k_by_papers(vec, k, mode.get("rollup", "max"), int(mode.get("top", DEFAULT_TOP)), rows)
+    else:
+        results = search.top_k(vec, k, rows)
+    return {"query": query, "results": results, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+def make_server(search: ResearcherSearch, encoder: QueryEncoder, host: str = "127.0.0.1",
+                port: int = 8000) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _answer(self, queries: list[str], k, single: bool, mode: dict):
+            try:
+                k = max(1, min(int(k), MAX_K))
+                mode["top"] = max(1, int(mode.get("top", DEFAULT_TOP)))
+            except (TypeError, ValueError):
+                self._send(400, {"error": "k and top must be integers"})
+                return
+            if mode.get("rollup", "max") not in ("max", "mean"):
+                self._send(400, {"error": "rollup must be max or mean"})
+                return
+            if (mode.get("kind") == "papers" or mode.get("by") == "papers") and search.papers is None:
+                self._send(404, {"error": f"no paper index in the data directory ({PAPERS_DIR}/)"})
+                return
+            mode["hybrid"] = str(mode.get("hybrid", "")).lower() in ("1", "true", "yes")
+            if mode["hybrid"] and search.lexical is None:
+                self._send(404, {"error": f"no BM25 index in the data directory ({LEXICAL_DIR}/)"})
+                return
+            if mode.get("tags") and search.keywords is None:
+                self._send(404, {"error": f"no keyword facet index in the data directory ({KEYWORDS_DIR}/)"})
+                return
+            queries = [q for q in queries if isinstance(q, str) and q.strip()]
+            if not queries:
+                self._send(400, {"error": "empty query"})
+                return
+            try:
+                start = time.perf_counter()
+                # All queries go to the encoder together, so a batch is one encoder call
+                vectors = encoder.encode_many(queries)
+                answers = [match(search, encoder, q, k, mode, vec, start) for q, vec in zip(queries, vectors)]
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, answers[0] if single else answers)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                with encoder._cache_lock:
+                    stats = dict(encoder.stats)
+                self._send(200, {"researchers": len(search.researchers), "model": search.model, **stats})
+            elif url.path in ("/match", "/papers"):
+                query = parse_qs(url.query)
+                params = {key: values[0] for key, values in query.items()}
+                mode = {key: params[key] for key in ("by", "rollup", "top", "hybrid") if key in params}
+                mode["kind"] = url.path.strip("/")
+                mode["tags"] = query.get("tag", [])
+                self._answer([params.get("q", "")], params.get("k", DEFAULT_K), single=True, mode=mode)
+            elif url.path == "/facets":
+                self._facets(parse_qs(url.query))
+            elif url.path == "/suggest":
+                self._suggest(parse_qs(url.query))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _facets(self, query: dict):
+            if search.keywords is None:
+                self._send(404, {"error": f"no keyword facet index in the data directory ({KEYWORDS_DIR}/)"})
+                return
+            try:
+                top = max(1, min(int(query.get("top", [DEFAULT_FACETS])[0]), 1000))
+            except ValueError:
+                self._send(400, {"error": "top must be an integer"})
+                return
+            rows = search.keywords.filter(query.get("tag", []))
+            payload = {"facets": [{"keyword": label, "researchers": count}
+                                  for label, count in search.keywords.facets(rows, top)]}
+            if rows is not None:
+                payload["researchers"] = [search.researchers[row] for row in rows[:MAX_K]]
+                payload["count"] = int(len(rows))
+            self._send(200, payload)
+
+        def _suggest(self, query: dict):
+            if search.autocomplete is None:
+                self._send(404, {"error": f"no autocomplete index in the data directory ({AUTOCOMPLETE_FILE})"})
+                return
+            try:
+                limit = max(1, min(int(query.get("limit", [DEFAULT_LIMIT])[0]), MAX_K))
+            except ValueError:
+                self._send(400, {"error": "limit must be an integer"})
+                return
+            kinds = query.get("kind", [])
+            if any(kind not in KINDS for kind in kinds):
+                self._send(400, {"error": f"kind must be one of {', '.join(KINDS)}"})
+                return
+            start = time.perf_counter()
+            prefix = query.get("q", [""])[0]
+            suggestions = search.autocomplete.suggest(prefix, limit, kinds)
+            for suggestion in suggestions:
+                if suggestion["kind"] == "name":
+                    suggestion["researcher"] = search.researchers[suggestion["id"]]
+            self._send(200, {"query": prefix, "suggestions": suggestions,
+                             "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+        def _teams(self, request: dict):
+            if search.lexical is None:
+                self._send(404, {"error": f"no BM25 index in the data directory ({LEXICAL_DIR}/)"})
+                return
+            if not isinstance(request.get("proposals", []), list):
+                self._send(400, {"error": "proposals must be a list"})
+                return
+            proposals = [
+                item if isinstance(item, dict) else {"text": item}
+                for item in request.get("proposals", [])[:MAX_PROPOSALS]
+            ]
+            proposals = [
+                {"id": str(p.get("id") or i), "text": p["text"]}
+                for i, p in enumerate(proposals) if isinstance(p.get("text"), str) and p["text"].strip()
+            ]
+            if not proposals:
+                self._send(400, {"error": "no proposals"})
+                return
+            try:
+                team_size = max(1, min(int(request.get("team_size", TEAM_SIZE)), 10))
+                candidates = max(1, min(int(request.get("candidates", CANDIDATES)), 500))
+            except (TypeError, ValueError):
+                self._send(400, {"error": "team_size and candidates must be integers"})
+                return
+            start = time.perf_counter()
+            try:
+                vectors = encoder.encode_many([p["text"] for p in proposals])
+                teams = match_teams(proposals, vectors, search.matrix, search.researchers, search.lexical,
+                                    team_size, candidates)
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, {"teams": teams, "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path not in ("/match", "/teams"):
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._send(400, {"error": "invalid JSON"})
+                return
+            if not isinstance(request, dict):
+                self._send(400, {"error": "request body must be a JSON object"})
+                return
+            if path == "/teams":
+                self._teams(request)
+                return
+            mode = {key: request[key] for key in ("by", "rollup", "top", "hybrid") if key in request}
+            tags = request.get("tags", [])
+            # A lone keyword is a one-tag list, not a sequence of characters
+            if isinstance(tags, str):
+                tags = [tags]
+            if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+                self._send(400, {"error": "tags must be a list of strings"})
+                return
+            mode["tags"] = tags
+            if "queries" in request:
+                queries = request["queries"]
+                if isinstance(queries, str):
+                    queries = [queries]
+                if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                    self._send(400, {"error": "queries must be a list of strings"})
+                    return
+                self._answer(queries, request.get("k", DEFAULT_K), single=False, mode=mode)
+            else:
+                self._answer([request.get("query", "")], request.get("k", DEFAULT_K), single=True, mode=mode)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Bursts of concurrent queries are what the micro-batching is for
+        request_queue_size = 256
+
+    return Server((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve researcher matching queries over the map embeddings")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"),
+                        help="generate_map_data.py output directory (researcher_embeddings.npy + researcher_index.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help=f"Queries per encoder call (default: {MAX_BATCH})")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT,
+                        help=f"Seconds a query waits for others to batch with (default: {MAX_WAIT})")
+    parser.add_argument("--ann", action="store_true",
+                        help=f"Search the IVF-PQ indexes in <data-dir>/{ANN_DIR}/ instead of the full matrices")
+    parser.add_argument("--nprobe", type=int, help="With --ann, lists scanned per query (default: the index's)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help=f"Cached query embeddings (default: {CACHE_SIZE})")
+    args = parser.parse_args()
+
+    search = ResearcherSearch(args.data_dir, ann=args.ann, nprobe=args.nprobe)
+    encoder = QueryEncoder(load_encoder(search.model), max_batch=args.max_batch,
+                           max_wait=args.max_wait, cache_size=args.cache_size)
+    # Warm up the encoder so the first request doesn't pay for it
+    encoder.encode("warm up")
+
+    server = make_server(search, encoder, args.host, args.port)
+    print(f"{len(search.researchers)} researchers; serving on http://{args.host}:{args.port}/match?q=... (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
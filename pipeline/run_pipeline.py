@@ -6,6 +6,47 @@ Steps:
   2. generate_summaries.py — call LLM to add keywords + summaries
   3. generate_map_data.py  — embeddings + UMAP + data.ndjson + grid.json
   4. download_images.py    — download researcher profile photos
+  5. process_images.py     — resized WebP/AVIF/JPEG photos + sprite atlases
+
+With --export-quantized, export_quantized.py also runs after the map step,
+writing PCA-reduced int8 / 1-bit embeddings for client-side search.
+
+Steps run as soon as the steps they depend on have finished, so independent
+work overlaps: images only need the scholar ids, so they download from the
+combined CSV while the LLM step runs, and while summaries are being written
+a cache warm-up (generate_map_data.py --warm-cache) embeds each finished
+researcher's papers, leaving the map step only the tail. Wall clock is
+roughly the longest chain (combine → summaries → map) rather than the sum.
+Use --sequential to run one step at a time.
+
+Each step declares its input files, parameters and code files. Before a step
+runs, their content hashes are combined into a key and compared with the key
+stored in <output-dir>/.pipeline_stamps.json by the last successful run; the
+step is skipped when the key matches and its outputs are still the files that
+run produced. A change anywhere upstream changes a downstream step's inputs,
+so only the affected part of the pipeline re-runs. File hashes are cached by
+mtime/size in the stamp file, so a no-op rebuild only stats files. The
+images step also goes stale once per photo refresh period (7 days), so
+changed photos get picked up by the conditional refresh in download_images.py.
+
+With --in-process the steps are called as functions in this interpreter
+instead of as subprocesses: heavy imports happen once and each step hands its
+rows / DataFrame to the next in memory. The intermediate CSVs are still
+written as checkpoints (and stamps still apply) unless --no-checkpoints is
+given, in which case every step runs and only the final outputs are written.
+
+Every run writes <output-dir>/metrics.json and prints a table of it: wall
+time, CPU time and peak memory per step as seen by the orchestrator, plus
+each stage's own sub-steps (load, embed, UMAP, contours, ...) with items per
+second, which the stage scripts write to <output-dir>/metrics/<step>.json.
+Steps skipped as up to date appear with status "skipped" and no sub-steps.
+
+--profile writes a cProfile .pstats file and a flamegraph-ready .collapsed
+stack file per step to <output-dir>/profile (or the given directory), and
+--profile-lines adds per-line timings of the map step's hot functions. Up to
+date steps are still skipped; combine with --force to profile them. With
+--in-process, --profile implies --sequential: stages share the process, and
+only one cProfile profiler can be active in it at a time.
 
 Usage:
     python run_pipeline.py \
@@ -13,36 +54,291 @@ Usage:
         --output-dir ./output \
         --provider gemini
 
+    python run_pipeline.py --profiles-dir ./Researcher_Profiles --output-dir ./output \
+        --provider local --in-process --no-checkpoints
+
 Environment variables:
-    GEMINI_API_KEY, OPENAI_API_KEY, or ANTHROPIC_API_KEY (depending on --provider)
+    GEMINI_API_KEY, OPENAI_API_KEY, or ANTHROPIC_API_KEY (depending on --provider;
+    --provider local runs offline and needs no key)
 """
 
 import argparse
+import hashlib
+import json
+import os
 import subprocess
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable, Optional
 
+from ann_index import ANN_DIR
+from autocomplete_index import AUTOCOMPLETE_FILE
+from download_images import REFRESH_AFTER_DAYS
+from export_quantized import DEFAULT_BITS, DEFAULT_DIM, EXPORT_DIR
+from keyword_index import KEYWORDS_DIR
+from lexical_index import LEXICAL_DIR
+from metrics_utils import Metrics, format_table
+from paper_index import PAPERS_DIR
+from profiling_utils import profiled
+from similarity import INDEX_FILE, MATRIX_FILE, NEIGHBORS_FILE
 
-def run(cmd: list[str], description: str) -> None:
+STAMP_FILE = ".pipeline_stamps.json"
+SUMMARIES_DONE_FILE = ".summaries_done"
+METRICS_FILE = "metrics.json"
+METRICS_DIR = "metrics"
+PROFILE_DIR = "profile"
+
+
+@dataclass
+class Step:
+    name: str
+    description: str
+    cmd: list[str]
+    inputs: list[Path]
+    outputs: list[Path]
+    code: list[Path]
+    params: dict = field(default_factory=dict)
+    func: Optional[Callable[[], None]] = None  # in-process equivalent of cmd
+    deps: list[str] = field(default_factory=list)
+    stamped: bool = True  # False for helpers whose outputs aren't tracked
+    optional: bool = False  # True for speed-ups: a failure is reported, dependents still run
+    metrics: Optional[Path] = None  # where the stage writes its sub-step metrics
+
+
+class StepFailed(Exception):
+    def __init__(self, description: str, returncode: int):
+        super().__init__(f"{description} failed (exit code {returncode})")
+        self.returncode = returncode
+
+
+def banner(description: str) -> None:
     print(f"\n{'='*60}")
     print(f"  {description}")
     print(f"{'='*60}\n")
+
+
+def run(cmd: list[str], description: str) -> None:
+    banner(description)
     result = subprocess.run(cmd, check=False)
     if result.returncode != 0:
-        print(f"\nERROR: {description} failed (exit code {result.returncode})")
-        sys.exit(result.returncode)
+        raise StepFailed(description, result.returncode)
+
+
+# ---------------------------------------------------------------------------
+# Content-hash stamps
+# ---------------------------------------------------------------------------
+
+def load_stamps(stamp_path: Path) -> dict:
+    if stamp_path.exists():
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            stamps = json.load(f)
+        stamps.setdefault("files", {})
+        stamps.setdefault("steps", {})
+        return stamps
+    return {"files": {}, "steps": {}}
+
+
+def save_stamps(stamp_path: Path, stamps: dict) -> None:
+    tmp_path = stamp_path.with_name(stamp_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamps, f, indent=1)
+    os.replace(tmp_path, stamp_path)
+
+
+def file_digest(path: Path, file_cache: dict) -> str:
+    """sha256 of a file, reusing the cached digest while mtime and size are unchanged."""
+    st = path.stat()
+    key = str(path.resolve())
+    cached = file_cache.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    file_cache[key] = [st.st_mtime_ns, st.st_size, digest]
+    return digest
+
+
+def path_digest(path: Path, file_cache: dict) -> str:
+    """Digest of a file, or of every file below a directory (names included)."""
+    if not path.exists():
+        return "missing"
+    if path.is_file():
+        return file_digest(path, file_cache)
+
+    h = hashlib.sha256()
+    for sub in sorted(p for p in path.rglob("*") if p.is_file()):
+        h.update(sub.relative_to(path).as_posix().encode())
+        h.update(file_digest(sub, file_cache).encode())
+    return h.hexdigest()
+
+
+def step_key(step: Step, file_cache: dict) -> str:
+    h = hashlib.sha256()
+    h.update(step.name.encode())
+    h.update(json.dumps(step.params, sort_keys=True).encode())
+    for path in step.code + step.inputs:
+        h.update(str(path.name).encode())
+        h.update(path_digest(path, file_cache).encode())
+    return h.hexdigest()
+
+
+_stamps_lock = threading.Lock()
+
+
+def run_step(
+    step: Step,
+    stamps: dict,
+    stamp_path: Path,
+    force: bool = False,
+    in_process: bool = False,
+    use_stamps: bool = True,
+) -> bool:
+    """Run a step unless its stamp shows it is up to date. Returns True if it ran."""
+    file_cache = stamps["files"]
+    use_stamps = use_stamps and step.stamped
+    if use_stamps:
+        with _stamps_lock:
+            key = step_key(step, file_cache)
+            previous = stamps["steps"].get(step.name)
+            if not force and previous is not None and previous["key"] == key:
+                current_outputs = {str(p): path_digest(p, file_cache) for p in step.outputs}
+                if current_outputs == previous["outputs"] and "missing" not in current_outputs.values():
+                    print(f"\n{step.description}: up to date, skipping")
+                    return False
+
+    if in_process and step.func is not None:
+        banner(step.description)
+        step.func()
+    else:
+        run(step.cmd, step.description)
+
+    if use_stamps:
+        with _stamps_lock:
+            stamps["steps"][step.name] = {
+                "key": key,
+                "outputs": {str(p): path_digest(p, file_cache) for p in step.outputs},
+            }
+            save_stamps(stamp_path, stamps)
+    return True
+
+
+def run_scheduled(
+    steps: list[Step],
+    run_one: Callable[[Step], None],
+    on_finished: Callable[[Step], None],
+    sequential: bool = False,
+) -> None:
+    """Run steps as their dependencies complete, independent steps concurrently.
+
+    Dependencies on steps that aren't in the list (e.g. skipped via a flag)
+    count as satisfied, as do optional steps that failed. On any other
+    failure no new steps start; running ones finish, then the first error is
+    raised. on_finished is called once per step when
+    it finishes, fails, or is abandoned because of an earlier failure.
+    """
+    names = {step.name for step in steps}
+    pending = list(steps)
+    done: set[str] = set()
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=1 if sequential else max(1, len(steps))) as pool:
+        while pending or running:
+            if error is not None:
+                for step in pending:
+                    on_finished(step)
+                pending = []
+            else:
+                for step in list(pending):
+                    if all(d in done or d not in names for d in step.deps):
+                        pending.remove(step)
+                        running[pool.submit(run_one, step)] = step
+                        if sequential:
+                            break
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                on_finished(step)
+                exc = future.exception()
+                if exc is None:
+                    done.add(step.name)
+                elif step.optional:
+                    print(f"\nWARNING: {exc}; continuing without it")
+                    done.add(step.name)
+                elif error is None:
+                    error = exc
+
+    if error is not None:
+        raise error
+
+
+def write_metrics(output_dir: Path, pipeline_metrics: Metrics, steps: list[Step]) -> None:
+    """Combine the orchestrator's step timings with each stage's own metrics file."""
+    stages = [pipeline_metrics.to_dict()]
+    for step in steps:
+        if step.metrics is not None and step.metrics.exists():
+            with open(step.metrics, "r", encoding="utf-8") as f:
+                stages.append(json.load(f))
+    with open(output_dir / METRICS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"stages": stages}, f, indent=2)
+
+    print(f"\nMetrics ({output_dir / METRICS_FILE}):\n")
+    print(format_table(stages))
+    for record in pipeline_metrics.steps:
+        if record.get("status") != "ran":
+            print(f"  {record['step']}: {record['status']}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Run the full research map pipeline")
-    parser.add_argument("--profiles-dir", type=Path, required=True, help="Path to Researcher_Profiles directory")
+    parser.add_argument("--profiles-dir", type=Path, nargs="+", required=True,
+                        help="Researcher_Profiles directories and/or zip/tar archives of them")
     parser.add_argument("--output-dir", type=Path, default=Path("output"), help="Output directory for all generated files")
-    parser.add_argument("--provider", choices=["gemini", "openai", "anthropic"], default="gemini", help="LLM provider for summaries")
-    parser.add_argument("--rate-delay", type=float, default=2.0, help="Seconds between LLM API calls")
+    parser.add_argument("--provider", choices=["gemini", "openai", "anthropic", "local"], default="gemini", help="LLM provider for summaries")
+    parser.add_argument("--rate-delay", type=float, default=2.0, help="Seconds between LLM API calls (ignored by --provider local)")
     parser.add_argument("--resume", action="store_true", help="Resume LLM generation from partial output")
     parser.add_argument("--skip-summaries", action="store_true", help="Skip LLM step (use if enriched CSV already exists)")
-    parser.add_argument("--skip-images", action="store_true", help="Skip image download step")
+    parser.add_argument("--skip-images", action="store_true", help="Skip the image download and processing steps")
+    parser.add_argument("--export-quantized", action="store_true",
+                        help="Also write PCA-reduced, quantized embeddings (export_quantized.py)")
+    parser.add_argument("--quantized-dim", type=int, default=DEFAULT_DIM,
+                        help=f"PCA dimensions for --export-quantized (default: {DEFAULT_DIM})")
+    parser.add_argument("--quantized-bits", type=int, choices=[1, 8], default=DEFAULT_BITS,
+                        help=f"Bits per dimension for --export-quantized (default: {DEFAULT_BITS})")
+    parser.add_argument("--force", nargs="*", metavar="STEP",
+                        help="Re-run the named steps (combine, summaries, map, images, process-images), or all steps if none are named, "
+                             "even if their stamps are up to date")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run one step at a time instead of overlapping independent steps")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Call each step in this process and pass data between steps in memory")
+    parser.add_argument("--no-checkpoints", action="store_true",
+                        help="With --in-process, don't write the intermediate CSVs (disables stamps)")
+    parser.add_argument("--profile", type=Path, nargs="?", const=True, metavar="DIR",
+                        help=f"Write cProfile stats and collapsed stacks per step to DIR (default: <output-dir>/{PROFILE_DIR})")
+    parser.add_argument("--profile-lines", action="store_true",
+                        help="With --profile, also time each line of the map step's hot functions (slower)")
     args = parser.parse_args()
+    if args.no_checkpoints and not args.in_process:
+        parser.error("--no-checkpoints requires --in-process")
+    if args.profile_lines and not args.profile:
+        parser.error("--profile-lines requires --profile")
+    if args.profile and args.in_process and not args.sequential:
+        # One cProfile per process on Python 3.12+ (sys.monitoring): overlapping stages can't each enable one
+        print("--profile with --in-process runs the steps one at a time (--sequential)")
+        args.sequential = True
 
     pipeline_dir = Path(__file__).parent
     args.output_dir.mkdir(parents=True, exist_ok=True)
@@ -50,14 +346,138 @@ def main():
     combined_csv = args.output_dir / "combined_researcher_papers.csv"
     enriched_csv = args.output_dir / "enriched_researcher_papers.csv"
     images_dir = args.output_dir / "public" / "images" / "researchers"
+    processed_dir = args.output_dir / "public" / "images" / "processed"
+    image_index = args.output_dir / "image_index.json"
+    quantized_dir = args.output_dir / EXPORT_DIR
+
+    metrics_dir = args.output_dir / METRICS_DIR
+    profile_dir = args.output_dir / PROFILE_DIR if args.profile is True else args.profile
+    pipeline_metrics = Metrics("pipeline")
+
+    stamp_path = args.output_dir / STAMP_FILE
+    stamps = load_stamps(stamp_path)
+
+    def forced(name: str) -> bool:
+        return args.force is not None and (not args.force or name in args.force)
+
+    checkpoints = not args.no_checkpoints
+    step_options = {"in_process": args.in_process, "use_stamps": checkpoints}
+
+    # In-process steps share data through this dict; a step that was skipped
+    # as up to date leaves nothing here and the next step reads its checkpoint.
+    memory = {}
+    progress_path = args.output_dir / "summaries_progress.json"
+    cache_dir = args.output_dir / ".cache"
+
+    # Tells the embedding warm-up that no more summaries are coming
+    summaries_done = threading.Event()
+    summaries_done_file = args.output_dir / SUMMARIES_DONE_FILE
+    summaries_done_file.unlink(missing_ok=True)
+
+    @contextmanager
+    def stage_metrics(stage: str):
+        """Metrics (and --profile) for an in-process stage, saved where its script would write them."""
+        hot_functions = None
+        if stage == "map" and args.profile_lines:
+            from generate_map_data import HOT_FUNCTIONS as hot_functions
+        metrics = Metrics(stage)
+        try:
+            with profiled(stage, profile_dir, hot_functions=hot_functions):
+                yield metrics
+        finally:
+            metrics.save(metrics_dir / f"{stage}.json")
+
+    def combine_in_process():
+        from combine_profiles import combine
+        with stage_metrics("combine") as metrics:
+            memory["combined"] = combine(args.profiles_dir, combined_csv if checkpoints else None, metrics=metrics)
+
+    def combined_rows_or_csv():
+        import pandas as pd
+        from generate_map_data import dataframe_from_rows
+        if "combined" in memory:
+            return dataframe_from_rows(memory["combined"])
+        return pd.read_csv(combined_csv)
+
+    def summaries_in_process():
+        from generate_summaries import (
+            generate_summaries, group_by_researcher, group_rows, enriched_rows, write_enriched_csv,
+        )
+        with stage_metrics("summaries") as metrics:
+            with metrics.step("load") as record:
+                if "combined" in memory:
+                    groups = group_rows(memory["combined"])
+                else:
+                    groups = group_by_researcher(combined_csv)
+                record["items"] = len(groups)
+            print(f"Loaded {len(groups)} researchers")
+            results = generate_summaries(
+                groups, args.provider, progress_path,
+                resume=args.resume,
+                rate_delay=None if args.provider == "local" else args.rate_delay,
+                metrics=metrics,
+            )
+            memory["enriched"] = enriched_rows(groups, results)
+            if checkpoints:
+                with metrics.step("write", items=len(groups)):
+                    write_enriched_csv(enriched_csv, groups, results)
+
+    def warmup_in_process():
+        from generate_map_data import warm_embedding_cache
+        warm_embedding_cache(
+            combined_rows_or_csv(), progress_path, cache_dir,
+            should_stop=summaries_done.is_set,
+            include_existing=args.resume,
+        )
+
+    def map_in_process():
+        import pandas as pd
+        from generate_map_data import dataframe_from_rows, generate_map_data
+        with stage_metrics("map") as metrics:
+            with metrics.step("load") as record:
+                if "enriched" in memory:
+                    df = dataframe_from_rows(memory["enriched"])
+                else:
+                    df = pd.read_csv(enriched_csv)
+                record["items"] = len(df)
+            generate_map_data(df, args.output_dir, cache_dir=cache_dir, metrics=metrics)
+
+    def quantize_in_process():
+        from export_quantized import export_quantized
+        with stage_metrics("quantize") as metrics:
+            export_quantized(args.output_dir, quantized_dir, args.quantized_dim, args.quantized_bits, metrics=metrics)
+
+    def images_in_process():
+        from download_images import download_images, get_unique_researchers, unique_researchers
+        with stage_metrics("images") as metrics:
+            with metrics.step("load") as record:
+                if "combined" in memory:
+                    researchers = unique_researchers(memory["combined"])
+                else:
+                    researchers = get_unique_researchers(combined_csv)
+                record["items"] = len(researchers)
+            print(f"Found {len(researchers)} unique researchers")
+            download_images(researchers, images_dir, metrics=metrics)
+
+    def process_images_in_process():
+        from process_images import process_images
+        with stage_metrics("process-images") as metrics:
+            process_images(images_dir, processed_dir, image_index, metrics=metrics)
+
+    steps = []
 
     # Step 1: Combine profiles
-    run(
-        [sys.executable, str(pipeline_dir / "combine_profiles.py"),
-         "--input", str(args.profiles_dir),
-         "--output", str(combined_csv)],
-        "Step 1/4: Combining researcher profiles",
-    )
+    steps.append(Step(
+        name="combine",
+        description="Step 1/5: Combining researcher profiles",
+        cmd=[sys.executable, str(pipeline_dir / "combine_profiles.py"),
+             "--input", *map(str, args.profiles_dir),
+             "--output", str(combined_csv)],
+        inputs=list(args.profiles_dir),
+        outputs=[combined_csv],
+        code=[pipeline_dir / "combine_profiles.py"],
+        func=combine_in_process,
+    ))
 
     # Step 2: Generate LLM summaries
     if args.skip_summaries:
@@ -71,42 +491,177 @@ def main():
             "--input", str(combined_csv),
             "--output", str(enriched_csv),
             "--provider", args.provider,
-            "--rate-delay", str(args.rate_delay),
         ]
+        if args.provider != "local":
+            cmd += ["--rate-delay", str(args.rate_delay)]
         if args.resume:
             cmd.append("--resume")
-        run(cmd, "Step 2/4: Generating LLM keywords + summaries")
+        steps.append(Step(
+            name="summaries",
+            description="Step 2/5: Generating LLM keywords + summaries",
+            cmd=cmd,
+            inputs=[combined_csv],
+            outputs=[enriched_csv],
+            code=[pipeline_dir / "generate_summaries.py"],
+            params={"provider": args.provider},
+            func=summaries_in_process,
+            deps=["combine"],
+        ))
+
+        # Embeds finished researchers' papers while the LLM works on the rest
+        if not args.sequential:
+            warm_cmd = [
+                sys.executable, str(pipeline_dir / "generate_map_data.py"),
+                "--warm-cache",
+                "--input", str(combined_csv),
+                "--output-dir", str(args.output_dir),
+                "--progress", str(progress_path),
+                "--stop-file", str(summaries_done_file),
+            ]
+            if args.resume:
+                warm_cmd.append("--include-existing")
+            steps.append(Step(
+                name="embed-warmup",
+                description="Step 3/5 (early): Embedding papers of summarized researchers",
+                cmd=warm_cmd,
+                inputs=[],
+                outputs=[],
+                code=[],
+                func=warmup_in_process,
+                deps=["combine"],
+                stamped=False,
+                # The map step embeds whatever the warm-up didn't get to
+                optional=True,
+            ))
 
     # Step 3: Generate map data (embeddings + UMAP + ndjson + grid)
-    run(
-        [sys.executable, str(pipeline_dir / "generate_map_data.py"),
-         "--input", str(enriched_csv),
-         "--output-dir", str(args.output_dir)],
-        "Step 3/4: Generating embeddings + UMAP + map data",
-    )
-
-    # Step 4: Download researcher images
+    # Embeddings, UMAP coordinates and the grid are checkpointed under
+    # <output-dir>/.cache, so a re-run after a failure resumes from there.
+    steps.append(Step(
+        name="map",
+        description="Step 3/5: Generating embeddings + UMAP + map data",
+        cmd=[sys.executable, str(pipeline_dir / "generate_map_data.py"),
+             "--input", str(enriched_csv),
+             "--output-dir", str(args.output_dir)],
+        inputs=[enriched_csv],
+        outputs=[args.output_dir / "data.ndjson", args.output_dir / "grid.json", args.output_dir / "embeddings.csv",
+                 args.output_dir / NEIGHBORS_FILE, args.output_dir / MATRIX_FILE, args.output_dir / INDEX_FILE,
+                 args.output_dir / ANN_DIR, args.output_dir / PAPERS_DIR, args.output_dir / LEXICAL_DIR,
+                 args.output_dir / KEYWORDS_DIR, args.output_dir / AUTOCOMPLETE_FILE],
+        code=[pipeline_dir / "generate_map_data.py", pipeline_dir / "wizmap_utils.py", pipeline_dir / "similarity.py",
+              pipeline_dir / "ann_index.py", pipeline_dir / "paper_index.py", pipeline_dir / "lexical_index.py",
+              pipeline_dir / "keyword_index.py", pipeline_dir / "autocomplete_index.py"],
+        func=map_in_process,
+        deps=["summaries", "embed-warmup"],
+    ))
+
+    if args.export_quantized:
+        steps.append(Step(
+            name="quantize",
+            description="Exporting quantized embeddings for client-side search",
+            cmd=[sys.executable, str(pipeline_dir / "export_quantized.py"),
+                 "--data-dir", str(args.output_dir),
+                 "--output-dir", str(quantized_dir),
+                 "--dim", str(args.quantized_dim),
+                 "--bits", str(args.quantized_bits)],
+            inputs=[args.output_dir / MATRIX_FILE, args.output_dir / PAPERS_DIR],
+            outputs=[quantized_dir],
+            code=[pipeline_dir / "export_quantized.py"],
+            params={"dim": args.quantized_dim, "bits": args.quantized_bits},
+            func=quantize_in_process,
+            deps=["map"],
+        ))
+
+    # Step 4: Download researcher images (only needs the scholar ids)
     if args.skip_images:
-        print("\nSkipping image download (--skip-images)")
+        print("\nSkipping image download and processing (--skip-images)")
     else:
-        run(
-            [sys.executable, str(pipeline_dir / "download_images.py"),
-             "--input", str(enriched_csv),
-             "--output-dir", str(images_dir)],
-            "Step 4/4: Downloading researcher profile images",
-        )
+        steps.append(Step(
+            name="images",
+            description="Step 4/5: Downloading researcher profile images",
+            cmd=[sys.executable, str(pipeline_dir / "download_images.py"),
+                 "--input", str(combined_csv),
+                 "--output-dir", str(images_dir)],
+            inputs=[combined_csv],
+            outputs=[images_dir],
+            code=[pipeline_dir / "download_images.py"],
+            # Goes stale once per refresh period so old photos get revalidated
+            params={"refresh_period": int(time.time() // (REFRESH_AFTER_DAYS * 86400))},
+            func=images_in_process,
+            deps=["combine"],
+        ))
+
+        # Step 5: Resize, re-encode and sprite the photos
+        steps.append(Step(
+            name="process-images",
+            description="Step 5/5: Processing researcher images (thumbnails, WebP/AVIF, sprites)",
+            cmd=[sys.executable, str(pipeline_dir / "process_images.py"),
+                 "--images-dir", str(images_dir),
+                 "--output-dir", str(processed_dir),
+                 "--index", str(image_index)],
+            inputs=[images_dir],
+            outputs=[processed_dir, image_index],
+            code=[pipeline_dir / "process_images.py"],
+            func=process_images_in_process,
+            deps=["images"],
+        ))
+
+    # Stage scripts write their own sub-step metrics; stale files from an
+    # earlier run would otherwise be reported for steps skipped this time
+    for step in steps:
+        if step.stamped:
+            step.metrics = metrics_dir / f"{step.name}.json"
+            step.metrics.unlink(missing_ok=True)
+            step.cmd = step.cmd + ["--metrics", str(step.metrics)]
+            if profile_dir is not None:
+                step.cmd += ["--profile", str(profile_dir)]
+                if step.name == "map" and args.profile_lines:
+                    step.cmd.append("--profile-lines")
+
+    def run_one(step: Step) -> None:
+        with pipeline_metrics.step(step.name) as record:
+            record["status"] = "failed"
+            ran = run_step(step, stamps, stamp_path, force=forced(step.name), **step_options)
+            record["status"] = "ran" if ran else "skipped"
+
+    def on_finished(step: Step) -> None:
+        if step.name == "summaries":
+            summaries_done.set()
+            summaries_done_file.touch()
+
+    try:
+        run_scheduled(steps, run_one, on_finished, sequential=args.sequential)
+    except StepFailed as e:
+        print(f"\nERROR: {e}")
+        sys.exit(e.returncode)
+    finally:
+        summaries_done_file.unlink(missing_ok=True)
+        write_metrics(args.output_dir, pipeline_metrics, steps)
 
     print(f"\n{'='*60}")
     print(f"  Pipeline complete!")
     print(f"{'='*60}")
     print(f"\nOutput files in {args.output_dir}/:")
-    print(f"  combined_researcher_papers.csv")
-    print(f"  enriched_researcher_papers.csv")
+    if checkpoints:
+        print(f"  combined_researcher_papers.csv")
+        print(f"  enriched_researcher_papers.csv")
     print(f"  data.ndjson")
     print(f"  grid.json")
     print(f"  embeddings.csv")
+    print(f"  {NEIGHBORS_FILE}")
+    print(f"  {MATRIX_FILE} + {INDEX_FILE}")
+    print(f"  {ANN_DIR}/")
+    print(f"  {PAPERS_DIR}/")
+    print(f"  {LEXICAL_DIR}/")
+    print(f"  {KEYWORDS_DIR}/")
+    print(f"  {AUTOCOMPLETE_FILE}")
+    if args.export_quantized:
+        print(f"  {EXPORT_DIR}/")
     if not args.skip_images:
         print(f"  public/images/researchers/")
+        print(f"  public/images/processed/")
+        print(f"  image_index.json")
+    print(f"  {METRICS_FILE}")
 
 
 if __name__ == "__main__":
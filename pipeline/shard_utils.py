@@ -0,0 +1,29 @@
+"""
+Shared --shard I/N handling for the stages that can be split across runners.
+
+A value's shard is taken from a hash of its string, so every process (and
+every runner) assigns it the same way regardless of order or PYTHONHASHSEED.
+"""
+
+import argparse
+import hashlib
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """'I/N' -> (I, N) with 0 <= I < N; meant as an argparse type."""
+    try:
+        index, n_shards = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got {spec!r}")
+    if not 0 <= index < n_shards:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{n_shards - 1}, got {index}")
+    return index, n_shards
+
+
+def shard_of(value: str, n_shards: int) -> int:
+    return int(hashlib.sha256(value.encode("utf-8")).hexdigest()[:8], 16) % n_shards
+
+
+def shard_name(index: int, n_shards: int) -> str:
+    """Filename tag for a shard, e.g. shard-002-of-008."""
+    return f"shard-{index:03d}-of-{n_shards:03d}"
@@ -0,0 +1,160 @@
+"""
+Top-k most similar researchers (collaborator suggestions) by cosine similarity.
+
+The researcher embeddings are L2-normalized once, then the similarity matrix
+is computed a block of rows at a time (block @ all.T) and reduced to each
+row's top k before the next block, so the working memory stays around
+MAX_BLOCK_ENTRIES similarities (plus their partition indices) whatever the
+number of researchers: about 100 MB, with 4 MB of results for 50k
+researchers at k=10.
+
+neighbors.json, written next to data.ndjson, stores row indices rather than
+repeating ids:
+
+    {"k": 10, "ids": ["<scholar_id>", ...],
+     "neighbors": [[3, 17, ...], ...], "scores": [[0.9312, 0.9104, ...], ...]}
+
+Row i of neighbors/scores belongs to ids[i], sorted by decreasing similarity.
+
+The normalized matrix is also saved for query-time search (query_server.py):
+researcher_embeddings.npy, a float32 .npy that loads with mmap_mode="r", and
+researcher_index.json with the encoder model and each row's scholar id, name
+and affiliation.
+
+generate_map_data.py writes all three on every run; this script recomputes
+them from an existing embeddings.csv.
+
+Usage:
+    python similarity.py --embeddings ./output/embeddings.csv --output ./output/neighbors.json -k 10
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+NEIGHBORS_FILE = "neighbors.json"
+MATRIX_FILE = "researcher_embeddings.npy"
+INDEX_FILE = "researcher_index.json"
+DEFAULT_K = 10
+# Similarity entries computed at once (8M float32 = 32 MB, plus 64 MB of argpartition indices)
+MAX_BLOCK_ENTRIES = 8 * 1024 * 1024
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_neighbors(
+    embeddings: np.ndarray,
+    k: int = DEFAULT_K,
+    block_size: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """(indices, scores), each n x k: every row's k most cosine-similar other rows.
+
+    Rows are sorted by decreasing similarity, equal scores by lower index.
+    """
+    unit = normalize_rows(embeddings)
+    n = len(unit)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int32), np.zeros((n, 0), dtype=np.float32)
+    if block_size is None:
+        block_size = max(1, MAX_BLOCK_ENTRIES // n)
+
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = unit[start:stop] @ unit.T
+        rows = np.arange(stop - start)
+        sims[rows, rows + start] = -np.inf  # not your own neighbor
+
+        top = np.argpartition(sims, n - k, axis=1)[:, n - k:]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.lexsort((top, -top_scores), axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def neighbors_dict(ids: list[str], indices: np.ndarray, scores: np.ndarray) -> dict:
+    return {
+        "k": int(indices.shape[1]),
+        "ids": list(ids),
+        "neighbors": indices.tolist(),
+        "scores": np.round(scores.astype(np.float64), 4).tolist(),
+    }
+
+
+def save_neighbors(path: Path, ids: list[str], embeddings: np.ndarray, k: int = DEFAULT_K) -> dict:
+    """Compute and write neighbors.json; returns the written dict."""
+    indices, scores = top_k_neighbors(embeddings, k)
+    result = neighbors_dict(ids, indices, scores)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, separators=(",", ":"))
+    return result
+
+
+def save_researcher_matrix(output_dir: Path, researchers: list[dict], embeddings: np.ndarray, model: str) -> None:
+    """Write researcher_embeddings.npy (unit rows) and researcher_index.json.
+
+    researchers holds {"id", "name", "affiliation"} per row of embeddings.
+    """
+    unit = normalize_rows(embeddings)
+    tmp_path = output_dir / f".{MATRIX_FILE}"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(unit))
+    tmp_path.replace(output_dir / MATRIX_FILE)
+    with open(output_dir / INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "dim": int(unit.shape[1]), "researchers": researchers},
+                  f, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_researcher_matrix(output_dir: Path) -> tuple[dict, np.ndarray]:
+    """(researcher_index.json contents, memory-mapped unit embedding matrix)."""
+    with open(output_dir / INDEX_FILE, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    return index, np.load(output_dir / MATRIX_FILE, mmap_mode="r")
+
+
+def researcher_records(df) -> list[dict]:
+    """{"id", "name", "affiliation"} per row of a per-researcher DataFrame."""
+    return [
+        {"id": str(sid), "name": name if isinstance(name, str) else "",
+         "affiliation": aff if isinstance(aff, str) else ""}
+        for sid, name, aff in zip(df["google_scholar_id"], df["researcher_name"], df["affiliation"])
+    ]
+
+
+def load_embeddings_csv(path: Path) -> tuple[list[dict], np.ndarray]:
+    """(researcher_records, embedding matrix) from generate_map_data.py's embeddings.csv."""
+    import pandas as pd
+    df = pd.read_csv(path, usecols=["google_scholar_id", "researcher_name", "affiliation", "embedding_array"])
+    matrix = np.array([json.loads(e) for e in df["embedding_array"]], dtype=np.float32)
+    return researcher_records(df), matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute top-k similar researchers from embeddings.csv")
+    parser.add_argument("--embeddings", "-i", type=Path, required=True, help="embeddings.csv from generate_map_data.py")
+    parser.add_argument("--output", "-o", type=Path, default=Path(NEIGHBORS_FILE))
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help=f"Neighbors per researcher (default: {DEFAULT_K})")
+    parser.add_argument("--model", default="thenlper/gte-small", help="Encoder recorded in the researcher index")
+    args = parser.parse_args()
+
+    researchers, matrix = load_embeddings_csv(args.embeddings)
+    ids = [r["id"] for r in researchers]
+    result = save_neighbors(args.output, ids, matrix, args.k)
+    save_researcher_matrix(args.output.parent, researchers, matrix, args.model)
+    print(f"{len(ids)} researchers, top {result['k']} neighbors each: {args.output}")
+    print(f"Search matrix: {args.output.parent / MATRIX_FILE}, {args.output.parent / INDEX_FILE}")
+
+
+if __name__ == "__main__":
+    main()
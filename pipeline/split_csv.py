@@ -1,30 +1,212 @@
-"""Split a CSV file into chunks for parallel processing."""
+"""
+Split a researchers CSV into chunks for parallel scraping.
 
+Streams the input once and writes every chunk in the same pass, instead of
+each matrix job re-reading the whole file to cut out its own slice:
+
+  --chunk-size S   consecutive chunks of S rows (the old behavior, all at once)
+  --chunks N       N chunks balanced by estimated scrape cost
+
+Balanced chunks assign each row, as it is read, to the chunk with the least
+cost so far. A row's cost comes from --cost-column, or from --history: a
+JSON file mapping scholar ids to seconds, or a Researcher_Profiles directory
+from an earlier scrape, where a researcher's paper count stands in for the
+time their profile takes. Rows without a known cost get the mean of the known
+ones (1 when nothing is known), so without either option chunks are balanced
+by row count.
+
+A manifest (default <output-dir>/manifest.json) lists the chunks written:
+
+    {"input": "researchers.csv", "rows": 1234, "balanced_by": "history",
+     "chunks": [{"index": 0, "file": "chunk_000.csv", "rows": 50, "cost": 812.0}, ...]}
+
+Usage:
+    python split_csv.py researchers.csv --chunks 25 --output-dir chunks
+    python split_csv.py researchers.csv --chunks 25 --output-dir chunks --history Researcher_Profiles
+    python split_csv.py researchers.csv --chunk-size 50 --output-dir chunks
+
+    # Legacy form: write one chunk of chunk_size rows
+    python split_csv.py <input.csv> <chunk_index> <chunk_size> <output.csv>
+"""
+
+import argparse
 import csv
+import heapq
+import itertools
+import json
+import re
 import sys
+from pathlib import Path
+
+
+MANIFEST_FILE = "manifest.json"
+SCHOLAR_ID_RE = re.compile(r"[?&]user=([^&#]+)")
 
 
 def split_csv(input_file: str, chunk_index: int, chunk_size: int, output_file: str):
-    with open(input_file, newline="") as f:
+    """Write rows [chunk_index * chunk_size, +chunk_size) of input_file to output_file."""
+    start = chunk_index * chunk_size
+    end = start + chunk_size
+    with open(input_file, newline="") as f, open(output_file, "w", newline="") as out:
         reader = csv.reader(f)
         header = next(reader)
-        rows = list(reader)
+        writer = csv.writer(out)
+        writer.writerow(header)
+        n_chunk = 0
+        for row in itertools.islice(reader, start, end):
+            writer.writerow(row)
+            n_chunk += 1
 
-    start = chunk_index * chunk_size
-    end = start + chunk_size
-    chunk_rows = rows[start:end]
+    print(f"Chunk {chunk_index}: rows {start}-{start + n_chunk} ({n_chunk} rows)")
 
-    with open(output_file, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(chunk_rows)
 
-    print(f"Chunk {chunk_index}: rows {start}-{min(end, len(rows))} of {len(rows)} ({len(chunk_rows)} rows)")
+def scholar_id(row: dict) -> str:
+    for value in row.values():
+        match = SCHOLAR_ID_RE.search(value or "")
+        if match:
+            return match.group(1)
+    return row.get("name", "")
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 5:
-        print(f"Usage: {sys.argv[0]} <input.csv> <chunk_index> <chunk_size> <output.csv>")
-        sys.exit(1)
+def load_history(path: Path) -> dict[str, float]:
+    """Scholar id -> cost from a JSON mapping or an earlier Researcher_Profiles directory."""
+    if path.is_dir():
+        history = {}
+        for papers_csv in path.glob("*/papers.csv"):
+            with open(papers_csv, newline="", encoding="utf-8") as f:
+                n_papers = sum(1 for _ in csv.DictReader(f))
+            # Profile page plus one page of papers per paper
+            history[papers_csv.parent.name] = 1.0 + n_papers
+        return history
+    with open(path, "r", encoding="utf-8") as f:
+        return {str(k): float(v) for k, v in json.load(f).items()}
+
 
-    split_csv(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+def _row_cost(row: dict, cost_column: str | None, history: dict[str, float] | None) -> float | None:
+    if cost_column is not None:
+        try:
+            return float(row.get(cost_column) or "")
+        except ValueError:
+            return None
+    if history is not None:
+        return history.get(scholar_id(row))
+    return None
+
+
+def split_all(
+    input_file: Path,
+    output_dir: Path,
+    n_chunks: int | None = None,
+    chunk_size: int | None = None,
+    cost_column: str | None = None,
+    history: dict[str, float] | None = None,
+) -> list[dict]:
+    """Write all chunks in one pass over input_file; returns their manifest entries."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(input_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if cost_column is not None and cost_column not in (reader.fieldnames or []):
+            print(f"Column {cost_column!r} not in {input_file} (columns: {reader.fieldnames})", file=sys.stderr)
+            sys.exit(1)
+
+        chunks, files, writers = [], [], []
+
+        def open_chunk() -> int:
+            index = len(chunks)
+            name = f"chunk_{index:03d}.csv"
+            out = open(output_dir / name, "w", newline="", encoding="utf-8")
+            writer = csv.DictWriter(out, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            chunks.append({"index": index, "file": name, "rows": 0, "cost": 0.0})
+            files.append(out)
+            writers.append(writer)
+            return index
+
+        known_total, known_count = 0.0, 0
+        # (cost so far, index): the least-loaded chunk is always on top
+        heap = [(0.0, open_chunk()) for _ in range(n_chunks)] if n_chunks else []
+        try:
+            for i, row in enumerate(reader):
+                cost = _row_cost(row, cost_column, history)
+                if cost is None:
+                    cost = known_total / known_count if known_count else 1.0
+                else:
+                    known_total += cost
+                    known_count += 1
+
+                if n_chunks:
+                    load, index = heapq.heappop(heap)
+                    heapq.heappush(heap, (load + cost, index))
+                else:
+                    index = i // chunk_size
+                    if index == len(chunks):
+                        if files:
+                            files[-1].close()
+                        open_chunk()
+                writers[index].writerow(row)
+                chunks[index]["rows"] += 1
+                chunks[index]["cost"] += cost
+        finally:
+            for out in files:
+                out.close()
+
+    if not chunks:
+        # Empty input still gets one (header-only) chunk for the matrix
+        with open(output_dir / "chunk_000.csv", "w", newline="", encoding="utf-8") as out:
+            csv.DictWriter(out, fieldnames=reader.fieldnames or []).writeheader()
+        chunks.append({"index": 0, "file": "chunk_000.csv", "rows": 0, "cost": 0.0})
+    for chunk in chunks:
+        chunk["cost"] = round(chunk["cost"], 3)
+    return chunks
+
+
+def main():
+    # Keep the positional form the workflow used to call
+    if len(sys.argv) == 5 and all(a.isdigit() for a in sys.argv[2:4]):
+        split_csv(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+        return
+
+    parser = argparse.ArgumentParser(description="Split a researchers CSV into chunks in one pass")
+    parser.add_argument("input", type=Path, help="Researchers CSV")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--chunks", type=int, help="Number of chunks, balanced by estimated cost")
+    size.add_argument("--chunk-size", type=int, help="Rows per chunk, in input order")
+    parser.add_argument("--output-dir", "-o", type=Path, required=True, help="Directory for chunk_NNN.csv files")
+    cost = parser.add_mutually_exclusive_group()
+    cost.add_argument("--cost-column", help="Numeric column holding each row's estimated cost")
+    cost.add_argument("--history", type=Path,
+                      help="JSON {scholar_id: seconds} or an earlier Researcher_Profiles dir (cost = papers)")
+    parser.add_argument("--manifest", type=Path, help=f"Manifest path (default: <output-dir>/{MANIFEST_FILE})")
+    args = parser.parse_args()
+
+    if (args.chunks or args.chunk_size or 0) < 1:
+        parser.error("--chunks / --chunk-size must be at least 1")
+    if args.chunk_size and (args.cost_column or args.history):
+        parser.error("--cost-column / --history balance --chunks, not --chunk-size")
+
+    history = load_history(args.history) if args.history else None
+    chunks = split_all(
+        args.input, args.output_dir,
+        n_chunks=args.chunks, chunk_size=args.chunk_size,
+        cost_column=args.cost_column, history=history,
+    )
+
+    balanced_by = "cost_column" if args.cost_column else "history" if history is not None else "rows"
+    manifest = {
+        "input": str(args.input),
+        "rows": sum(c["rows"] for c in chunks),
+        "balanced_by": balanced_by if args.chunks else None,
+        "chunks": chunks,
+    }
+    manifest_path = args.manifest or args.output_dir / MANIFEST_FILE
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    costs = [c["cost"] for c in chunks]
+    print(f"Wrote {len(chunks)} chunks of {manifest['rows']} rows to {args.output_dir}")
+    print(f"  cost per chunk: min {min(costs):g}, max {max(costs):g}, mean {sum(costs) / len(costs):g}")
+    print(f"  manifest: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Serve the map by viewport: the visible points and topic labels for a
+bounding box and zoom, over HTTP.
+
+grid.json ships topic labels for every quadtree level select_topic_levels
+picks for zoom 1..max_zoom_scale, and data.ndjson every point; this answers
+just what one viewport shows:
+
+  GET /viewport?x0=&y0=&x1=&y1=&zoom=1     (or level=<0-20> instead of zoom)
+  GET /health
+
+with {"level": ..., "points": [[x, y, row, name, citations], ...],
+"labels": [[x, y, label], ...], "took_ms": ...}. The bounding box is in data
+coordinates (the whole map if omitted); zoom is the map's zoom scale and
+picks the quadtree level whose tiles are closest to ideal_tile_width pixels,
+exactly as select_topic_levels does (wizmap_utils.topic_level_for_scale).
+
+Both indexes are keyed by quadtree tile at each level, tile (tx, ty) of
+grid.json's topic extent as key tx * 2**level + ty, so a viewport is one
+searchsorted range per visible tile column:
+
+  points   per level, the POINTS_PER_TILE most cited points of each tile,
+           sorted by tile key. Nested tiles make this a level-of-detail
+           sample: zoomed out, each tile shows its best-cited researchers;
+           zoomed in, more of them. Levels past the first one where every
+           tile keeps all its points reuse that one.
+  labels   per level, one label per tile at the tile's center. Levels in
+           grid.json are used as shipped; any other level is computed on
+           first use the way generate_topic_dict does it (TF-IDF of the
+           keyword counts merged per tile, top 4 words joined by "-") and
+           kept in an LRU of --cache-levels levels; the TF-IDF covers the
+           whole level, but a tile is only named once it is in view.
+
+Usage:
+    python viewport_server.py --data-dir ./output --port 8001
+    curl 'http://127.0.0.1:8001/viewport?x0=5&y0=2&x1=9&y1=6&zoom=40'
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from wizmap_utils import topic_level_for_scale, topic_vectorizer
+
+
+POINTS_PER_TILE = 4
+CACHE_LEVELS = 4
+MAX_LEVEL = 20
+SVG_WIDTH = 1000
+SVG_HEIGHT = 1000
+IDEAL_TILE_WIDTH = 35
+LABEL_WORDS = 4
+TOPIC_WORDS = 50
+
+# data.ndjson columns (generate_data_list with labels and citations, no times)
+COL_X, COL_Y, COL_TEXT, COL_NAME, COL_CITATIONS = 0, 1, 2, 4, 5
+
+
+def _citations(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if np.isfinite(value) else 0.0
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class ViewportIndex:
+    """Tile-keyed point and topic label lookups over a map output directory."""
+
+    def __init__(self, data_dir: Path, points_per_tile: int = POINTS_PER_TILE, cache_levels: int = CACHE_LEVELS,
+                 svg_width: int = SVG_WIDTH, svg_height: int = SVG_HEIGHT, ideal_tile_width: int = IDEAL_TILE_WIDTH):
+        with open(data_dir / "grid.json", "r", encoding="utf-8") as f:
+            topic = json.load(f)["topic"]
+        xs, ys, self.texts, self.names, citations = [], [], [], [], []
+        with open(data_dir / "data.ndjson", "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                xs.append(row[COL_X])
+                ys.append(row[COL_Y])
+                self.texts.append(row[COL_TEXT] if isinstance(row[COL_TEXT], str) else "")
+                self.names.append(row[COL_NAME])
+                citations.append(_citations(row[COL_CITATIONS]))
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.citations = np.asarray(citations, dtype=np.float64)
+
+        (self.x0, self.y0), (x1, _) = topic["extent"]
+        self.size = float(x1 - self.x0)
+        x_min, y_min, x_max, y_max = topic["range"]
+        # Same pixel scale as select_topic_levels
+        self.svg_length = max(svg_width, svg_height)
+        self.tree_to_world_scale = self.size / max(x_max - x_min, y_max - y_min)
+        self.ideal_tile_width = ideal_tile_width
+
+        self.points_per_tile = points_per_tile
+        self._points = []
+        for level in range(MAX_LEVEL + 1):
+            keys, rows, full = self._sample_points(level)
+            self._points.append((keys, rows))
+            if full:
+                break
+
+        self.shipped = {int(level): self._labels_from(int(level), labels) for level, labels in topic["data"].items()}
+        self.cache_levels = cache_levels
+        self._cache: OrderedDict[int, tuple] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._count_mat = None
+        self.stats = {"cache_hits": 0, "cache_misses": 0}
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def level_for(self, zoom: float) -> int:
+        return topic_level_for_scale(zoom, self.svg_length, self.tree_to_world_scale, self.ideal_tile_width)
+
+    def _tiles(self, xs, ys, level: int) -> tuple[np.ndarray, np.ndarray]:
+        n = 2 ** level
+        step = self.size / n
+        tx = np.clip(np.floor((np.asarray(xs, dtype=np.float64) - self.x0) / step), 0, n - 1).astype(np.int64)
+        ty = np.clip(np.floor((np.asarray(ys, dtype=np.float64) - self.y0) / step), 0, n - 1).astype(np.int64)
+        return tx, ty
+
+    def _keys(self, xs, ys, level: int) -> np.ndarray:
+        tx, ty = self._tiles(xs, ys, level)
+        return tx * 2 ** level + ty
+
+    def _sample_points(self, level: int) -> tuple[np.ndarray, np.ndarray, bool]:
+        """(tile keys, rows) of each tile's points_per_tile most cited points, and whether that is every point."""
+        keys = self._keys(self.xs, self.ys, level)
+        # By tile, then most cited first, then row
+        order = np.lexsort((np.arange(len(keys)), -self.citations, keys))
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+        keep = rank < self.points_per_tile
+        return keys[keep], order[keep], bool(keep.all())
+
+    def _in_view(self, keys: np.ndarray, bbox: tuple, level: int) -> np.ndarray:
+        """Positions in sorted tile keys of the tiles that intersect bbox."""
+        x0, y0, x1, y1 = bbox
+        (tx0, tx1), (ty0, ty1) = self._tiles([x0, x1], [y0, y1], level)
+        columns = np.arange(tx0, tx1 + 1, dtype=np.int64) * 2 ** level
+        starts = np.searchsorted(keys, columns + ty0)
+        stops = np.searchsorted(keys, columns + ty1 + 1)
+        lengths = stops - starts
+        return np.repeat(stops - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+
+    # -----------------------------------------------------------------------
+    # Points
+    # -----------------------------------------------------------------------
+
+    def points(self, bbox: tuple, level: int) -> list[list]:
+        """[x, y, row, name, citations] of the level's sample inside bbox, most cited first."""
+        level = min(level, len(self._points) - 1)
+        keys, rows = self._points[level]
+        rows = rows[self._in_view(keys, bbox, level)]
+        x0, y0, x1, y1 = bbox
+        rows = rows[(self.xs[rows] >= x0) & (self.xs[rows] <= x1) & (self.ys[rows] >= y0) & (self.ys[rows] <= y1)]
+        rows = rows[np.lexsort((rows, -self.citations[rows]))]
+        return [
+            [float(self.xs[row]), float(self.ys[row]), row, self.names[row], float(self.citations[row])]
+            for row in rows.tolist()
+        ]
+
+    # -----------------------------------------------------------------------
+    # Labels
+    # -----------------------------------------------------------------------
+
+    def _labels_from(self, level: int, labels: list) -> tuple:
+        """(tile keys, xs, ys, labels, None) sorted by tile key, from grid.json's [x, y, label] list."""
+        xs = np.asarray([label[0] for label in labels], dtype=np.float64)
+        ys = np.asarray([label[1] for label in labels], dtype=np.float64)
+        keys = self._keys(xs, ys, level)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], xs[order], ys[order], [labels[i][2] for i in order], None
+
+    def _compute_labels(self, level: int) -> tuple:
+        """(tile keys, xs, ys, labels, tile TF-IDF) of one level; labels start as None, see _label."""
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        if self._count_mat is None:
+            vectorizer = topic_vectorizer()
+            self._count_mat = vectorizer.fit_transform(self.texts)
+            self._ngrams = vectorizer.get_feature_names_out()
+        keys, tile_of = np.unique(self._keys(self.xs, self.ys, level), return_inverse=True)
+        # One row per point, as extract_level_topics builds it: the empty rows count as documents for idf
+        membership = csr_matrix(
+            (np.ones(len(tile_of), dtype=np.int64), (tile_of, np.arange(len(tile_of)))),
+            shape=(len(tile_of), len(tile_of)),
+        )
+        tf_idf = TfidfTransformer().fit_transform(membership @ self._count_mat).tocsr()[:len(keys)]
+        # Tile corners rounded before taking the center, as merge_leaves_before_level does
+        step = self.size / 2 ** level
+        tx, ty = keys // 2 ** level, keys % 2 ** level
+        xs = np.round((np.round(self.x0 + tx * step, 3) + np.round(self.x0 + (tx + 1) * step, 3)) / 2, 3)
+        ys = np.round((np.round(self.y0 + ty * step, 3) + np.round(self.y0 + (ty + 1) * step, 3)) / 2, 3)
+        return keys, xs, ys, [None] * len(keys), tf_idf
+
+    def _label(self, tf_idf, i: int) -> str:
+        """Tile i's label, as generate_topic_dict would have shipped it."""
+        start, stop = int(tf_idf.indptr[i]), int(tf_idf.indptr[i + 1])
+        # get_tile_topics' ordering (top TOPIC_WORDS by argpartition, padded with zeros, ascending
+        # argsort, reversed), so tied scores come out in the same order as in grid.json
+        top = np.argpartition(tf_idf.data[start:stop], -min(TOPIC_WORDS, stop - start))[-TOPIC_WORDS:]
+        scores = np.zeros(TOPIC_WORDS)
+        scores[:len(top)] = tf_idf.data[start:stop][top]
+        words = np.full(TOPIC_WORDS, "", dtype=object)
+        words[:len(top)] = self._ngrams[tf_idf.indices[start:stop][top]]
+        order = np.argsort(scores)[::-1][:LABEL_WORDS]
+        return "-".join(word if score > 0 else "" for word, score in zip(words[order], scores[order]))
+
+    def level_labels(self, level: int) -> tuple:
+        if level in self.shipped:
+            return self.shipped[level]
+        with self._cache_lock:
+            entry = self._cache.get(level)
+            if entry is not None:
+                self._cache.move_to_end(level)
+                self.stats["cache_hits"] += 1
+                return entry
+            # Computed under the lock: concurrent requests for a new level wait for one computation
+            self.stats["cache_misses"] += 1
+            entry = self._cache[level] = self._compute_labels(level)
+            while len(self._cache) > self.cache_levels:
+                self._cache.popitem(last=False)
+            return entry
+
+    def labels(self, bbox: tuple, level: int) -> list[list]:
+        """[x, y, label] of the level's tiles whose center is inside bbox."""
+        keys, xs, ys, labels, tf_idf = self.level_labels(level)
+        x0, y0, x1, y1 = bbox
+        visible = [i for i in self._in_view(keys, bbox, level).tolist() if x0 <= xs[i] <= x1 and y0 <= ys[i] <= y1]
+        # Computed levels name their tiles on first view
+        for i in visible:
+            if labels[i] is None:
+                labels[i] = self._label(tf_idf, i)
+        return [[float(xs[i]), float(ys[i]), labels[i]] for i in visible]
+
+    def query(self, bbox: tuple | None = None, zoom: float = 1.0, level: int | None = None) -> dict:
+        start = time.perf_counter()
+        if bbox is None:
+            bbox = (self.x0, self.y0, self.x0 + self.size, self.y0 + self.size)
+        if level is None:
+            level = self.level_for(zoom)
+        return {
+            "level": level,
+            "points": self.points(bbox, level),
+            "labels": self.labels(bbox, level),
+            "took_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+def make_server(index: ViewportIndex, host: str = "127.0.0.1", port: int = 8001) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                with index._cache_lock:
+                    cached = list(index._cache)
+                    stats = dict(index.stats)
+                self._send(200, {"points": len(index), "shipped_levels": sorted(index.shipped),
+                                 "cached_levels": cached, **stats})
+            elif url.path == "/viewport":
+                self._viewport({key: values[0] for key, values in parse_qs(url.query).items()})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _viewport(self, params: dict):
+            try:
+                bbox = None
+                if any(key in params for key in ("x0", "y0", "x1", "y1")):
+                    bbox = tuple(float(params[key]) for key in ("x0", "y0", "x1", "y1"))
+                zoom = float(params.get("zoom", 1))
+                level = int(params["level"]) if "level" in params else None
+            except (KeyError, ValueError):
+                self._send(400, {"error": "x0, y0, x1, y1 and zoom must be numbers, level an integer"})
+                return
+            if bbox is not None and not (bbox[0] <= bbox[2] and bbox[1] <= bbox[3]):
+                self._send(400, {"error": "need x0 <= x1 and y0 <= y1"})
+                return
+            if level is not None and not 0 <= level <= MAX_LEVEL:
+                self._send(400, {"error": f"level must be 0-{MAX_LEVEL}"})
+                return
+            if not zoom > 0:
+                self._send(400, {"error": "zoom must be positive"})
+                return
+            self._send(200, index.query(bbox, zoom, level))
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+    return Server((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve visible points and topic labels by viewport and zoom")
+    parser.add_argument("--data-dir", type=Path, default=Path("output"),
+                        help="generate_map_data.py output directory (data.ndjson + grid.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--points-per-tile", type=int, default=POINTS_PER_TILE,
+                        help=f"Most cited points kept per tile at each level (default: {POINTS_PER_TILE})")
+    parser.add_argument("--cache-levels", type=int, default=CACHE_LEVELS,
+                        help=f"Computed label levels kept in memory (default: {CACHE_LEVELS})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = ViewportIndex(args.data_dir, args.points_per_tile, args.cache_levels)
+    print(f"{len(index)} points, label levels {min(index.shipped)}-{max(index.shipped)} shipped; "
+          f"indexed in {time.perf_counter() - start:.1f}s")
+    server = make_server(index, args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}/viewport?x0=..&y0=..&x1=..&y1=..&zoom=.. (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ WizMap utility functions extracted from the WizMap library.
 Provides:
   - generate_contour_dict: KDE density grid
   - generate_topic_dict: multi-level quadtree topic labels
+  - topic_level_for_scale: the topic level shown at a zoom scale
   - generate_grid_dict: combined grid + topics
   - generate_data_list: ndjson row builder
   - save_json_files: write data.ndjson + grid.json
@@ -17,6 +18,8 @@ from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 from sklearn.neighbors import KernelDensity
 from scipy.sparse import csr_matrix
 from quadtreed3 import Quadtree, Node
+
+from metrics_utils import timed
 from typing import Tuple
 
 
@@ -271,22 +274,32 @@ def select_topic_levels(
     selected_levels = []
 
     while scale <= max_zoom_scale:
-        best_level = 1
-        best_tile_width_diff = np.inf
+        selected_levels.append(topic_level_for_scale(scale, svg_length, tree_to_world_scale, ideal_tile_width))
+        scale += 0.5
 
-        for l in range(1, 21):
-            tile_num = 2**l
-            svg_scaled_length = scale * svg_length * tree_to_world_scale
-            tile_width = svg_scaled_length / tile_num
+    return np.min(selected_levels), np.max(selected_levels)
 
-            if abs(tile_width - ideal_tile_width) < best_tile_width_diff:
-                best_tile_width_diff = abs(tile_width - ideal_tile_width)
-                best_level = l
 
-        selected_levels.append(best_level)
-        scale += 0.5
+def topic_level_for_scale(scale, svg_length, tree_to_world_scale, ideal_tile_width=35):
+    """Quadtree level (1-20) whose tiles are closest to ideal_tile_width pixels at zoom scale."""
+    best_level = 1
+    best_tile_width_diff = np.inf
 
-    return np.min(selected_levels), np.max(selected_levels)
+    for l in range(1, 21):
+        tile_num = 2**l
+        svg_scaled_length = scale * svg_length * tree_to_world_scale
+        tile_width = svg_scaled_length / tile_num
+
+        if abs(tile_width - ideal_tile_width) < best_tile_width_diff:
+            best_tile_width_diff = abs(tile_width - ideal_tile_width)
+            best_level = l
+
+    return best_level
+
+
+def topic_vectorizer() -> CountVectorizer:
+    """The topic stage's tokenization; lexical_index.py indexes with the same one."""
+    return CountVectorizer(stop_words="english", ngram_range=(1, 1))
 
 
 def generate_topic_dict(
@@ -302,7 +315,7 @@ def generate_topic_dict(
 
     root = tree.get_node_representation()
 
-    cv = CountVectorizer(stop_words="english", ngram_range=(1, 1))
+    cv = topic_vectorizer()
     count_mat = cv.fit_transform(texts)
     ngrams = cv.get_feature_names_out()
 
@@ -359,27 +372,30 @@ def generate_grid_dict(
     image_label=None,
     image_url_prefix=None,
     opacity=None,
+    metrics=None,
 ):
     print("Generating contours...")
-    contour_dict = generate_contour_dict(
-        xs, ys,
-        grid_size=grid_size,
-        max_sample=max_sample,
-        random_seed=random_seed,
-        labels=labels,
-        group_names=group_names,
-        times=times,
-        time_format=time_format,
-    )
+    with timed(metrics, "contour", items=len(xs)):
+        contour_dict = generate_contour_dict(
+            xs, ys,
+            grid_size=grid_size,
+            max_sample=max_sample,
+            random_seed=random_seed,
+            labels=labels,
+            group_names=group_names,
+            times=times,
+            time_format=time_format,
+        )
 
     print("Generating multi-level topic summaries...")
-    topic_dict = generate_topic_dict(
-        xs, ys, texts,
-        max_zoom_scale=max_zoom_scale,
-        svg_width=svg_width,
-        svg_height=svg_height,
-        ideal_tile_width=ideal_tile_width,
-    )
+    with timed(metrics, "topics", items=len(xs)):
+        topic_dict = generate_topic_dict(
+            xs, ys, texts,
+            max_zoom_scale=max_zoom_scale,
+            svg_width=svg_width,
+            svg_height=svg_height,
+            ideal_tile_width=ideal_tile_width,
+        )
 
     grid_dict = contour_dict
     grid_dict["topic"] = topic_dict